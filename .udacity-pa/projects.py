@@ -5,7 +5,7 @@ projects = ['sudoku']
 
 
 def submit(args):
-    filenames = ['solution.py', 'README.md']
+    filenames = ['solution.py', 'topology.py', 'README.md']
 
     udacity.submit(nanodegree, projects[0], filenames,
                    environment=args.environment,
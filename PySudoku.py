@@ -1,5 +1,7 @@
+import io
 import os
 import pygame
+import struct
 import sys
 
 from objects import SudokuSquare
@@ -8,52 +10,117 @@ from objects.GameResources import *
 digits = '123456789'
 rows = 'ABCDEFGHI'
 
+size = width, height = 700, 700
+background_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images', 'sudoku-board-bare.jpg')
 
-def play(values_list):
+tile_size = 45, 40
+solved_color = (2, 204, 186)
+empty_color = (255, 255, 255)
+glyph_color = (255, 255, 255)
+glyph_offset = 17, 4
+
+
+def square_position(x, y):
+    """Returns the top left corner of the square in column x and row y of the board image."""
+    if x in (0, 1, 2):  startX = (x * 57) + 38
+    if x in (3, 4, 5):  startX = (x * 57) + 99
+    if x in (6, 7, 8):  startX = (x * 57) + 159
+
+    if y in (0, 1, 2):  startY = (y * 57) + 35
+    if y in (3, 4, 5):  startY = (y * 57) + 100
+    if y in (6, 7, 8):  startY = (y * 57) + 165
+    return startX, startY
+
+
+def shown_digit(value):
+    """Returns the digit displayed for a box, or None if it is not solved."""
+    if len(value) != 1 or value == '.':
+        return None
+    return value
+
+
+class Renderer:
+    """
+    Draws frames of a solver trace onto a surface, redrawing only the squares that changed.
+
+    The font, the glyphs of the nine digits and the tiles of solved and unsolved
+    squares are rendered once. Every frame is compared with the previous one, and
+    only the squares showing a different digit are redrawn.
+
+    surface    : the surface to draw on, usually the display
+    background : the bare board image, the size of the surface
+    """
+
+    def __init__(self, surface, background):
+        self.surface = surface
+        self.background = background
+        font = pygame.font.SysFont('opensans', 21)
+        self.glyphs = dict((d, font.render(d, 1, glyph_color)) for d in digits)
+        self.tiles = {True: SudokuSquare.rounded_rect(tile_size, solved_color),
+                      False: SudokuSquare.rounded_rect(tile_size, empty_color)}
+        self.boxes = [row + col for row in rows for col in digits]
+        self.positions = [square_position(x, y) for y in range(9) for x in range(9)]
+
+        # The area of a square covers its tile and the largest glyph.
+        glyph_rect = pygame.Rect(glyph_offset, (0, 0)).unionall(
+            [glyph.get_rect().move(glyph_offset) for glyph in self.glyphs.values()])
+        self.areas = [pygame.Rect(position, tile_size).union(glyph_rect.move(position))
+                      for position in self.positions]
+        self.shown = None
+
+    def draw(self, values):
+        """
+        Draws a frame.
+
+        values : the sudoku in dictionary form
+        returns: the list of rectangles of the surface that changed
+        """
+        current = [shown_digit(values[box]) for box in self.boxes]
+        if self.shown is None:
+            self.surface.blit(self.background, (0, 0))
+            changed = range(len(current))
+        else:
+            changed = [i for i, (before, after) in enumerate(zip(self.shown, current)) if before != after]
+
+        dirty = []
+        for i in changed:
+            area = self.areas[i]
+            x, y = self.positions[i]
+            digit = current[i]
+            self.surface.blit(self.background, area, area)
+            self.surface.blit(self.tiles[digit is not None], (x, y))
+            if digit is not None:
+                self.surface.blit(self.glyphs[digit], (x + glyph_offset[0], y + glyph_offset[1]))
+            dirty.append(area)
+
+        if self.shown is None:
+            dirty = [self.surface.get_rect()]
+        self.shown = current
+        return dirty
+
+
+def play(values_list, fps=5):
+    """
+    Replays a sequence of sudokus in dictionary form in a window.
+
+    values_list : an iterable of sudokus, consumed as the replay goes on
+    fps         : the maximum number of frames per second; 0 replays as fast as possible
+    """
     pygame.init()
 
-    size = width, height = 700, 700
     screen = pygame.display.set_mode(size)
 
-    background_image = pygame.image.load("./images/sudoku-board-bare.jpg").convert()
+    background_image = pygame.image.load(background_path).convert()
+    renderer = Renderer(screen, background_image)
 
     clock = pygame.time.Clock()
 
-    # The puzzleNumber sets a seed so either generate
-    # a random number to fill in here or accept user
-    # input for a duplicatable puzzle.
-
     for values in values_list:
         pygame.event.pump()
-        theSquares = []
-        initXLoc = 0
-        initYLoc = 0
-        startX, startY, editable, number = 0, 0, "N", 0
-        for y in range(9):
-            for x in range(9):
-                if x in (0, 1, 2):  startX = (x * 57) + 38
-                if x in (3, 4, 5):  startX = (x * 57) + 99
-                if x in (6, 7, 8):  startX = (x * 57) + 159
-
-                if y in (0, 1, 2):  startY = (y * 57) + 35
-                if y in (3, 4, 5):  startY = (y * 57) + 100
-                if y in (6, 7, 8):  startY = (y * 57) + 165
-                col = digits[x]
-                row = rows[y]
-                string_number = values[row + col]
-                if len(string_number) > 1 or string_number == '' or string_number == '.':
-                    number = None
-                else:
-                    number = int(string_number)
-                theSquares.append(SudokuSquare.SudokuSquare(number, startX, startY, editable, x, y))
-
-        screen.blit(background_image, (0, 0))
-        for num in theSquares:
-            num.draw()
-
-        pygame.display.flip()
-        pygame.display.update()
-        clock.tick(5)
+        dirty = renderer.draw(values)
+        if dirty:
+            pygame.display.update(dirty)
+        clock.tick(fps)
 
     # leave game showing until closed by user
     while True:
@@ -63,6 +130,137 @@ def play(values_list):
                 quit()
 
 
+def _frames(values_list, every, max_frames):
+    """Yields every ``every``-th sudoku and the last one, up to ``max_frames`` sudokus in total."""
+    count = 0
+    values = None
+    for i, values in enumerate(values_list):
+        if max_frames is not None and count >= max_frames:
+            return
+        if i % every == 0:
+            count += 1
+            yield values
+            values = None
+    if values is not None and (max_frames is None or count < max_frames):
+        yield values
+
+
+def _gif_parts(data):
+    """
+    Splits a single-frame GIF into its header with the global palette and its image block.
+
+    The image block runs from the image descriptor to the end of the compressed pixel data.
+    """
+    flags = data[10]
+    position = 13 + (3 << (flags & 7) + 1 if flags & 0x80 else 0)
+    header = data[:position]
+    while data[position] == 0x21:
+        position += 2
+        while data[position]:
+            position += data[position] + 1
+        position += 1
+    start = position
+    flags = data[position + 9]
+    position += 10 + (3 << (flags & 7) + 1 if flags & 0x80 else 0) + 1
+    while data[position]:
+        position += data[position] + 1
+    return header, data[start:position + 1]
+
+
+class _GifWriter:
+    """
+    Streams frames into an animated GIF, writing only the changed area of every frame.
+
+    Pillow encodes each changed area as a GIF of its own, quantized to the palette of the
+    first frame, and its image block is appended to the file. So only one frame is held in
+    memory at a time.
+    """
+
+    def __init__(self, path, fps):
+        from PIL import Image
+        self.image = Image
+        self.delay = max(1, round(100 / fps))
+        self.palette = None
+        self.file = open(path, 'wb')
+
+    def write(self, surface, dirty):
+        area = dirty[0].unionall(dirty[1:])
+        image = self.image.frombytes('RGB', area.size, pygame.image.tostring(surface.subsurface(area), 'RGB'))
+        if self.palette is None:
+            self.palette = image = image.quantize(colors=256)
+        else:
+            image = image.quantize(palette=self.palette, dither=0)
+        encoded = io.BytesIO()
+        image.save(encoded, 'GIF', optimize=False)
+        header, block = _gif_parts(encoded.getvalue())
+        if self.file.tell() == 0:
+            # Loop forever (the NETSCAPE2.0 application extension).
+            self.file.write(header + b'!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+        # A graphic control extension with the frame delay, then the image at the changed area.
+        self.file.write(struct.pack('<4BH2B', 0x21, 0xf9, 4, 0x04, self.delay, 0, 0))
+        self.file.write(block[:1] + struct.pack('<2H', *area.topleft) + block[5:])
+
+    def close(self):
+        if self.palette is not None:
+            self.file.write(b';')
+        self.file.close()
+
+
+class _PngWriter:
+    """Saves every frame into a numbered PNG file in a directory."""
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.count = 0
+
+    def write(self, surface, dirty):
+        pygame.image.save(surface, os.path.join(self.path, 'frame-{:05d}.png'.format(self.count)))
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+def export(values_list, path, every=1, max_frames=None, fps=5):
+    """
+    Renders a sequence of sudokus without a display, into an animated GIF or a PNG sequence.
+
+    Frames are written as they are rendered, so traces of any length can be exported.
+    Frames that look the same as the previously written one are skipped. Writing a GIF needs Pillow.
+
+    values_list : an iterable of sudokus in dictionary form
+    path        : a file name ending in .gif, or a directory to write frame-00000.png, ... into
+    every       : renders only every n-th sudoku, and the last one
+    max_frames  : the maximum number of sudokus to render
+    fps         : the frame rate of the GIF
+    returns     : the number of frames written
+    """
+    if every < 1:
+        raise ValueError('every must be at least 1')
+    if fps <= 0:
+        raise ValueError('fps must be positive')
+    if max_frames is not None and max_frames < 0:
+        raise ValueError('max_frames must not be negative')
+
+    # Rendering onto a plain surface needs the font module only, not a display.
+    pygame.font.init()
+
+    surface = pygame.Surface(size)
+    renderer = Renderer(surface, pygame.image.load(background_path))
+    writer = _GifWriter(path, fps) if path.lower().endswith('.gif') else _PngWriter(path)
+    written = 0
+    try:
+        for values in _frames(values_list, every, max_frames):
+            dirty = renderer.draw(values)
+            if dirty:
+                writer.write(surface, dirty)
+                written += 1
+    finally:
+        writer.close()
+    return written
+
+
 if __name__ == "__main__":
     main()
     sys.exit()
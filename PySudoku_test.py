@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+import PySudoku
+import solution
+import solution_test
+import visualize
+
+try:
+    import PIL
+except ImportError:
+    PIL = None
+
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        pygame.init()
+        self.surface = pygame.Surface(PySudoku.size)
+        self.renderer = PySudoku.Renderer(self.surface, pygame.image.load(PySudoku.background_path))
+        self.values = solution.grid_values(solution_test.TestDiagonalSudoku.diagonal_grid)
+
+    def tearDown(self):
+        pygame.quit()
+
+    def tile_color(self, box):
+        x, y = PySudoku.square_position('123456789'.index(box[1]), 'ABCDEFGHI'.index(box[0]))
+        return tuple(self.surface.get_at((x + 3, y + 20)))[:3]
+
+    def test_first_frame_is_drawn_completely(self):
+        self.assertEqual(self.renderer.draw(self.values), [self.surface.get_rect()])
+        self.assertEqual(self.tile_color('A1'), PySudoku.solved_color)
+        self.assertEqual(self.tile_color('A2'), PySudoku.empty_color)
+
+    def test_only_changed_squares_are_redrawn(self):
+        self.renderer.draw(self.values)
+        self.assertEqual(self.renderer.draw(dict(self.values)), [])
+        changed = dict(self.values, A2='5')
+        dirty = self.renderer.draw(changed)
+        self.assertEqual(len(dirty), 1)
+        self.assertEqual(self.tile_color('A2'), PySudoku.solved_color)
+        self.assertEqual(len(self.renderer.draw(self.values)), 1)
+        self.assertEqual(self.tile_color('A2'), PySudoku.empty_color)
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        recorder = solution.Recorder()
+        solution.solve(solution_test.TestDiagonalSudoku.diagonal_grid, recorder=recorder)
+        self.frames = list(visualize.filter_assignments(recorder.trace()))
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_frames(self):
+        self.assertEqual(list(PySudoku._frames(range(10), 4, None)), [0, 4, 8, 9])
+        self.assertEqual(list(PySudoku._frames(range(10), 4, 2)), [0, 4])
+        self.assertEqual(list(PySudoku._frames(range(9), 4, None)), [0, 4, 8])
+
+    def test_png_sequence(self):
+        path = os.path.join(self.directory.name, 'frames')
+        written = PySudoku.export(self.frames, path, every=2, max_frames=3)
+        self.assertEqual(written, 3)
+        self.assertEqual(sorted(os.listdir(path)), ['frame-00000.png', 'frame-00001.png', 'frame-00002.png'])
+
+    @unittest.skipUnless(PIL, 'writing a GIF needs Pillow')
+    def test_gif(self):
+        from PIL import Image
+        path = os.path.join(self.directory.name, 'trace.gif')
+        written = PySudoku.export(iter(self.frames), path, fps=10)
+        self.assertGreater(written, 1)
+        with Image.open(path) as image:
+            self.assertEqual(image.size, PySudoku.size)
+            self.assertEqual(image.n_frames, written)
+            image.seek(written - 1)
+            x, y = PySudoku.square_position(8, 8)
+            self.assertEqual(image.convert('RGB').getpixel((x + 3, y + 20)), PySudoku.solved_color)
+
+    def test_invalid_arguments(self):
+        path = os.path.join(self.directory.name, 'trace.gif')
+        for kwargs in (dict(every=0), dict(fps=0), dict(max_frames=-1)):
+            with self.assertRaises(ValueError):
+                PySudoku.export(self.frames, path, **kwargs)
+
+    def test_leaves_display_alone(self):
+        environment = dict(os.environ)
+        PySudoku.export(self.frames[:2], os.path.join(self.directory.name, 'frames'))
+        self.assertEqual(dict(os.environ), environment)
+        self.assertFalse(pygame.display.get_init())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+"""
+Batch solving of many grids across a pool of worker processes.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from functools import partial
+from itertools import islice
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import bitmask  # noqa: F401 (imported so that workers load the engines up front)
+import dlx  # noqa: F401
+import solution
+from solution import MaybeSolution, SearchStats
+from topology import Topology, DEFAULT_TOPOLOGY
+
+
+class BatchResult(NamedTuple):
+    """
+    The outcome of solving a single grid of a batch.
+
+    Attributes
+    ----------
+    index : int
+        The position of the grid in the input sequence.
+    grid : str
+        The grid as it was passed in.
+    solution : MaybeSolution or int, optional
+        The solved sudoku, ``False`` if it has no solution or ``None`` if solving failed.
+        For ``count_many``, the number of solutions found.
+    error : str, optional
+        A description of the exception raised while solving, if any.
+    seconds : float
+        The wall-clock time spent solving the grid in the worker.
+    stats : SearchStats, optional
+        The search statistics of the grid, if ``solve_many`` was asked to collect them.
+    """
+    index: int
+    grid: str
+    solution: Optional[Union[MaybeSolution, int]]
+    error: Optional[str]
+    seconds: float
+    stats: Optional[SearchStats] = None
+
+
+Task = Callable[..., Union[MaybeSolution, int]]
+
+
+def _solve_chunk(chunk: List[Tuple[int, str]], task: Task, topology: Topology,
+                 stats: bool = False) -> List[BatchResult]:
+    """Runs the task on a chunk of indexed grids, capturing per-grid exceptions in the result."""
+    results = []
+    for index, grid in chunk:
+        grid_stats = SearchStats() if stats else None
+        start = perf_counter()
+        try:
+            if grid_stats is None:
+                result, error = task(grid, topology=topology), None
+            else:
+                result, error = task(grid, topology=topology, stats=grid_stats), None
+        except Exception as e:
+            result, error = None, '{}: {}'.format(type(e).__name__, e)
+        results.append(BatchResult(index, grid, result, error, perf_counter() - start, grid_stats))
+    return results
+
+
+def _chunked(grids: Iterable[str], chunksize: int) -> Iterator[List[Tuple[int, str]]]:
+    """Lazily splits the grids into lists of at most ``chunksize`` indexed grids."""
+    indexed = enumerate(grids)
+    while True:
+        chunk = list(islice(indexed, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def solve_many(grids: Iterable[str], workers: Optional[int] = None, chunksize: int = 64,
+               ordered: bool = True, engine: str = 'bitmask',
+               topology: Topology = DEFAULT_TOPOLOGY, stats: bool = False) -> Iterator[BatchResult]:
+    """
+    Solves many grids in parallel and streams back the results.
+
+    The grids are consumed lazily and at most two chunks per worker are in flight
+    at any time, so arbitrarily long inputs can be processed with bounded memory.
+    A grid that raises an exception is reported through ``BatchResult.error``
+    and does not abort the batch.
+
+    Parameters
+    ----------
+    grids : Iterable[str]
+        The grids in string form.
+    workers : int, optional
+        The number of worker processes; defaults to the number of CPUs.
+        With a single worker, the grids are solved in the calling process.
+    chunksize : int
+        The number of grids sent to a worker at once.
+    ordered : bool
+        If ``True``, results are yielded in input order, otherwise in completion order.
+    engine : str
+        The solver engine to use; see ``solution.ENGINES``.
+    topology : Topology
+        The board topology of all grids.
+    stats : bool
+        If ``True``, collects the search statistics of every grid in ``BatchResult.stats``;
+        combine them with ``SearchStats.merge``. Requires the ``'dict'`` or ``'bitmask'`` engine.
+
+    Returns
+    -------
+    Iterator[BatchResult]
+        One result per input grid.
+    """
+    return _run(grids, partial(solution.solve, engine=engine), workers, chunksize, ordered, topology, stats)
+
+
+def count_many(grids: Iterable[str], limit: int = 2, workers: Optional[int] = None, chunksize: int = 64,
+               ordered: bool = True, engine: str = 'bitmask',
+               topology: Topology = DEFAULT_TOPOLOGY) -> Iterator[BatchResult]:
+    """
+    Counts the solutions of many grids in parallel, e.g. to check a corpus for uniqueness.
+
+    Parameters
+    ----------
+    grids : Iterable[str]
+        The grids in string form.
+    limit : int
+        The number of solutions after which counting stops for a grid; ``2`` suffices
+        to tell unique grids from ambiguous ones.
+    workers : int, optional
+        The number of worker processes; see ``solve_many``.
+    chunksize : int
+        The number of grids sent to a worker at once.
+    ordered : bool
+        If ``True``, results are yielded in input order, otherwise in completion order.
+    engine : str
+        The solver engine to use; see ``solution.count_solutions``.
+    topology : Topology
+        The board topology of all grids.
+
+    Returns
+    -------
+    Iterator[BatchResult]
+        One result per input grid, holding the number of solutions in ``BatchResult.solution``.
+    """
+    return _run(grids, partial(solution.count_solutions, limit=limit, engine=engine),
+                workers, chunksize, ordered, topology)
+
+
+def _run(grids: Iterable[str], task: Task, workers: Optional[int], chunksize: int,
+         ordered: bool, topology: Topology, stats: bool = False) -> Iterator[BatchResult]:
+    """Runs the task on all grids across the process pool; see ``solve_many``."""
+    if chunksize < 1:
+        raise ValueError('chunksize must be positive')
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunked(grids, chunksize)
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from _solve_chunk(chunk, task, topology, stats)
+        return
+
+    max_pending = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if ordered:
+            queue = deque()
+            for chunk in chunks:
+                queue.append(pool.submit(_solve_chunk, chunk, task, topology, stats))
+                if len(queue) >= max_pending:
+                    yield from queue.popleft().result()
+            while queue:
+                yield from queue.popleft().result()
+        else:
+            pending = set()
+            for chunk in chunks:
+                pending.add(pool.submit(_solve_chunk, chunk, task, topology, stats))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+            for future in as_completed(pending):
+                yield from future.result()
@@ -0,0 +1,48 @@
+import unittest
+
+import batch
+import solution
+import solution_test
+
+
+class TestSolveMany(unittest.TestCase):
+    grids = [solution_test.TestDiagonalSudoku.diagonal_grid,
+             '4.......3..9.........1...7.....1.8.....5.9.....1.2.....3...5.........7..7.......8',
+             'not a sudoku'] * 3
+
+    def test_ordered(self):
+        results = list(batch.solve_many(self.grids, workers=2, chunksize=2))
+        self.assertEqual([r.index for r in results], list(range(len(self.grids))))
+        self.assertEqual([r.grid for r in results], self.grids)
+        self.assertEqual(results[0].solution, solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+        self.assertEqual(results[1].solution, solution.solve(self.grids[1], engine='bitmask'))
+
+    def test_failures_are_reported(self):
+        results = list(batch.solve_many(self.grids, workers=2, chunksize=1, ordered=False))
+        self.assertEqual(sorted(r.index for r in results), list(range(len(self.grids))))
+        failed = [r for r in results if r.error is not None]
+        self.assertEqual(sorted(r.index for r in failed), [2, 5, 8])
+        self.assertTrue(all(r.solution is None for r in failed))
+
+    def test_in_process(self):
+        results = list(batch.solve_many(self.grids[:2], workers=1))
+        self.assertEqual(results[0].solution, solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+
+    def test_stats(self):
+        results = list(batch.solve_many(self.grids[:2], workers=2, chunksize=1, stats=True))
+        self.assertTrue(all(r.stats.nodes > 0 for r in results))
+        self.assertIn('propagate', results[1].stats.stages)
+        self.assertTrue(all(r.stats is None for r in batch.solve_many(self.grids[:2], workers=1)))
+
+
+class TestCountMany(unittest.TestCase):
+    def test_counts(self):
+        grids = [solution_test.TestDiagonalSudoku.diagonal_grid, solution_test.TestBacktracking.grid,
+                 '1.......1' + '.' * 72, 'not a sudoku']
+        results = list(batch.count_many(grids, workers=2, chunksize=1))
+        self.assertEqual([r.solution for r in results[:3]], [1, 2, 0])
+        self.assertIsNotNone(results[3].error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,285 @@
+"""
+Benchmarks the solver engines against each other.
+
+Run with ``python benchmark.py``; see ``--help`` for options.
+"""
+
+import argparse
+import random
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import bitmask
+import solution
+from topology import DEFAULT_TOPOLOGY, get_topology
+
+PUZZLES = {
+    # The diagonal sudoku from solution_test.py
+    'test': '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3',
+    # The hard diagonal sudoku from the __main__ block of solution.py
+    'main': '4.......3..9.........1...7.....1.8.....5.9.....1.2.....3...5.........7..7.......8',
+    # Sparse diagonal sudokus that need deep backtracking
+    'hard-1': '.679..3.....7.........2.5...76....9....1....7...65..3.....7......5..1..4..85.....',
+    'hard-2': '..7...3...537..2.....8...7..7.......3...9...7.29.57.....23....5..5..1............',
+    'hard-3': '2.79.....8..7.....4....3.....6....9..8...2.5.......4..6.2.7.8.......1.......649..',
+}  # type: Dict[str, str]
+
+# Classic sudokus on which depth-first search with propagation degrades badly
+PATHOLOGICAL = {
+    # Has no solution, which is only found after exhausting a huge search tree
+    'impossible': '.....5.8....6.1.43..........1.5........1.6...3.......553.....61........4.........',
+    'platinum': '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..',
+}  # type: Dict[str, str]
+
+# Puzzles whose solve time is minutes rather than milliseconds for some engines
+TOO_SLOW = {('impossible', 'dict'), ('impossible', 'bitmask')}
+
+
+def easy_corpus(n: int, blanks: int = 45, seed: int = 0) -> List[str]:
+    """
+    Derives ``n`` easy diagonal sudokus from the solution of the ``test`` puzzle.
+
+    Every grid relabels the digits of the solution at random and blanks out ``blanks`` boxes;
+    the same seed always yields the same corpus.
+    """
+    solved = solution.solve(PUZZLES['test'], engine='bitmask')
+    digits = ''.join(solved[box] for box in solution.boxes())
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n):
+        relabel = dict(zip(solution.digits, rng.sample(solution.digits, len(solution.digits))))
+        grid = [relabel[d] for d in digits]
+        for box in rng.sample(range(len(grid)), blanks):
+            grid[box] = '.'
+        corpus.append(''.join(grid))
+    return corpus
+
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    """
+    Determines the best time of a single call to ``func``.
+
+    Parameters
+    ----------
+    func : Callable
+        The function to time.
+    repeat : int
+        The number of timing runs; the fastest one is reported.
+
+    Returns
+    -------
+    float
+        The best time of a single call in seconds.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def allocations(func: Callable[[], object]) -> Tuple[int, int]:
+    """
+    Traces the memory allocated by a single call to ``func``.
+
+    Returns
+    -------
+    Tuple[int, int]
+        The number of bytes allocated and still held after the call, and the peak traced memory in bytes.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        func()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'lineno') if stat.size_diff > 0)
+    return allocated, peak
+
+
+def compare_engines(repeat: int) -> None:
+    """Prints the per-puzzle solve time of every engine and the speedup over the dictionary engine."""
+    print('{:<8} {:<8} {:>12} {:>8}'.format('puzzle', 'engine', 'time [ms]', 'speedup'))
+    for name, grid in PUZZLES.items():
+        baseline = None
+        for engine in solution.ENGINES:
+            seconds = best_time(lambda: solution.solve(grid, engine=engine), repeat)
+            baseline = baseline or seconds
+            print('{:<8} {:<8} {:>12.3f} {:>7.1f}x'.format(name, engine, seconds * 1000, baseline / seconds))
+
+
+def compare_backtracking(repeat: int) -> None:
+    """Prints time, allocated and peak memory of the dictionary engine for every backtracking mode."""
+    print('{:<8} {:<8} {:>12} {:>15} {:>12} {:>8}'.format(
+        'puzzle', 'mode', 'time [ms]', 'allocated [KiB]', 'peak [KiB]', 'speedup'))
+    for name, grid in PUZZLES.items():
+        baseline = None
+        for mode in solution.BACKTRACKING:
+            def run():
+                return solution.solve(grid, backtracking=mode)
+
+            seconds = best_time(run, repeat)
+            allocated, peak = allocations(run)
+            baseline = baseline or seconds
+            print('{:<8} {:<8} {:>12.3f} {:>15.1f} {:>12.1f} {:>7.1f}x'.format(
+                name, mode, seconds * 1000, allocated / 1024, peak / 1024, baseline / seconds))
+
+
+def count_search_nodes(grid: str, unit_rules) -> int:
+    """Counts the nodes the bitmask search visits to solve a grid with the given unit rules."""
+    stats = solution.SearchStats()
+    bitmask.search(bitmask.grid_masks(grid), unit_rules=unit_rules, stats=stats)
+    return stats.nodes
+
+
+def dict_subset_pipeline(stage: str) -> solution.Pipeline:
+    """Creates a pipeline of eliminate, only_choice and the given naked twins or naked subsets stage."""
+    optional = ('naked_twins', 'naked_subsets', 'pointing_pairs', 'box_line_reduction', 'hidden_pairs')
+    return solution.default_pipeline().disable(*optional).enable(stage)
+
+
+def compare_subsets(repeat: int) -> None:
+    """Prints search nodes, solve time and the cost of a full propagation for naked twins and naked subsets."""
+    print('{:<8} {:<8} {:<8} {:>8} {:>12} {:>12}'.format(
+        'puzzle', 'engine', 'rules', 'nodes', 'time [ms]', 'reduce [us]'))
+    for name, grid in PUZZLES.items():
+        for variant, stage in (('twins', 'naked_twins'), ('subsets', 'naked_subsets')):
+            stats = solution.SearchStats()
+            solution.solve(grid, pipeline=dict_subset_pipeline(stage), stats=stats)
+            seconds = best_time(lambda: solution.solve(grid, pipeline=dict_subset_pipeline(stage)), repeat)
+            reduce_seconds = best_time(lambda: solution.reduce_puzzle(
+                solution.grid_values(grid), pipeline=dict_subset_pipeline(stage)), repeat)
+            print('{:<8} {:<8} {:<8} {:>8} {:>12.3f} {:>12.1f}'.format(
+                name, 'dict', variant, stats.nodes, seconds * 1000, reduce_seconds * 1e6))
+        for variant, rules in (('twins', (bitmask.only_choice_unit, bitmask.naked_twins_unit)),
+                               ('subsets', (bitmask.only_choice_unit, bitmask.naked_subsets_unit))):
+            masks = bitmask.grid_masks(grid)
+            nodes = count_search_nodes(grid, rules)
+            seconds = best_time(lambda: bitmask.search(masks[:], unit_rules=rules), repeat)
+            reduce_seconds = best_time(lambda: bitmask.propagate(masks[:], range(81), unit_rules=rules), repeat)
+            print('{:<8} {:<8} {:<8} {:>8} {:>12.3f} {:>12.1f}'.format(
+                name, 'bitmask', variant, nodes, seconds * 1000, reduce_seconds * 1e6))
+
+
+def compare_strategies(repeat: int) -> None:
+    """Prints search nodes, solve time and the candidates removed by each stage for several strategy pipelines."""
+    variants = {
+        'basic': (),
+        'hidden': ('hidden_pairs',),
+        'locked': ('pointing_pairs', 'box_line_reduction'),
+        'all': ('hidden_pairs', 'pointing_pairs', 'box_line_reduction'),
+    }
+    optional = variants['all']
+    print('{:<8} {:<8} {:>8} {:>12}  {}'.format('puzzle', 'pipeline', 'nodes', 'time [ms]', 'removed per stage'))
+    for name, grid in PUZZLES.items():
+        for variant, stages in variants.items():
+            def run():
+                pipeline = solution.default_pipeline().disable(*optional).enable(*stages)
+                solution.solve(grid, pipeline=pipeline)
+                return pipeline
+
+            seconds = best_time(run, repeat)
+            pipeline = run()
+            removed = ' '.join('{}={}'.format(s.name, s.removed) for s in pipeline.strategies if s.enabled)
+            print('{:<8} {:<8} {:>8} {:>12.3f}  {}'.format(name, variant, pipeline.reductions, seconds * 1000, removed))
+
+
+def compare_exact_cover(repeat: int) -> None:
+    """Prints the solve time of every engine on easy, hard and pathological puzzles."""
+    classic = get_topology(3, diagonal=False)
+    puzzles = [('easy', name, PUZZLES[name], DEFAULT_TOPOLOGY) for name in ('test', 'main')] + \
+              [('hard', name, PUZZLES[name], DEFAULT_TOPOLOGY) for name in ('hard-1', 'hard-2', 'hard-3')] + \
+              [('patho', name, grid, classic) for name, grid in PATHOLOGICAL.items()]
+    print(('{:<6} {:<11}' + ' {:>12}' * len(solution.ENGINES)).format(
+        'set', 'puzzle', *('{} [ms]'.format(engine) for engine in solution.ENGINES)))
+    for group, name, grid, topology in puzzles:
+        times = []
+        for engine in solution.ENGINES:
+            if (name, engine) in TOO_SLOW:
+                times.append('skipped')
+                continue
+            seconds = best_time(lambda: solution.solve(grid, engine=engine, topology=topology), repeat)
+            times.append('{:.3f}'.format(seconds * 1000))
+        print(('{:<6} {:<11}' + ' {:>12}' * len(times)).format(group, name, *times))
+
+
+def compare_vectorized(repeat: int) -> None:
+    """Prints the time per puzzle for solving a batch of easy puzzles one by one and vectorized."""
+    import vectorized
+
+    print('{:<8} {:<11} {:>12} {:>8}'.format('puzzles', 'mode', 'time [us]', 'speedup'))
+    for n in (100, 1000, 10000):
+        corpus = easy_corpus(n)
+        one_by_one = best_time(lambda: [solution.solve(grid, engine='bitmask') for grid in corpus], repeat) / n
+        batched = best_time(lambda: vectorized.solve_batch(corpus), repeat) / n
+        print('{:<8} {:<11} {:>12.1f} {:>8}'.format(n, 'bitmask', one_by_one * 1e6, ''))
+        print('{:<8} {:<11} {:>12.1f} {:>7.1f}x'.format(n, 'vectorized', batched * 1e6, one_by_one / batched))
+
+
+def compare_orderings(repeat: int) -> None:
+    """Prints search nodes, backtracks and solve time of the dictionary engine for every branching policy."""
+    print('{:<8} {:<15} {:>8} {:>11} {:>12}'.format('puzzle', 'ordering', 'nodes', 'backtracks', 'time [ms]'))
+    for name, grid in PUZZLES.items():
+        for policy, ordering in solution.ORDERINGS.items():
+            stats = solution.SearchStats()
+            solution.solve(grid, ordering=ordering, stats=stats)
+            seconds = best_time(lambda: solution.solve(grid, ordering=ordering), repeat)
+            print('{:<8} {:<15} {:>8} {:>11} {:>12.3f}'.format(
+                name, policy, stats.nodes, stats.backtracks, seconds * 1000))
+
+
+def compare_cache(repeat: int) -> None:
+    """
+    Prints the time per puzzle for streams of transformed puzzles solved directly and through a SolveCache.
+
+    The hard stream transforms the hard and test puzzles; the easy stream transforms
+    20 puzzles of the easy corpus ten times each, so that nine in ten lookups hit.
+    """
+    import canonical
+
+    rng = random.Random(0)
+
+    def transformed(grid):
+        positions = rng.choice(canonical.symmetries(3))
+        relabel = dict(zip(solution.digits, rng.sample(solution.digits, len(solution.digits))))
+        return ''.join(relabel.get(grid[p], '.') for p in positions)
+
+    streams = {
+        'hard': [transformed(grid) for _ in range(20) for grid in PUZZLES.values()],
+        'easy': [transformed(grid) for _ in range(10) for grid in easy_corpus(20)],
+    }
+    for name, stream in streams.items():
+        def solve_cached():
+            cache = canonical.SolveCache()
+            for grid in stream:
+                cache.solve(grid)
+            return cache
+
+        direct = best_time(lambda: [solution.solve(grid, engine='bitmask') for grid in stream], repeat) / len(stream)
+        cached = best_time(solve_cached, repeat) / len(stream)
+        cache = solve_cached()
+        print('{:<4} {} puzzles: direct {:.3f}ms, cached {:.3f}ms per puzzle ({:.1f}x); {}'.format(
+            name, len(stream), direct * 1000, cached * 1000, direct / cached, cache.cache_info()))
+
+
+BENCHMARKS = {
+    'engines': compare_engines,
+    'backtracking': compare_backtracking,
+    'subsets': compare_subsets,
+    'strategies': compare_strategies,
+    'exact-cover': compare_exact_cover,
+    'vectorized': compare_vectorized,
+    'orderings': compare_orderings,
+    'cache': compare_cache,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the sudoku solver engines.')
+    parser.add_argument('benchmark', nargs='?', choices=sorted(BENCHMARKS), default='engines',
+                        help='the benchmark to run')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timing runs per measurement')
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args.repeat)
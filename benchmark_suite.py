@@ -0,0 +1,356 @@
+"""
+A reproducible benchmark suite for the solver pipeline with machine-readable results.
+
+Every stage of the pipeline (``grid_values``, the propagation strategies,
+``reduce_puzzle``, ``search`` and ``solve`` with each engine) is timed separately
+on fixed puzzle corpora bundled in the ``corpora`` directory:
+
+* ``easy`` - unique diagonal sudokus with 40 clues, solved by propagation alone,
+* ``medium`` - unique diagonal sudokus with about 30 clues,
+* ``hard`` - unique diagonal sudokus with as few clues as possible that need a search to solve,
+* ``diagonal`` - minimal diagonal sudokus that have several solutions without the diagonal units.
+
+The corpora are derived deterministically from a seed; ``python benchmark_suite.py generate``
+rewrites them, which should only be necessary when the corpora themselves change.
+
+``python benchmark_suite.py run -o results.json`` writes the throughput, latency
+percentiles and peak traced memory of every stage as JSON, and
+``python benchmark_suite.py compare base.json results.json`` flags regressions
+between two runs, exiting with status 1 if it found any.
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tracemalloc
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import codec
+import solution
+from benchmark import PUZZLES
+from canonical import symmetries
+from generator import dig, generate_many
+from solve_puzzles import read_grids
+from topology import DEFAULT_TOPOLOGY, get_topology
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora')
+CORPORA = ('easy', 'medium', 'hard', 'diagonal')
+FORMAT = 1
+
+Report = Dict[str, Any]
+
+
+class Stage(NamedTuple):
+    """
+    A timed step of the solver pipeline.
+
+    Attributes
+    ----------
+    prepare : Callable[[str], Any]
+        Builds the input of ``run`` from a grid; not timed.
+    run : Callable[[Any], Any]
+        The timed call.
+    """
+    prepare: Callable[[str], Any]
+    run: Callable[[Any], Any]
+
+
+def _eliminated(grid: str) -> solution.SudokuDict:
+    return solution.eliminate(solution.grid_values(grid))
+
+
+# The strategies after eliminate are timed on an eliminated grid, where they have work to do.
+STAGES = {
+    'grid_values': Stage(lambda grid: grid, solution.grid_values),
+    'codec.parse': Stage(lambda grid: grid.encode('ascii'), codec.parse),
+    'eliminate': Stage(solution.grid_values, solution.eliminate),
+    'only_choice': Stage(_eliminated, solution.only_choice),
+    'naked_twins': Stage(_eliminated, solution.naked_twins),
+    'reduce_puzzle': Stage(solution.grid_values, solution.reduce_puzzle),
+    'search': Stage(solution.grid_values, solution.search),
+    'solve': Stage(lambda grid: grid, solution.solve),
+    'solve[bitmask]': Stage(lambda grid: grid, lambda grid: solution.solve(grid, engine='bitmask')),
+    'solve[dlx]': Stage(lambda grid: grid, lambda grid: solution.solve(grid, engine='dlx')),
+}  # type: Dict[str, Stage]
+
+
+def _solutions(rng: random.Random) -> Iterator[List[str]]:
+    """Yields random diagonal-preserving transforms and relabellings of a solved diagonal sudoku."""
+    solved = solution.solve(PUZZLES['test'], engine='bitmask')
+    base = [solved[box] for box in DEFAULT_TOPOLOGY.boxes]
+    transforms = symmetries(DEFAULT_TOPOLOGY.box_size)
+    digits = DEFAULT_TOPOLOGY.digits
+    while True:
+        relabel = dict(zip(digits, rng.sample(digits, len(digits))))
+        yield [relabel[base[p]] for p in rng.choice(transforms)]
+
+
+def generate_corpus(name: str, n: int, seed: int = 0) -> List[str]:
+    """
+    Deterministically generates a puzzle corpus.
+
+    Parameters
+    ----------
+    name : str
+        The corpus to generate; one of ``CORPORA``.
+    n : int
+        The number of puzzles.
+    seed : int
+        The random seed; the same seed always yields the same corpus.
+
+    Returns
+    -------
+    List[str]
+        The puzzles in string form.
+    """
+    rng = random.Random('{}:{}'.format(name, seed))
+    if name == 'hard':
+        # The sparse hard-* puzzles of benchmark.py have several solutions, which would
+        # mix the cost of a non-unique puzzle into the timings; generated ones are unique.
+        puzzles = generate_many(n, '{}:{}'.format(name, seed), workers=1, level='expert')
+        return [puzzle.grid for puzzle in puzzles if solution.count_solutions(puzzle.grid) == 1]
+    if name not in CORPORA:
+        raise ValueError('Unknown corpus {!r}; expected one of {}'.format(name, CORPORA))
+
+    classic = get_topology(DEFAULT_TOPOLOGY.box_size, diagonal=False)
+    min_clues = {'easy': 40, 'medium': 30, 'diagonal': 0}[name]
+    corpus = []
+    for grid in _solutions(rng):
+        if len(corpus) == n:
+            break
+        puzzle = dig(grid, rng, min_clues)
+        if name != 'diagonal' or not solution.is_unique(puzzle, topology=classic):
+            corpus.append(puzzle)
+    return corpus
+
+
+def load_corpus(name: str) -> List[str]:
+    """Reads a bundled corpus from the ``corpora`` directory."""
+    with open(os.path.join(CORPUS_DIR, name + '.txt')) as stream:
+        return list(read_grids(stream))
+
+
+def percentile(samples: Sequence[float], p: float) -> Optional[float]:
+    """Returns the nearest-rank percentile ``p`` (in the range ``0..100``) of the samples, ``None`` if there are none."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(len(ordered) * p / 100), 1) - 1]
+
+
+def _latencies(stage: Stage, grids: Sequence[str], repeat: int) -> List[float]:
+    """Times the stage on every grid ``repeat`` times, keeping the best time per grid."""
+    best = [math.inf] * len(grids)
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for i, grid in enumerate(grids):
+                arg = stage.prepare(grid)
+                start = perf_counter()
+                stage.run(arg)
+                best[i] = min(best[i], perf_counter() - start)
+    finally:
+        if enabled:
+            gc.enable()
+    return best
+
+
+def _peak_memory(stage: Stage, grids: Sequence[str]) -> int:
+    """Measures the peak traced memory in bytes while running the stage once on every grid."""
+    args = [stage.prepare(grid) for grid in grids]
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        for arg in args:
+            stage.run(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+
+def measure(stage: Stage, grids: Sequence[str], repeat: int = 3) -> Dict[str, Optional[float]]:
+    """
+    Benchmarks a stage on a corpus.
+
+    Parameters
+    ----------
+    stage : Stage
+        The stage to time; see ``STAGES``.
+    grids : Sequence[str]
+        The corpus.
+    repeat : int
+        The number of timing passes; the best time of every grid is reported.
+
+    Returns
+    -------
+    Dict[str, Optional[float]]
+        The number of grids, their total time and throughput, latency percentiles
+        in seconds and the peak traced memory in bytes. Metrics that are undefined,
+        such as the percentiles of an empty corpus, are ``None``, so that the
+        report stays valid JSON.
+    """
+    latencies = _latencies(stage, grids, repeat)
+    total = sum(latencies)
+    return {
+        'n': len(grids),
+        'seconds': total,
+        'throughput': len(grids) / total if total else None,
+        'p50': percentile(latencies, 50),
+        'p90': percentile(latencies, 90),
+        'p99': percentile(latencies, 99),
+        'max': max(latencies, default=None),
+        'peak_bytes': _peak_memory(stage, grids),
+    }
+
+
+def run(corpora: Dict[str, Sequence[str]], stages: Sequence[str], repeat: int = 3) -> Report:
+    """
+    Benchmarks the given stages on all corpora.
+
+    Returns
+    -------
+    Report
+        A JSON-serializable report with the results by corpus and stage, the
+        SHA-256 digest of every corpus and a description of the environment.
+    """
+    report = {
+        'format': FORMAT,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'corpora': {},
+        'results': {},
+    }  # type: Report
+    for name, grids in corpora.items():
+        report['corpora'][name] = hashlib.sha256('\n'.join(grids).encode('ascii')).hexdigest()
+        results = report['results'][name] = {}
+        for stage in stages:
+            results[stage] = measure(STAGES[stage], grids, repeat)
+    return report
+
+
+class Change(NamedTuple):
+    """A metric that differs between two benchmark reports."""
+    corpus: str
+    stage: str
+    metric: str
+    base: float
+    new: float
+    regression: bool
+
+    @property
+    def ratio(self) -> float:
+        return self.new / self.base if self.base else math.inf
+
+
+# Whether a larger value of each compared metric is better.
+COMPARED = {'throughput': True, 'p50': False, 'p99': False, 'peak_bytes': False}
+
+
+def compare(base: Report, new: Report, threshold: float = 0.1) -> List[Change]:
+    """
+    Compares two benchmark reports.
+
+    Parameters
+    ----------
+    base : Report
+        The report of the baseline run.
+    new : Report
+        The report of the run to check.
+    threshold : float
+        The relative change beyond which a metric counts as changed, e.g. ``0.1`` for 10%.
+
+    Returns
+    -------
+    List[Change]
+        Every metric of a corpus and stage present in both reports that changed
+        beyond the threshold, flagged as a regression if it got worse.
+    """
+    changes = []
+    for corpus, results in sorted(new['results'].items()):
+        for stage, metrics in sorted(results.items()):
+            base_metrics = base['results'].get(corpus, {}).get(stage)
+            if base_metrics is None:
+                continue
+            for metric, higher_is_better in COMPARED.items():
+                before, after = base_metrics[metric], metrics[metric]
+                if before is None or after is None or abs(after - before) <= threshold * abs(before):
+                    continue
+                worse = after < before if higher_is_better else after > before
+                changes.append(Change(corpus, stage, metric, before, after, worse))
+    return changes
+
+
+def _generate(args: argparse.Namespace) -> None:
+    sizes = {'easy': 200, 'medium': 100, 'hard': 30, 'diagonal': 50}
+    os.makedirs(CORPUS_DIR, exist_ok=True)
+    for name in args.corpus or CORPORA:
+        corpus = generate_corpus(name, sizes[name], args.seed)
+        with open(os.path.join(CORPUS_DIR, name + '.txt'), 'w') as f:
+            f.write('# {} corpus, generated by benchmark_suite.py with seed {}\n'.format(name, args.seed))
+            f.writelines(grid + '\n' for grid in corpus)
+        print('{}: {} puzzles'.format(name, len(corpus)), file=sys.stderr)
+
+
+def _run(args: argparse.Namespace) -> None:
+    corpora = dict((name, load_corpus(name)[:args.limit]) for name in args.corpus or CORPORA)
+    report = run(corpora, args.stage or list(STAGES), args.repeat)
+    text = json.dumps(report, indent=2, sort_keys=True, allow_nan=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+def _compare(args: argparse.Namespace) -> None:
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    for corpus in sorted(set(base['corpora']) & set(new['corpora'])):
+        if base['corpora'][corpus] != new['corpora'][corpus]:
+            print('warning: the {} corpus differs between the runs'.format(corpus), file=sys.stderr)
+    changes = compare(base, new, args.threshold)
+    print('{:<10} {:<16} {:<12} {:>14} {:>14} {:>8}'.format('corpus', 'stage', 'metric', 'base', 'new', 'change'))
+    for change in changes:
+        print('{:<10} {:<16} {:<12} {:>14.6g} {:>14.6g} {:>7.2f}x{}'.format(
+            change.corpus, change.stage, change.metric, change.base, change.new, change.ratio,
+            '  REGRESSION' if change.regression else ''))
+    regressions = sum(change.regression for change in changes)
+    print('{} regressions, {} improvements beyond {:.0%}'.format(
+        regressions, len(changes) - regressions, args.threshold), file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the solver pipeline on the bundled corpora.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    run_parser = commands.add_parser('run', help='benchmark every stage and write the results as JSON')
+    run_parser.add_argument('-o', '--output', help='the JSON file to write; defaults to standard output')
+    run_parser.add_argument('--corpus', action='append', choices=CORPORA, help='a corpus to run; defaults to all')
+    run_parser.add_argument('--stage', action='append', choices=sorted(STAGES), help='a stage to time; defaults to all')
+    run_parser.add_argument('--repeat', type=int, default=3, help='number of timing passes per stage')
+    run_parser.add_argument('--limit', type=int, default=None, help='use only the first puzzles of each corpus')
+    compare_parser = commands.add_parser('compare', help='flag regressions between two JSON results')
+    compare_parser.add_argument('base', help='the results of the baseline run')
+    compare_parser.add_argument('new', help='the results of the run to check')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='relative change that counts as a regression, e.g. 0.1 for 10%%')
+    generate_parser = commands.add_parser('generate', help='regenerate the bundled corpora')
+    generate_parser.add_argument('--corpus', action='append', choices=CORPORA, help='a corpus to generate')
+    generate_parser.add_argument('--seed', type=int, default=0, help='the random seed')
+    args = parser.parse_args()
+    {'run': _run, 'compare': _compare, 'generate': _generate}[args.command](args)
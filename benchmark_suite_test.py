@@ -0,0 +1,72 @@
+import copy
+import json
+import unittest
+
+import benchmark_suite
+import solution
+from topology import get_topology
+
+
+class TestCorpora(unittest.TestCase):
+    def test_bundled_corpora_are_reproducible(self):
+        for name in benchmark_suite.CORPORA:
+            self.assertEqual(benchmark_suite.generate_corpus(name, 3), benchmark_suite.load_corpus(name)[:3])
+
+    def test_diagonal_corpus_needs_diagonals(self):
+        classic = get_topology(3, diagonal=False)
+        for grid in benchmark_suite.load_corpus('diagonal')[:3]:
+            self.assertTrue(solution.is_unique(grid))
+            self.assertFalse(solution.is_unique(grid, topology=classic))
+
+    def test_hard_corpus_is_unique_and_needs_search(self):
+        for grid in benchmark_suite.load_corpus('hard')[:5]:
+            self.assertEqual(solution.count_solutions(grid), 1)
+            stats = solution.SearchStats()
+            solution.solve(grid, engine='bitmask', stats=stats)
+            self.assertGreater(stats.nodes, 1)
+
+
+class TestReport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        corpora = {'easy': benchmark_suite.load_corpus('easy')[:3]}
+        cls.report = benchmark_suite.run(corpora, ['grid_values', 'solve[bitmask]'], repeat=1)
+
+    def test_run(self):
+        results = self.report['results']['easy']
+        self.assertEqual(set(results), {'grid_values', 'solve[bitmask]'})
+        metrics = results['solve[bitmask]']
+        self.assertEqual(metrics['n'], 3)
+        self.assertLessEqual(metrics['p50'], metrics['p99'])
+        self.assertLessEqual(metrics['p99'], metrics['max'])
+        self.assertGreater(metrics['throughput'], 0)
+
+    def test_compare(self):
+        self.assertEqual(benchmark_suite.compare(self.report, self.report), [])
+        slower = copy.deepcopy(self.report)
+        metrics = slower['results']['easy']['grid_values']
+        metrics['p50'] *= 2
+        metrics['throughput'] /= 2
+        changes = benchmark_suite.compare(self.report, slower)
+        self.assertEqual(sorted(c.metric for c in changes), ['p50', 'throughput'])
+        self.assertTrue(all(c.regression for c in changes))
+        self.assertTrue(all(not c.regression for c in benchmark_suite.compare(slower, self.report)))
+
+    def test_empty_corpus_is_valid_json(self):
+        report = benchmark_suite.run({'empty': []}, ['grid_values'], repeat=1)
+        metrics = report['results']['empty']['grid_values']
+        self.assertIsNone(metrics['throughput'])
+        self.assertIsNone(metrics['p50'])
+        self.assertIsNone(metrics['max'])
+        self.assertEqual(json.loads(json.dumps(report, allow_nan=False)), report)
+        self.assertEqual(benchmark_suite.compare(report, report), [])
+
+    def test_percentile(self):
+        samples = [4.0, 1.0, 3.0, 2.0]
+        self.assertEqual(benchmark_suite.percentile(samples, 50), 2.0)
+        self.assertEqual(benchmark_suite.percentile(samples, 99), 4.0)
+        self.assertEqual(benchmark_suite.percentile(samples, 0), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,656 @@
+"""
+Compact bitmask candidate engine.
+
+The grid is stored as a flat list of integers, one per box in the order of
+``topology.boxes``. Bit ``i`` of an entry is set if ``topology.digits[i]`` is
+still a candidate for that box, so a solved box holds exactly one set bit and
+an empty (contradicting) box holds ``0``.
+
+Peers and units are taken from the index tables of the ``Topology``, which turns
+the string operations of the dictionary engine into integer arithmetic.
+"""
+
+from itertools import combinations
+from time import perf_counter
+from typing import List, Dict, Union, Iterable, Tuple, Callable, Sequence, Optional
+
+from solution import SudokuDict, SearchStats, StageStats, Budget
+from topology import Topology, DEFAULT_TOPOLOGY
+
+Grid = List[int]
+MaybeGrid = Union[Grid, bool]
+Unit = Tuple[int, ...]
+Narrowed = Union[List[int], bool]
+UnitRule = Callable[[Grid, Unit, Topology], Narrowed]
+
+
+def from_values(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> Grid:
+    """
+    Converts a sudoku in dictionary form into its bitmask form.
+
+    Parameters
+    ----------
+    values : SudokuDict
+        The sudoku in dictionary form.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grid
+        The sudoku as a list of candidate masks.
+    """
+    masks = topology.digit_masks
+    grid = []
+    for box in topology.boxes:
+        mask = 0
+        for d in values[box]:
+            mask |= masks[d]
+        grid.append(mask)
+    return grid
+
+
+def to_values(grid: Grid, topology: Topology = DEFAULT_TOPOLOGY) -> SudokuDict:
+    """
+    Converts a sudoku in bitmask form into its dictionary form.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    SudokuDict
+        The sudoku in dictionary form.
+    """
+    return dict(zip(topology.boxes, map(topology.values_table.__getitem__, grid)))
+
+
+def grid_masks(grid: str, topology: Topology = DEFAULT_TOPOLOGY) -> Grid:
+    """
+    Converts a grid string directly into its bitmask form.
+
+    Parameters
+    ----------
+    grid : str
+        A grid in string form, using ``.`` for empty boxes.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grid
+        The sudoku as a list of candidate masks.
+    """
+    masks = topology.digit_masks
+    result = [masks[c] if c != '.' else topology.all_digits
+              for c in grid
+              if c in masks or c == '.']
+    assert len(result) == len(topology.boxes)
+    return result
+
+
+def n_solved(grid: Grid) -> int:
+    """Determines how many boxes of the grid hold exactly one candidate."""
+    return sum(1 for mask in grid if mask and not mask & (mask - 1))
+
+
+def n_candidates(grid: Grid, topology: Topology = DEFAULT_TOPOLOGY) -> int:
+    """Counts the candidates left in all boxes."""
+    popcount = topology.popcount
+    return sum(popcount[mask] for mask in grid)
+
+
+def eliminate(grid: Grid, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeGrid:
+    """
+    Removes the digit of every solved box from the candidates of all its peers.
+
+    Stops as soon as a peer runs out of candidates, which also catches two peers
+    being solved with the same digit.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grid
+        The reduced grid.
+    False
+        A box ran out of candidates.
+    """
+    peers = topology.peer_table
+    solved = [box for box, mask in enumerate(grid) if mask and not mask & (mask - 1)]
+    for box in solved:
+        keep = ~grid[box]
+        for peer in peers[box]:
+            mask = grid[peer] & keep
+            if not mask:
+                return False
+            grid[peer] = mask
+    return grid
+
+
+def only_choice_unit(grid: Grid, unit: Unit, topology: Topology) -> Narrowed:
+    """
+    Assigns every digit that fits into exactly one box of the unit to that box.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    unit : Unit
+        The indices of the boxes of the unit.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    List[int]
+        The boxes whose candidates were narrowed.
+    False
+        A digit has no place in the unit, or a box is the only place for two digits.
+    """
+    # Digits seen in exactly one box are those in `once` but not in `more`.
+    once, more = 0, 0
+    for box in unit:
+        mask = grid[box]
+        more |= once & mask
+        once |= mask
+    if once != topology.all_digits:
+        return False
+    singles = once & ~more
+    changed = []
+    if singles:
+        for box in unit:
+            mask = grid[box]
+            digit = mask & singles
+            if digit and digit != mask:
+                if digit & (digit - 1):
+                    return False
+                grid[box] = digit
+                changed.append(box)
+    return changed
+
+
+def naked_twins_unit(grid: Grid, unit: Unit, topology: Topology) -> Narrowed:
+    """
+    Eliminates the digits of naked twins from the other boxes of the unit.
+
+    Boxes sharing the same ``N`` candidates, with exactly ``N`` such boxes,
+    lock these digits; see ``solution.naked_twins``.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    unit : Unit
+        The indices of the boxes of the unit.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    List[int]
+        The boxes whose candidates were narrowed.
+    False
+        A box ran out of candidates.
+    """
+    popcount = topology.popcount
+    size = topology.size
+    possible_twins = {}  # type: Dict[int, List[int]]
+    for box in unit:
+        mask = grid[box]
+        if 1 < popcount[mask] < size:
+            possible_twins.setdefault(mask, []).append(box)
+
+    changed = []
+    for mask, twins in possible_twins.items():
+        if len(twins) < 2 or len(twins) != popcount[mask]:
+            continue
+        for box in unit:
+            remaining = grid[box] & ~mask
+            if box not in twins and remaining != grid[box]:
+                if not remaining:
+                    return False
+                grid[box] = remaining
+                changed.append(box)
+    return changed
+
+
+def naked_subsets_unit(grid: Grid, unit: Unit, topology: Topology, max_size: int = 4) -> Narrowed:
+    """
+    Eliminates the digits of a naked pair, triple or quad from the other boxes of the unit.
+
+    ``N`` boxes whose candidates together hold exactly ``N`` digits lock these
+    digits, even if the boxes do not share identical candidates; e.g. the boxes
+    ``12``, ``23`` and ``13`` form a naked triple. The first subset that narrows
+    another box is applied; since this marks the unit as changed again, the
+    propagation revisits it for further subsets.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    unit : Unit
+        The indices of the boxes of the unit.
+    topology : Topology
+        The board topology.
+    max_size : int
+        The largest subset to look for.
+
+    Returns
+    -------
+    List[int]
+        The boxes whose candidates were narrowed.
+    False
+        More than ``N`` boxes are confined to ``N`` digits.
+    """
+    popcount = topology.popcount
+    unsolved = [box for box in unit if grid[box] & (grid[box] - 1)]
+    for k in range(2, min(max_size, len(unsolved) - 1) + 1):
+        masks = [grid[box] for box in unsolved if popcount[grid[box]] <= k]
+        if len(masks) < k:
+            continue
+        for subset in combinations(masks, k):
+            union = 0
+            for mask in subset:
+                union |= mask
+            if popcount[union] != k:
+                continue
+            # All boxes confined to the union form the subset; more than k of them cannot be placed.
+            locked = [box for box in unsolved if not grid[box] & ~union]
+            if len(locked) > k:
+                return False
+            changed = []
+            for box in unsolved:
+                mask = grid[box]
+                if mask & union and box not in locked:
+                    mask &= ~union
+                    grid[box] = mask
+                    changed.append(box)
+            if changed:
+                return changed
+    return []
+
+
+def _sweep_units(grid: Grid, topology: Topology, rule: UnitRule) -> MaybeGrid:
+    """Applies a unit rule to every unit until it no longer narrows that unit."""
+    for unit in topology.unit_table:
+        changed = rule(grid, unit, topology)
+        while changed:
+            changed = rule(grid, unit, topology)
+        if changed is False:
+            return False
+    return grid
+
+
+def only_choice(grid: Grid, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeGrid:
+    """
+    Assigns every digit that fits into exactly one box of a unit to that box.
+
+    Stops as soon as a digit has no box left in a unit, or a box is the only
+    place for two different digits.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grid
+        The reduced grid.
+    False
+        A unit cannot hold every digit.
+    """
+    for unit in topology.unit_table:
+        if only_choice_unit(grid, unit, topology) is False:
+            return False
+    return grid
+
+
+def naked_twins(grid: Grid, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeGrid:
+    """
+    Eliminates the digits of naked twins from the other boxes of their unit.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grid
+        The grid with the naked twins eliminated from their peers.
+    False
+        A peer ran out of candidates.
+    """
+    for unit in topology.unit_table:
+        if naked_twins_unit(grid, unit, topology) is False:
+            return False
+    return grid
+
+
+def naked_subsets(grid: Grid, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeGrid:
+    """
+    Eliminates the digits of all naked pairs, triples and quads from the other boxes of their unit.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grid
+        The reduced grid.
+    False
+        A contradiction was detected.
+    """
+    return _sweep_units(grid, topology, naked_subsets_unit)
+
+
+def reduce_puzzle(grid: Grid, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeGrid:
+    """
+    Iterates eliminate(), naked_twins() and only_choice() until no further box gets solved.
+
+    Every iteration sweeps all boxes and units; ``propagate`` reaches the same
+    reductions with work proportional to what changed and is used by ``search``.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grid
+        The reduced grid.
+    False
+        A contradiction was detected.
+    """
+    stalled = False
+    while not stalled:
+        solved_before = n_solved(grid)
+        for strategy in (eliminate, naked_twins, only_choice):
+            if strategy(grid, topology) is False:
+                return False
+        stalled = solved_before == n_solved(grid)
+    return grid
+
+
+# The unit rules applied by ``propagate`` unless specified otherwise. Naked subsets
+# save a few search nodes on hard puzzles, but cost more than they save; pass
+# ``(only_choice_unit, naked_subsets_unit)`` to use them.
+PROPAGATION_RULES = (only_choice_unit, naked_twins_unit)  # type: Tuple[UnitRule, ...]
+
+
+def propagate(grid: Grid, changed: Iterable[int], topology: Topology = DEFAULT_TOPOLOGY,
+              unit_rules: Sequence[UnitRule] = PROPAGATION_RULES) -> MaybeGrid:
+    """
+    Applies elimination and the unit rules starting from the changed boxes.
+
+    Instead of sweeping the whole grid, a worklist holds the solved boxes whose
+    digit still needs to be eliminated from their peers, and the units containing
+    a box whose candidates shrank. Only these are revisited, until both are empty.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    changed : Iterable[int]
+        The indices of the boxes whose candidates changed since the grid was last
+        propagated; pass all indices for a fresh grid.
+    topology : Topology
+        The board topology.
+    unit_rules : Sequence[UnitRule]
+        The rules applied to every changed unit, in order. The default rules
+        reach the fixpoint of ``reduce_puzzle``.
+
+    Returns
+    -------
+    Grid
+        The reduced grid.
+    False
+        A contradiction was detected.
+    """
+    peers = topology.peer_table
+    units = topology.unit_table
+    units_of = topology.box_units_table
+
+    solved = []  # type: List[int]
+    dirty_units = []  # type: List[int]
+    is_dirty = [False] * len(units)
+
+    def narrowed(box: int) -> None:
+        mask = grid[box]
+        if not mask & (mask - 1):
+            solved.append(box)
+        for u in units_of[box]:
+            if not is_dirty[u]:
+                is_dirty[u] = True
+                dirty_units.append(u)
+
+    for box in changed:
+        if not grid[box]:
+            return False
+        narrowed(box)
+
+    while solved or dirty_units:
+        # Elimination is the cheapest and most productive rule, so it runs to exhaustion first.
+        while solved:
+            box = solved.pop()
+            digit = grid[box]
+            for peer in peers[box]:
+                mask = grid[peer]
+                if mask & digit:
+                    mask ^= digit
+                    if not mask:
+                        return False
+                    grid[peer] = mask
+                    narrowed(peer)
+        if not dirty_units:
+            break
+
+        u = dirty_units.pop()
+        is_dirty[u] = False
+        for rule in unit_rules:
+            boxes = rule(grid, units[u], topology)
+            if boxes is False:
+                return False
+            for box in boxes:
+                narrowed(box)
+    return grid
+
+
+def _timed_propagate(grid: Grid, changed: Iterable[int], topology: Topology,
+                     unit_rules: Sequence[UnitRule], stats: SearchStats) -> MaybeGrid:
+    """Runs ``propagate``, recording its time and the candidates it removed in ``stats``."""
+    before = n_candidates(grid, topology)
+    start = perf_counter()
+    result = propagate(grid, changed, topology, unit_rules)
+    seconds = perf_counter() - start
+    stage = stats.stages.get('propagate')
+    if stage is None:
+        stage = stats.stages['propagate'] = StageStats()
+    stage.calls += 1
+    stage.seconds += seconds
+    if result is not False:
+        stage.removed += before - n_candidates(result, topology)
+    return result
+
+
+def search(grid: Grid, topology: Topology = DEFAULT_TOPOLOGY,
+           unit_rules: Sequence[UnitRule] = PROPAGATION_RULES,
+           stats: Optional[SearchStats] = None, budget: Optional[Budget] = None) -> MaybeGrid:
+    """
+    Using depth-first search and propagation, try all possible values.
+
+    Branches on the unsolved box with the fewest candidates (lowest index first)
+    and tries its digits in ascending order. After a guess, only the consequences
+    of that guess are propagated.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    topology : Topology
+        The board topology.
+    unit_rules : Sequence[UnitRule]
+        The unit rules to propagate with; see ``propagate``.
+    stats : SearchStats, optional
+        Counts the nodes, backtracks and depth of the search and records the
+        time and effect of every ``propagate`` call as the ``'propagate'`` stage.
+    budget : Budget, optional
+        Limits the nodes and time of the search and keeps the most reduced grid reached.
+
+    Returns
+    -------
+    Grid
+        The solved grid.
+    False
+        No solution could be found.
+
+    Raises
+    ------
+    BudgetExceeded
+        The budget was used up before the search finished.
+    """
+    if budget is not None:
+        budget.charge()
+    if stats is not None:
+        stats.enter(0)
+        if _timed_propagate(grid, range(len(grid)), topology, unit_rules, stats) is False:
+            return False
+    elif propagate(grid, range(len(grid)), topology, unit_rules) is False:
+        return False
+    if budget is not None:
+        budget.reached(grid, n_candidates(grid, topology))
+    return _search(grid, topology, unit_rules, stats, budget)
+
+
+def _search(grid: Grid, topology: Topology, unit_rules: Sequence[UnitRule],
+            stats: Optional[SearchStats] = None, budget: Optional[Budget] = None, depth: int = 0) -> MaybeGrid:
+    """Branches on a propagated grid; see ``search``."""
+    popcount = topology.popcount
+    n, box = min(((popcount[mask], box) for box, mask in enumerate(grid) if popcount[mask] > 1),
+                 default=(1, None))
+    if box is None:
+        return grid
+
+    candidates = grid[box]
+    while candidates:
+        digit = candidates & -candidates
+        candidates ^= digit
+        branch = grid[:]
+        branch[box] = digit
+        if stats is None and budget is None:
+            if propagate(branch, (box,), topology, unit_rules) is False:
+                continue
+            attempt = _search(branch, topology, unit_rules)
+        else:
+            if stats is not None:
+                stats.enter(depth + 1)
+            if budget is not None:
+                budget.charge()
+            if stats is None:
+                propagated = propagate(branch, (box,), topology, unit_rules)
+            else:
+                propagated = _timed_propagate(branch, (box,), topology, unit_rules, stats)
+            if propagated is False:
+                attempt = False
+            else:
+                if budget is not None:
+                    budget.reached(branch, n_candidates(branch, topology))
+                attempt = _search(branch, topology, unit_rules, stats, budget, depth + 1)
+            if not attempt and stats is not None:
+                stats.backtracks += 1
+        if attempt:
+            return attempt
+    return False
+
+
+def count_solutions(grid: Grid, topology: Topology = DEFAULT_TOPOLOGY, limit: int = 2,
+                    unit_rules: Sequence[UnitRule] = PROPAGATION_RULES) -> int:
+    """
+    Counts the solutions of a grid, stopping once ``limit`` solutions were found.
+
+    Explores the same search tree as ``search``, but only counts the solved leaves.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks. It is modified in place.
+    topology : Topology
+        The board topology.
+    limit : int
+        The number of solutions after which counting stops.
+    unit_rules : Sequence[UnitRule]
+        The unit rules to propagate with; see ``propagate``.
+
+    Returns
+    -------
+    int
+        The number of solutions, at most ``limit``.
+    """
+    if limit < 1 or propagate(grid, range(len(grid)), topology, unit_rules) is False:
+        return 0
+    return _count(grid, topology, unit_rules, limit)
+
+
+def _count(grid: Grid, topology: Topology, unit_rules: Sequence[UnitRule], limit: int) -> int:
+    """Counts up to ``limit`` solutions of a propagated grid; see ``count_solutions``."""
+    popcount = topology.popcount
+    n, box = min(((popcount[mask], box) for box, mask in enumerate(grid) if popcount[mask] > 1),
+                 default=(1, None))
+    if box is None:
+        return 1
+
+    count = 0
+    candidates = grid[box]
+    while candidates and count < limit:
+        digit = candidates & -candidates
+        candidates ^= digit
+        branch = grid[:]
+        branch[box] = digit
+        if propagate(branch, (box,), topology, unit_rules) is not False:
+            count += _count(branch, topology, unit_rules, limit - count)
+    return count
+
+
+def solve(grid: str, topology: Topology = DEFAULT_TOPOLOGY, stats: Optional[SearchStats] = None) -> MaybeGrid:
+    """
+    Find the solution to a Sudoku grid.
+
+    Parameters
+    ----------
+    grid : str
+        A string representing a sudoku grid.
+    topology : Topology
+        The board topology.
+    stats : SearchStats, optional
+        Collects the statistics of the search; see ``search``.
+
+    Returns
+    -------
+    Grid
+        The solved grid as a list of single-digit masks.
+    False
+        No solution could be found.
+    """
+    return search(grid_masks(grid, topology), topology, stats=stats)
@@ -0,0 +1,93 @@
+import unittest
+
+import bitmask
+import solution
+import solution_test
+from topology import DEFAULT_TOPOLOGY
+
+
+class TestConversion(unittest.TestCase):
+    def test_round_trip(self):
+        values = solution_test.TestNakedTwins.before_naked_twins_1
+        self.assertEqual(bitmask.to_values(bitmask.from_values(values)), values)
+
+    def test_grid_masks(self):
+        grid = solution_test.TestDiagonalSudoku.diagonal_grid
+        self.assertEqual(bitmask.grid_masks(grid), bitmask.from_values(solution.grid_values(grid)))
+
+
+class TestBitmaskEngine(unittest.TestCase):
+    hard_grid = '2.79.....8..7.....4....3.....6....9..8...2.5.......4..6.2.7.8.......1.......649..'
+
+    def test_naked_twins(self):
+        twins = solution_test.TestNakedTwins
+        for before, expected in ((twins.before_naked_twins_1, twins.possible_solutions_1),
+                                 (twins.before_naked_twins_2, twins.possible_solutions_2)):
+            grid = bitmask.naked_twins(bitmask.from_values(before))
+            self.assertIn(bitmask.to_values(grid), expected)
+
+    def test_contradictions(self):
+        self.assertIs(bitmask.eliminate(bitmask.grid_masks('22' + '.' * 79)), False)
+        grid = bitmask.grid_masks('.' * 81)
+        for box in DEFAULT_TOPOLOGY.unit_table[0]:
+            grid[box] &= ~DEFAULT_TOPOLOGY.digit_masks['5']
+        self.assertIs(bitmask.only_choice(grid), False)
+        self.assertIs(bitmask.solve('1.......1' + '.' * 72), False)
+
+    def test_naked_triple(self):
+        masks = DEFAULT_TOPOLOGY.digit_masks
+        unit = DEFAULT_TOPOLOGY.unit_table[0]
+        grid = bitmask.grid_masks('.' * 81)
+        for box, digits in zip(unit, ('12', '23', '13')):
+            grid[box] = masks[digits[0]] | masks[digits[1]]
+        changed = bitmask.naked_subsets_unit(grid, unit, DEFAULT_TOPOLOGY)
+        self.assertEqual(changed, list(unit[3:]))
+        for box in unit[3:]:
+            self.assertEqual(DEFAULT_TOPOLOGY.mask_values(grid[box]), '456789')
+
+    def test_naked_subset_contradiction(self):
+        masks = DEFAULT_TOPOLOGY.digit_masks
+        unit = DEFAULT_TOPOLOGY.unit_table[0]
+        grid = bitmask.grid_masks('.' * 81)
+        for box in unit[:3]:
+            grid[box] = masks['1'] | masks['2']
+        self.assertIs(bitmask.naked_subsets_unit(grid, unit, DEFAULT_TOPOLOGY), False)
+
+    def test_solve_with_naked_subsets(self):
+        rules = (bitmask.only_choice_unit, bitmask.naked_subsets_unit)
+        self.assertEqual(bitmask.search(bitmask.grid_masks(self.hard_grid), unit_rules=rules),
+                         bitmask.search(bitmask.grid_masks(self.hard_grid)))
+
+    @staticmethod
+    def sweep(grid):
+        """Repeats the full-sweep reduction until the grid no longer changes."""
+        while True:
+            before = grid[:]
+            if bitmask.reduce_puzzle(grid) is False:
+                return False
+            if grid == before:
+                return grid
+
+    def test_propagate_reaches_sweep_fixpoint(self):
+        for grid in (solution_test.TestDiagonalSudoku.diagonal_grid, self.hard_grid):
+            self.assertEqual(bitmask.propagate(bitmask.grid_masks(grid), range(81)),
+                             self.sweep(bitmask.grid_masks(grid)))
+
+    def test_propagate_from_changed_box(self):
+        grid = bitmask.propagate(bitmask.grid_masks(self.hard_grid), range(81))
+        box = next(box for box, mask in enumerate(grid) if DEFAULT_TOPOLOGY.popcount[mask] > 1)
+        guess = grid[:]
+        guess[box] &= -guess[box]
+        self.assertEqual(bitmask.propagate(guess[:], (box,)), self.sweep(guess[:]))
+
+    def test_solve(self):
+        self.assertEqual(solution.solve(solution_test.TestDiagonalSudoku.diagonal_grid, engine='bitmask'),
+                         solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            solution.solve(solution_test.TestDiagonalSudoku.diagonal_grid, engine='abacus')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,271 @@
+"""
+Canonical forms of sudoku grids and a solution cache keyed by them.
+
+Two grids are equivalent if one can be turned into the other by a symmetry of
+the board that maps solutions to solutions. The symmetries used here preserve
+the diagonal units, so they hold for classic boards just as well:
+
+* relabelling the digits,
+* transposing the grid and mirroring it top to bottom (together with the other
+  two, all rotations and reflections of the square),
+* permuting the rows by a permutation ``p`` that keeps the bands intact and
+  commutes with reversal (``p(n-1-i) = n-1-p(i)``), and the columns by the same
+  ``p``, which maps both diagonals onto themselves.
+
+The canonical form of a grid is the lexicographically smallest grid among all
+its transforms, with digits relabelled in order of their first appearance.
+The symmetry group grows too quickly beyond 9x9 boards for this to pay off, so
+``SolveCache`` only matches identical grids on larger boards.
+"""
+
+from collections import OrderedDict
+from functools import lru_cache as cache
+from itertools import permutations, product
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import solution
+from solution import MaybeSolution
+from topology import Topology, DEFAULT_TOPOLOGY
+
+# Largest box size for which the cache looks up grids by their canonical form.
+MAX_CANONICAL_BOX_SIZE = 3
+
+# A transform maps position j of the transformed grid to this position of the original grid.
+Permutation = Tuple[int, ...]
+
+
+class Transform(NamedTuple):
+    """
+    How a grid maps onto its canonical form.
+
+    Attributes
+    ----------
+    positions : Permutation
+        Box ``j`` of the canonical grid is box ``positions[j]`` of the original grid.
+    digits : Dict[str, str]
+        The canonical label of every digit of the original grid.
+    """
+    positions: Permutation
+    digits: Dict[str, str]
+
+
+class CacheInfo(NamedTuple):
+    """The statistics of a ``SolveCache``, like those of ``functools.lru_cache``."""
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+def _line_permutations(box_size: int) -> List[Permutation]:
+    """Lists the row permutations that keep the bands intact and commute with reversal."""
+    n = box_size * box_size
+    last = box_size - 1
+    mirrored = [q for q in permutations(range(box_size)) if all(q[last - k] == last - q[k] for k in range(box_size))]
+    result = []
+    for bands in permutations(range(box_size)):
+        if any(bands[last - j] != last - bands[j] for j in range(box_size)):
+            continue
+        # Bands in the upper half choose their row order freely, the lower half mirrors it.
+        free = [j for j in range(box_size) if j <= last - j]
+        choices = [mirrored if j == last - j else list(permutations(range(box_size))) for j in free]
+        for orders in product(*choices):
+            p = [0] * n
+            for j, q in zip(free, orders):
+                for k in range(box_size):
+                    p[j * box_size + k] = bands[j] * box_size + q[k]
+                    p[(last - j) * box_size + last - k] = n - 1 - p[j * box_size + k]
+            result.append(tuple(p))
+    return result
+
+
+@cache(maxsize=None)
+def symmetries(box_size: int = 3) -> Tuple[Permutation, ...]:
+    """
+    Lists the positional symmetries of a board that preserve its diagonals.
+
+    There are 96 of them on a 9x9 board, but 18432 on a 16x16 board, and the
+    tables of a 25x25 board no longer fit in memory.
+
+    Parameters
+    ----------
+    box_size : int
+        The number of rows and columns of a square unit.
+
+    Returns
+    -------
+    Tuple[Permutation, ...]
+        For every symmetry, the original position of each box of the transformed grid.
+    """
+    n = box_size * box_size
+    result = set()
+    for p in _line_permutations(box_size):
+        for transpose, mirror in product((False, True), repeat=2):
+            positions = []
+            for row in range(n):
+                for col in range(n):
+                    r, c = p[row], p[col]
+                    if transpose:
+                        r, c = c, r
+                    if mirror:
+                        r = n - 1 - r
+                    positions.append(r * n + c)
+            result.add(tuple(positions))
+    return tuple(sorted(result))
+
+
+def canonical_form(grid: str, topology: Topology = DEFAULT_TOPOLOGY) -> Tuple[str, Transform]:
+    """
+    Determines the canonical form of a grid.
+
+    The transformed grids are compared box by box, and a transform is dropped as soon as
+    its grid is larger than another's, so most transforms are given up after a few boxes.
+
+    Parameters
+    ----------
+    grid : str
+        A grid in string form, using ``.`` for empty boxes.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Tuple[str, Transform]
+        The canonical grid and the transform that maps the grid onto it.
+    """
+    grid = solution.normalize_grid(grid, topology)
+    digits = topology.digits
+    # Build all transformed grids box by box, dropping every transform that falls behind the smallest.
+    active = [(positions, {}) for positions in symmetries(topology.box_size)]  # type: List[Tuple[Permutation, Dict]]
+    prefix = []  # type: List[str]
+    while len(active) > 1 and len(prefix) < len(grid):
+        j = len(prefix)
+        best, survivors = None, []
+        for positions, labels in active:
+            d = grid[positions[j]]
+            if d != '.' and d not in labels:
+                labels[d] = digits[len(labels)]
+            d = labels.get(d, '.')
+            if best is None or d < best:
+                best, survivors = d, [(positions, labels)]
+            elif d == best:
+                survivors.append((positions, labels))
+        active = survivors
+        prefix.append(best)
+
+    # Transforms still tied produce the same grid; finish the first one.
+    positions, labels = active[0]
+    for p in positions[len(prefix):]:
+        d = grid[p]
+        if d != '.' and d not in labels:
+            labels[d] = digits[len(labels)]
+        prefix.append(labels.get(d, '.'))
+    return ''.join(prefix), Transform(positions, labels)
+
+
+def _identity(grid: str, topology: Topology) -> Tuple[str, Transform]:
+    """Keys a grid by itself, for boards whose symmetry group is too large to search."""
+    grid = solution.normalize_grid(grid, topology)
+    return grid, Transform(tuple(range(len(grid))), dict(zip(topology.digits, topology.digits)))
+
+
+def restore(canonical_solution: str, transform: Transform, topology: Topology = DEFAULT_TOPOLOGY) -> solution.SudokuDict:
+    """
+    Maps a solution of a canonical grid back onto the original grid.
+
+    Parameters
+    ----------
+    canonical_solution : str
+        The digits of the solved canonical grid.
+    transform : Transform
+        The transform returned by ``canonical_form`` for the original grid.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    SudokuDict
+        The solution of the original grid in dictionary form.
+    """
+    # Digits missing from the grid are interchangeable; assign them in order.
+    labels = dict(transform.digits)
+    unused = [d for d in topology.digits if d not in labels.values()]
+    missing = [d for d in topology.digits if d not in labels]
+    labels.update(zip(missing, unused))
+    original = dict((label, d) for d, label in labels.items())
+    boxes = topology.boxes
+    return dict((boxes[p], original[d]) for p, d in zip(transform.positions, canonical_solution))
+
+
+class SolveCache:
+    """
+    A bounded LRU cache of solutions in front of ``solution.solve``, keyed by canonical form.
+
+    Grids that are relabellings, rotations, reflections or diagonal-preserving
+    row and column permutations of a cached grid are answered from the cache.
+    On boards larger than 9x9, only identical grids are, because finding the
+    canonical form would take far longer than solving the grid.
+    For grids with several solutions, the returned solution may differ from the
+    one ``solve`` would find, but it always solves the grid.
+
+    Parameters
+    ----------
+    maxsize : int
+        The maximum number of cached solutions.
+    solver : Callable[..., MaybeSolution]
+        The function solving cache misses; called as ``solver(grid, engine=engine, topology=topology)``.
+    """
+
+    def __init__(self, maxsize: int = 1024, solver: Callable[..., MaybeSolution] = solution.solve):
+        self.maxsize = maxsize
+        self.solver = solver
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()  # type: OrderedDict
+
+    def solve(self, grid: str, engine: str = 'bitmask', topology: Topology = DEFAULT_TOPOLOGY) -> MaybeSolution:
+        """
+        Find the solution to a Sudoku grid, answering equivalent grids from the cache.
+
+        Parameters
+        ----------
+        grid : str
+            A string representing a sudoku grid.
+        engine : str
+            The solver engine to use on a cache miss; see ``solution.ENGINES``.
+        topology : Topology
+            The board topology.
+
+        Returns
+        -------
+        SudokuDict
+            The resulting sudoku in dictionary form.
+        False
+            No solution could be found.
+        """
+        if topology.box_size > MAX_CANONICAL_BOX_SIZE:
+            canonical, transform = _identity(grid, topology)
+        else:
+            canonical, transform = canonical_form(grid, topology)
+        key = (topology, canonical)
+        cached = self._cache.get(key)  # type: Optional[object]
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        else:
+            self.misses += 1
+            result = self.solver(canonical, engine=engine, topology=topology)
+            cached = ''.join(result[box] for box in topology.boxes) if result is not False else False
+            self._cache[key] = cached
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return restore(cached, transform, topology) if cached is not False else False
+
+    def cache_info(self) -> CacheInfo:
+        """Returns the hit and miss statistics of the cache."""
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._cache))
+
+    def cache_clear(self) -> None:
+        """Empties the cache and resets its statistics."""
+        self._cache.clear()
+        self.hits = self.misses = 0
@@ -0,0 +1,93 @@
+import random
+import time
+import unittest
+
+import canonical
+import solution
+import solution_test
+import topology_test
+from topology import get_topology
+
+
+def transform(grid, positions, relabel):
+    """Applies a symmetry and a digit relabelling to a grid."""
+    return ''.join(relabel.get(grid[p], '.') for p in positions)
+
+
+class TestCanonicalForm(unittest.TestCase):
+    grid = solution_test.TestDiagonalSudoku.diagonal_grid
+
+    def test_symmetries(self):
+        self.assertEqual(len(canonical.symmetries(3)), 96)
+        solved = solution_test.TestDiagonalSudoku.solved_diag_sudoku
+        digits = ''.join(solved[box] for box in solution.boxes())
+        for positions in canonical.symmetries(3):
+            values = solution.grid_values(transform(digits, positions, dict(zip(digits, digits))))
+            self.assertTrue(all(sorted(values[box] for box in unit) == list(solution.digits)
+                                for unit in solution.unit_list()))
+
+    def test_equivalent_grids(self):
+        rng = random.Random(0)
+        expected, _ = canonical.canonical_form(self.grid)
+        for _ in range(10):
+            positions = rng.choice(canonical.symmetries(3))
+            relabel = dict(zip(solution.digits, rng.sample(solution.digits, 9)))
+            self.assertEqual(canonical.canonical_form(transform(self.grid, positions, relabel))[0], expected)
+
+    def test_restore(self):
+        canonical_grid, t = canonical.canonical_form(self.grid)
+        solved = solution.solve(canonical_grid)
+        restored = canonical.restore(''.join(solved[box] for box in solution.boxes()), t)
+        self.assertEqual(restored, solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+
+
+class TestSolveCache(unittest.TestCase):
+    grid = solution_test.TestDiagonalSudoku.diagonal_grid
+
+    def test_hit_on_equivalent_grid(self):
+        cache = canonical.SolveCache()
+        self.assertEqual(cache.solve(self.grid), solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+        rotated = transform(self.grid, canonical.symmetries(3)[-1], dict(zip('123456789', '987654321')))
+        result = cache.solve(rotated)
+        self.assertEqual(cache.cache_info(), canonical.CacheInfo(hits=1, misses=1, maxsize=1024, currsize=1))
+        self.assertEqual(result, solution.solve(rotated))
+
+    def test_bounded(self):
+        cache = canonical.SolveCache(maxsize=1)
+        cache.solve(self.grid)
+        cache.solve(solution_test.TestBacktracking.grid)
+        cache.solve(self.grid)
+        self.assertEqual(cache.cache_info(), canonical.CacheInfo(hits=0, misses=3, maxsize=1, currsize=1))
+        cache.cache_clear()
+        self.assertEqual(cache.cache_info(), canonical.CacheInfo(hits=0, misses=0, maxsize=1, currsize=0))
+
+    def test_unsolvable(self):
+        cache = canonical.SolveCache()
+        self.assertIs(cache.solve('1.......1' + '.' * 72), False)
+        self.assertIs(cache.solve('2.......2' + '.' * 72), False)
+        self.assertEqual(cache.cache_info().hits, 1)
+
+    def test_classic_board(self):
+        topology = get_topology(2, diagonal=False)
+        cache = canonical.SolveCache()
+        result = cache.solve('1...' '..2.' '.3..' '...4', topology=topology)
+        self.assertTrue(solution.is_solved(result, topology))
+        self.assertEqual(result['A1'], '1')
+
+    def test_large_board_not_slower(self):
+        topology = get_topology(4, diagonal=False)
+        grid = topology_test.TestLargeBoards.grid
+        start = time.perf_counter()
+        expected = solution.solve(grid, engine='bitmask', topology=topology)
+        direct = time.perf_counter() - start
+        cache = canonical.SolveCache()
+        for _ in range(2):
+            start = time.perf_counter()
+            self.assertEqual(cache.solve(grid, topology=topology), expected)
+            # Allow for timer noise on the cheap hit and miss paths.
+            self.assertLess(time.perf_counter() - start, 2 * direct + 0.05)
+        self.assertEqual(cache.cache_info().hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+"""
+Bulk parsing and serialization of grids in the bitmask form of the ``bitmask`` module.
+
+Grids are read straight from ``bytes``, ``bytearray`` or ``memoryview`` buffers
+and written back as records of one byte per box (81 bytes on a standard board),
+or packed into 4 bits per box, without going through the dictionary form.
+Byte-level translation tables built once per topology do the per-box work, and
+``parse_many`` handles a whole buffer of newline-separated grids in one call,
+e.g. ``to_records(bitmask.search(grid) for grid in parse_many(data))``.
+"""
+
+from functools import lru_cache as cache
+from typing import Iterable, List, Union
+
+import bitmask
+from bitmask import Grid, MaybeGrid
+from topology import Topology, DEFAULT_TOPOLOGY, MAX_POPCOUNT_TABLE_SIZE
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+EMPTY = ord('.')
+COMMENT = ord('#')
+
+
+class _MaskTable(dict):
+    """Maps masks to byte values, returning ``default`` for masks that are not in the table."""
+
+    def __init__(self, items, default: int):
+        super().__init__(items)
+        self.default = default
+
+    def __missing__(self, mask: int) -> int:
+        return self.default
+
+
+class _Tables:
+    """The translation tables of a topology used to parse and serialize grids."""
+
+    def __init__(self, topology: Topology):
+        # Byte value to mask; ``junk`` lists the bytes that are skipped, like ``normalize_grid`` does.
+        self.masks = [0] * 256
+        self.masks[EMPTY] = topology.all_digits
+        for digit, mask in topology.digit_masks.items():
+            self.masks[ord(digit)] = mask
+        self.junk = bytes(b for b in range(256) if not self.masks[b])
+
+        # Mask to byte value and to 4-bit code; unsolved boxes become ``.`` and ``0`` respectively.
+        singles = [(1 << i, i) for i in range(topology.size)]
+        if topology.size <= MAX_POPCOUNT_TABLE_SIZE:
+            self.chars = [EMPTY] * (topology.all_digits + 1)
+            self.nibbles = [0] * (topology.all_digits + 1)
+            for mask, i in singles:
+                self.chars[mask] = ord(topology.digits[i])
+                self.nibbles[mask] = i + 1
+        else:
+            self.chars = _MaskTable(((mask, ord(topology.digits[i])) for mask, i in singles), EMPTY)
+            self.nibbles = _MaskTable(((mask, i + 1) for mask, i in singles), 0)
+
+        # Packed byte to the masks of its two boxes.
+        nibble_masks = [topology.all_digits] + [1 << i for i in range(15)]
+        self.pairs = [(nibble_masks[b >> 4], nibble_masks[b & 15]) for b in range(256)]
+
+
+@cache(maxsize=None)
+def _tables(topology: Topology) -> _Tables:
+    return _Tables(topology)
+
+
+def parse(data: Buffer, topology: Topology = DEFAULT_TOPOLOGY) -> Grid:
+    """
+    Parses a single grid from a buffer into its bitmask form.
+
+    Like ``solution.grid_values``, bytes other than the digits of the topology and ``.`` are ignored.
+
+    Parameters
+    ----------
+    data : Buffer
+        The grid as ASCII bytes, using ``.`` for empty boxes.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grid
+        The sudoku as a list of candidate masks.
+    """
+    tables = _tables(topology)
+    chars = bytes(data).translate(None, tables.junk)
+    if len(chars) != len(topology.boxes):
+        raise ValueError('Expected {} boxes, found {}'.format(len(topology.boxes), len(chars)))
+    return list(map(tables.masks.__getitem__, chars))
+
+
+def parse_many(data: Buffer, topology: Topology = DEFAULT_TOPOLOGY) -> List[Grid]:
+    """
+    Parses a buffer of newline-separated grids, e.g. the contents of a puzzle file.
+
+    Empty lines and lines starting with ``#`` are skipped, as by ``solve_puzzles.read_grids``.
+
+    Parameters
+    ----------
+    data : Buffer
+        The grids as ASCII bytes, one per line.
+    topology : Topology
+        The board topology of all grids.
+
+    Returns
+    -------
+    List[Grid]
+        The grids in bitmask form.
+    """
+    tables = _tables(topology)
+    masks = tables.masks.__getitem__
+    n = len(topology.boxes)
+    grids = []  # type: List[Grid]
+    for number, line in enumerate(bytes(data).split(b'\n'), 1):
+        line = line.lstrip()
+        if not line or line[0] == COMMENT:
+            continue
+        chars = line.translate(None, tables.junk)
+        if len(chars) != n:
+            raise ValueError('Line {}: expected {} boxes, found {}'.format(number, n, len(chars)))
+        grids.append(list(map(masks, chars)))
+    return grids
+
+
+def to_record(grid: MaybeGrid, topology: Topology = DEFAULT_TOPOLOGY) -> bytes:
+    """
+    Serializes a grid into one byte per box.
+
+    Parameters
+    ----------
+    grid : MaybeGrid
+        The sudoku as a list of candidate masks, or ``False`` if it has no solution.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    bytes
+        The digit of every solved box and ``.`` for all other boxes; all ``.`` for ``False``.
+    """
+    if grid is False:
+        return b'.' * len(topology.boxes)
+    return bytes(map(_tables(topology).chars.__getitem__, grid))
+
+
+def to_records(grids: Iterable[MaybeGrid], topology: Topology = DEFAULT_TOPOLOGY) -> bytes:
+    """Serializes grids into newline-terminated records; see ``to_record``."""
+    return b''.join(to_record(grid, topology) + b'\n' for grid in grids)
+
+
+def pack(grid: Grid, topology: Topology = DEFAULT_TOPOLOGY) -> bytes:
+    """
+    Packs a grid into 4 bits per box, the first box in the high bits.
+
+    Solved boxes are stored as their digit index plus one and all other boxes as ``0``,
+    so a standard grid takes 41 bytes. Boards with more than 15 digits do not fit.
+
+    Parameters
+    ----------
+    grid : Grid
+        The sudoku as a list of candidate masks.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    bytes
+        The packed grid.
+    """
+    if topology.size > 15:
+        raise ValueError('Only boards with up to 15 digits can be packed into 4 bits per box')
+    codes = list(map(_tables(topology).nibbles.__getitem__, grid))
+    if len(codes) % 2:
+        codes.append(0)
+    return bytes(map(int.__or__, map((16).__mul__, codes[::2]), codes[1::2]))
+
+
+def unpack(data: Buffer, topology: Topology = DEFAULT_TOPOLOGY) -> Grid:
+    """
+    Unpacks a grid packed by ``pack``; empty boxes get all digits as candidates.
+
+    Parameters
+    ----------
+    data : Buffer
+        The packed grid.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grid
+        The sudoku as a list of candidate masks.
+    """
+    pairs = _tables(topology).pairs
+    n = len(topology.boxes)
+    if len(data) != (n + 1) // 2:
+        raise ValueError('Expected {} bytes, found {}'.format((n + 1) // 2, len(data)))
+    return [mask for b in bytes(data) for mask in pairs[b]][:n]
+
+
+def solve_records(data: Buffer, topology: Topology = DEFAULT_TOPOLOGY) -> bytes:
+    """
+    Solves a buffer of newline-separated grids with the bitmask engine.
+
+    Parameters
+    ----------
+    data : Buffer
+        The grids as ASCII bytes, one per line; see ``parse_many``.
+    topology : Topology
+        The board topology of all grids.
+
+    Returns
+    -------
+    bytes
+        One newline-terminated record per grid; see ``to_record``.
+    """
+    return to_records((bitmask.search(grid, topology) for grid in parse_many(data, topology)), topology)
@@ -0,0 +1,55 @@
+import unittest
+
+import bitmask
+import codec
+import solution_test
+from topology import get_topology
+
+
+class TestCodec(unittest.TestCase):
+    grid = solution_test.TestDiagonalSudoku.diagonal_grid
+
+    def test_parse(self):
+        expected = bitmask.grid_masks(self.grid)
+        data = self.grid.encode('ascii')
+        self.assertEqual(codec.parse(data), expected)
+        self.assertEqual(codec.parse(memoryview(data)), expected)
+        self.assertEqual(codec.parse(bytearray(b'|' + data + b'\r\n')), expected)
+        with self.assertRaises(ValueError):
+            codec.parse(data[1:])
+
+    def test_parse_many(self):
+        other = solution_test.TestBacktracking.grid
+        data = '# comment 123\n{}\r\n\n  {}'.format(self.grid, other).encode('ascii')
+        self.assertEqual(codec.parse_many(memoryview(data)), [bitmask.grid_masks(self.grid), bitmask.grid_masks(other)])
+        with self.assertRaises(ValueError) as context:
+            codec.parse_many(b'123\n' + data)
+        self.assertIn('Line 1', str(context.exception))
+
+    def test_records(self):
+        solved = bitmask.solve(self.grid)
+        expected = ''.join(solution_test.TestDiagonalSudoku.solved_diag_sudoku[box]
+                           for box in get_topology().boxes).encode('ascii')
+        self.assertEqual(codec.to_record(solved), expected)
+        self.assertEqual(codec.to_record(codec.parse(self.grid.encode('ascii'))), self.grid.encode('ascii'))
+        self.assertEqual(codec.to_record(False), b'.' * 81)
+        unsolvable = b'1.......1' + b'.' * 72
+        self.assertEqual(codec.solve_records(self.grid.encode('ascii') + b'\n' + unsolvable),
+                         expected + b'\n' + b'.' * 81 + b'\n')
+
+    def test_pack(self):
+        grid = codec.parse(self.grid.encode('ascii'))
+        packed = codec.pack(grid)
+        self.assertEqual(len(packed), 41)
+        self.assertEqual(codec.unpack(packed), grid)
+        topology = get_topology(2, diagonal=False)
+        small = codec.parse(b'1..4' + b'.' * 12, topology)
+        self.assertEqual(codec.unpack(codec.pack(small, topology), topology), small)
+
+    def test_pack_large_board(self):
+        with self.assertRaises(ValueError):
+            codec.pack([1] * 256, get_topology(4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+"""
+Exact cover engine using Knuth's Algorithm X with dancing links.
+
+A sudoku is an exact cover problem: every candidate ``(box, digit)`` is a row
+that covers four (or, on a diagonal, five) constraints: the box holds a digit,
+and each of its units holds that digit. A solution is a set of rows covering
+every constraint exactly once.
+
+The links of the sparse matrix are stored in flat integer lists rather than
+node objects, so that covering and uncovering a column is plain list indexing.
+"""
+
+from itertools import islice
+from typing import List, Iterator, Sequence, Tuple
+
+from solution import SudokuDict, MaybeSolution, grid_values
+from topology import Box, Topology, DEFAULT_TOPOLOGY
+
+Candidate = Tuple[Box, str]
+
+
+class DancingLinks:
+    """
+    A sparse 0/1 matrix as a toroidal doubly-linked list of its ones.
+
+    Node ``0`` is the root and nodes ``1..n_columns`` are the column headers;
+    every ``add_row`` appends one node per covered column.
+
+    Parameters
+    ----------
+    n_columns : int
+        The number of constraints.
+    """
+
+    def __init__(self, n_columns: int):
+        n = n_columns + 1
+        self.left = [i - 1 for i in range(n)]
+        self.left[0] = n_columns
+        self.right = [i + 1 for i in range(n)]
+        self.right[n_columns] = 0
+        self.up = list(range(n))
+        self.down = list(range(n))
+        self.column = list(range(n))
+        self.row = [-1] * n
+        self.size = [0] * n
+
+    def add_row(self, row: int, columns: Sequence[int]) -> None:
+        """Appends a row with ones in the given columns, numbered from ``1``."""
+        first = len(self.up)
+        for c in columns:
+            node = len(self.up)
+            self.column.append(c)
+            self.row.append(row)
+            self.up.append(self.up[c])
+            self.down.append(c)
+            self.down[self.up[c]] = node
+            self.up[c] = node
+            self.size[c] += 1
+            self.left.append(node - 1 if node > first else node)
+            self.right.append(first)
+            self.right[self.left[node]] = node
+            self.left[first] = node
+
+    def cover(self, c: int) -> None:
+        """Removes column ``c`` and all rows intersecting it from the matrix."""
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, c: int) -> None:
+        """Reverts ``cover(c)``; columns must be uncovered in reverse order."""
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+
+    def solutions(self) -> Iterator[List[int]]:
+        """
+        Enumerates all exact covers.
+
+        Always branches on the column with the fewest remaining rows.
+        The yielded list is reused; copy it to keep it past the next iteration.
+
+        Returns
+        -------
+        Iterator[List[int]]
+            The row numbers of every exact cover.
+        """
+        return self._search([])
+
+    def _search(self, selected: List[int]) -> Iterator[List[int]]:
+        right, down, size = self.right, self.down, self.size
+        if right[0] == 0:
+            yield selected
+            return
+
+        c, j = right[0], right[0]
+        while j != 0:
+            if size[j] < size[c]:
+                c = j
+                if size[c] < 2:
+                    break
+            j = right[j]
+        if not size[c]:
+            return
+
+        self.cover(c)
+        r = down[c]
+        while r != c:
+            selected.append(self.row[r])
+            j = self.right[r]
+            while j != r:
+                self.cover(self.column[j])
+                j = self.right[j]
+            yield from self._search(selected)
+            j = self.left[r]
+            while j != r:
+                self.uncover(self.column[j])
+                j = self.left[j]
+            selected.pop()
+            r = down[r]
+        self.uncover(c)
+
+
+def exact_cover(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> Tuple[DancingLinks, List[Candidate]]:
+    """
+    Builds the exact cover matrix of a sudoku from the units of its topology.
+
+    Parameters
+    ----------
+    values : SudokuDict
+        The sudoku in dictionary form; only the candidates of each box become rows.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Tuple[DancingLinks, List[Candidate]]
+        The matrix and the ``(box, digit)`` candidate of each of its rows.
+    """
+    n_boxes = len(topology.boxes)
+    n = topology.size
+    digit_index = dict((d, i) for i, d in enumerate(topology.digits))
+    matrix = DancingLinks(n_boxes + len(topology.unit_list) * n)
+    candidates = []  # type: List[Candidate]
+    for b, box in enumerate(topology.boxes):
+        units = topology.box_units_table[b]
+        for digit in values[box]:
+            d = digit_index[digit]
+            matrix.add_row(len(candidates), [b + 1] + [n_boxes + u * n + d + 1 for u in units])
+            candidates.append((box, digit))
+    return matrix, candidates
+
+
+def search(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeSolution:
+    """
+    Finds the first exact cover of the sudoku.
+
+    Parameters
+    ----------
+    values : SudokuDict
+        The sudoku in dictionary form.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    SudokuDict
+        The solved sudoku in dictionary form.
+    False
+        No solution could be found.
+    """
+    matrix, candidates = exact_cover(values, topology)
+    for rows in matrix.solutions():
+        return dict(candidates[r] for r in rows)
+    return False
+
+
+def count_solutions(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY, limit: int = 2) -> int:
+    """
+    Counts the exact covers of the sudoku, stopping once ``limit`` were found.
+
+    Parameters
+    ----------
+    values : SudokuDict
+        The sudoku in dictionary form.
+    topology : Topology
+        The board topology.
+    limit : int
+        The number of solutions after which counting stops.
+
+    Returns
+    -------
+    int
+        The number of solutions, at most ``limit``.
+    """
+    matrix, _ = exact_cover(values, topology)
+    return sum(1 for _ in islice(matrix.solutions(), max(limit, 0)))
+
+
+def solve(grid: str, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeSolution:
+    """
+    Find the solution to a Sudoku grid.
+
+    Parameters
+    ----------
+    grid : str
+        A string representing a sudoku grid.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    SudokuDict
+        The resulting sudoku in dictionary form.
+    False
+        No solution could be found.
+    """
+    return search(grid_values(grid, topology), topology)
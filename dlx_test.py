@@ -0,0 +1,43 @@
+import unittest
+
+import dlx
+import solution
+import solution_test
+from topology import get_topology
+
+
+class TestExactCover(unittest.TestCase):
+    def test_solve(self):
+        self.assertEqual(solution.solve(solution_test.TestDiagonalSudoku.diagonal_grid, engine='dlx'),
+                         solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+
+    def test_hard_grid(self):
+        grid = solution_test.TestBacktracking.grid
+        result = solution.solve(grid, engine='dlx')
+        self.assertTrue(solution.is_solved(result))
+        self.assertTrue(all(c == '.' or result[box] == c for box, c in zip(solution.boxes(), grid)))
+        self.assertTrue(all(sorted(result[box] for box in unit) == list(solution.digits)
+                            for unit in solution.unit_list()))
+
+    def test_unsolvable(self):
+        self.assertIs(solution.solve('1.......1' + '.' * 72, engine='dlx'), False)
+        self.assertIs(solution.solve('.....5.8....6.1.43..........1.5........1.6...3.......553.....61........4.........',
+                                     engine='dlx', topology=get_topology(3, diagonal=False)), False)
+
+    def test_enumerates_all_solutions(self):
+        # There are 288 classic 4x4 sudokus.
+        topology = get_topology(2, diagonal=False)
+        matrix, _ = dlx.exact_cover(solution.grid_values('.' * 16, topology), topology)
+        self.assertEqual(sum(1 for _ in matrix.solutions()), 288)
+
+    def test_matrix_restored_after_search(self):
+        topology = get_topology(2, diagonal=True)
+        matrix, _ = dlx.exact_cover(solution.grid_values('.' * 16, topology), topology)
+        links = (matrix.left[:], matrix.right[:], matrix.up[:], matrix.down[:], matrix.size[:])
+        first = sum(1 for _ in matrix.solutions())
+        self.assertEqual((matrix.left, matrix.right, matrix.up, matrix.down, matrix.size), links)
+        self.assertEqual(sum(1 for _ in matrix.solutions()), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
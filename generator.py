@@ -0,0 +1,300 @@
+"""
+Generates sudokus with a unique solution and grades their difficulty.
+
+A puzzle starts from a random complete grid, found by a depth-first search that
+branches on random boxes and digits. Clues are then removed in random order as
+long as the grid keeps a unique solution, down to a minimum number of clues.
+
+The grade of a puzzle records which strategies of a ``solution.Pipeline`` had to
+remove candidates and how many nodes ``search`` visited. Since the pipeline only
+runs a stage once all earlier (cheaper) stages have stalled, the strategies used
+are the ones the puzzle actually needs.
+
+Every puzzle is derived from the seed and its index alone, so ``generate_many``
+produces the same puzzles in the same order for a given seed, however many
+worker processes it uses.
+
+Example: ``python generator.py -n 100 --seed 1 --level hard > puzzles.txt``
+"""
+
+import argparse
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import count
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import bitmask
+import solution
+from bitmask import Grid, MaybeGrid
+from topology import Topology, DEFAULT_TOPOLOGY, get_topology
+
+Seed = Union[int, str]
+
+# The difficulty levels, from propagation with eliminate and only_choice alone to branching search.
+LEVELS = ('easy', 'medium', 'hard', 'expert')
+BASIC_STRATEGIES = {'eliminate', 'only_choice'}
+
+# The default number of puzzles ``generate_many`` generates per puzzle of the requested level before giving up.
+ATTEMPTS_PER_PUZZLE = 100
+
+
+class Grade(NamedTuple):
+    """
+    The difficulty of a puzzle.
+
+    Attributes
+    ----------
+    level : str
+        One of ``LEVELS``: ``'easy'`` if eliminate and only_choice solve the puzzle,
+        ``'medium'`` if naked twins are needed as well, ``'hard'`` if the locked
+        candidates or hidden pairs are needed, and ``'expert'`` if it takes a search.
+    strategies : Tuple[str, ...]
+        The pipeline stages that removed candidates, in pipeline order.
+    nodes : int
+        The number of search nodes, ``1`` if propagation alone solves the puzzle.
+    """
+    level: str
+    strategies: Tuple[str, ...]
+    nodes: int
+
+
+class Puzzle(NamedTuple):
+    """
+    A generated puzzle.
+
+    Attributes
+    ----------
+    grid : str
+        The puzzle in string form, using ``.`` for empty boxes.
+    solution : str
+        The digits of its unique solution.
+    grade : Grade
+        The difficulty of the puzzle.
+    """
+    grid: str
+    solution: str
+    grade: Grade
+
+
+def random_solution(rng: random.Random, topology: Topology = DEFAULT_TOPOLOGY) -> Grid:
+    """
+    Finds a random complete grid.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The source of randomness.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grid
+        The solved grid as a list of single-digit masks.
+    """
+    result = _fill([topology.all_digits] * len(topology.boxes), rng, topology)
+    assert result is not False
+    return result
+
+
+def _fill(grid: Grid, rng: random.Random, topology: Topology) -> MaybeGrid:
+    """Completes a propagated grid, branching on a random box with the fewest candidates."""
+    popcount = topology.popcount
+    fewest = min((popcount[mask] for mask in grid if popcount[mask] > 1), default=1)
+    if fewest == 1:
+        return grid
+
+    box = rng.choice([box for box, mask in enumerate(grid) if popcount[mask] == fewest])
+    digits = [1 << i for i in range(topology.size) if grid[box] & (1 << i)]
+    rng.shuffle(digits)
+    for digit in digits:
+        branch = grid[:]
+        branch[box] = digit
+        if bitmask.propagate(branch, (box,), topology) is False:
+            continue
+        attempt = _fill(branch, rng, topology)
+        if attempt:
+            return attempt
+    return False
+
+
+def dig(grid: List[str], rng: random.Random, min_clues: int = 0, topology: Topology = DEFAULT_TOPOLOGY) -> str:
+    """
+    Blanks out boxes in random order as long as the grid keeps a unique solution.
+
+    Parameters
+    ----------
+    grid : List[str]
+        The digit or ``.`` of every box of a grid with a unique solution. It is modified in place.
+    rng : random.Random
+        The source of randomness.
+    min_clues : int
+        Stops once the grid has this many clues left.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    str
+        The resulting puzzle in string form.
+    """
+    clues = sum(1 for digit in grid if digit != '.')
+    for box in rng.sample(range(len(grid)), len(grid)):
+        if clues <= min_clues:
+            break
+        if grid[box] == '.':
+            continue
+        digit, grid[box] = grid[box], '.'
+        if solution.is_unique(''.join(grid), topology=topology):
+            clues -= 1
+        else:
+            grid[box] = digit
+    return ''.join(grid)
+
+
+def grade(grid: str, topology: Topology = DEFAULT_TOPOLOGY) -> Grade:
+    """
+    Grades a puzzle by the strategies and search nodes needed to solve it.
+
+    Parameters
+    ----------
+    grid : str
+        The puzzle in string form.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    Grade
+        The difficulty of the puzzle.
+    """
+    pipeline = solution.default_pipeline().enable('hidden_pairs')
+    stats = solution.SearchStats()
+    solution.search(solution.grid_values(grid, topology), topology=topology, pipeline=pipeline, stats=stats)
+    strategies = tuple(stage.name for stage in pipeline.strategies if stage.removed)
+    if stats.nodes > 1:
+        level = 'expert'
+    elif set(strategies) <= BASIC_STRATEGIES:
+        level = 'easy'
+    elif set(strategies) <= BASIC_STRATEGIES | {'naked_twins'}:
+        level = 'medium'
+    else:
+        level = 'hard'
+    return Grade(level, strategies, stats.nodes)
+
+
+def generate(seed: Seed, topology: Topology = DEFAULT_TOPOLOGY, min_clues: int = 0) -> Puzzle:
+    """
+    Generates and grades a puzzle.
+
+    Parameters
+    ----------
+    seed : Seed
+        The random seed; the same seed always yields the same puzzle.
+    topology : Topology
+        The board topology.
+    min_clues : int
+        The number of clues at which removing clues stops; ``0`` digs until no
+        further clue can be removed without losing uniqueness.
+
+    Returns
+    -------
+    Puzzle
+        The puzzle, its solution and its grade.
+    """
+    rng = random.Random(seed)
+    solved = [topology.mask_values(mask) for mask in random_solution(rng, topology)]
+    grid = dig(solved[:], rng, min_clues, topology)
+    return Puzzle(grid, ''.join(solved), grade(grid, topology))
+
+
+def _generated(seeds: Iterator[Seed], workers: int, topology: Topology, min_clues: int) -> Iterator[Puzzle]:
+    """Generates the puzzles of all seeds in order, in rounds of a few seeds per worker."""
+    task = partial(generate, topology=topology, min_clues=min_clues)
+    if workers == 1:
+        yield from map(task, seeds)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            yield from pool.map(task, [next(seeds) for _ in range(4 * workers)])
+
+
+def generate_many(n: int, seed: Seed = 0, workers: Optional[int] = None, level: Optional[str] = None,
+                  min_clues: int = 0, topology: Topology = DEFAULT_TOPOLOGY,
+                  max_attempts: Optional[int] = None) -> Iterator[Puzzle]:
+    """
+    Generates puzzles in parallel, deterministically for a given seed.
+
+    Parameters
+    ----------
+    n : int
+        The number of puzzles.
+    seed : Seed
+        The random seed; puzzle ``i`` is generated from the seed ``'{seed}:{i}'``.
+    workers : int, optional
+        The number of worker processes; defaults to the number of CPUs.
+        With a single worker, the puzzles are generated in the calling process.
+    level : str, optional
+        Only yields puzzles of this level; see ``LEVELS``.
+    min_clues : int
+        The number of clues at which removing clues stops; see ``generate``.
+    topology : Topology
+        The board topology.
+    max_attempts : int, optional
+        The number of puzzles to generate at most in search of ``n`` puzzles of the level;
+        defaults to ``ATTEMPTS_PER_PUZZLE`` per requested puzzle.
+
+    Returns
+    -------
+    Iterator[Puzzle]
+        The puzzles, in the order of their seeds.
+
+    Raises
+    ------
+    ValueError
+        Fewer than ``n`` puzzles of the level were found within ``max_attempts`` puzzles.
+    """
+    if level is not None and level not in LEVELS:
+        raise ValueError('Unknown level {!r}; expected one of {}'.format(level, LEVELS))
+    if n < 1:
+        return
+    if max_attempts is None:
+        max_attempts = ATTEMPTS_PER_PUZZLE * n
+    seeds = ('{}:{}'.format(seed, i) for i in count())
+    found = 0
+    for attempts, puzzle in enumerate(_generated(seeds, workers or os.cpu_count() or 1, topology, min_clues), 1):
+        if level is None or puzzle.grade.level == level:
+            yield puzzle
+            found += 1
+            if found == n:
+                return
+        if attempts == max_attempts:
+            raise ValueError('Found only {} of {} {} puzzles in {} attempts'.format(found, n, level, attempts))
+
+
+def main(args: argparse.Namespace) -> None:
+    topology = get_topology(args.box_size, diagonal=not args.classic)
+    levels = dict((level, 0) for level in LEVELS)  # type: Dict[str, int]
+    for puzzle in generate_many(args.n, args.seed, args.workers, args.level, args.min_clues, topology):
+        levels[puzzle.grade.level] += 1
+        if args.annotate:
+            print('# {}, {} nodes: {}'.format(puzzle.grade.level, puzzle.grade.nodes,
+                                              ', '.join(puzzle.grade.strategies)))
+        print(puzzle.grid)
+    print(', '.join('{} {}'.format(n, level) for level, n in levels.items()), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates graded sudokus with a unique solution, one per line.')
+    parser.add_argument('-n', type=int, default=10, help='the number of puzzles')
+    parser.add_argument('--seed', default='0', help='the random seed')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--level', choices=LEVELS, default=None, help='only output puzzles of this level')
+    parser.add_argument('--min-clues', type=int, default=0, help='stop removing clues at this number of clues')
+    parser.add_argument('--annotate', action='store_true', help='precede every puzzle by a comment with its grade')
+    parser.add_argument('--box-size', type=int, default=3, help='size of a square unit')
+    parser.add_argument('--classic', action='store_true', help='generate classic sudokus without the diagonal units')
+    main(parser.parse_args())
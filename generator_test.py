@@ -0,0 +1,65 @@
+import random
+import unittest
+
+import bitmask
+import generator
+import solution
+import solution_test
+from topology import get_topology
+
+
+class TestGenerator(unittest.TestCase):
+    def test_random_solution(self):
+        grid = generator.random_solution(random.Random(1))
+        values = bitmask.to_values(grid)
+        self.assertTrue(solution.is_solved(values))
+        self.assertNotEqual(grid, generator.random_solution(random.Random(2)))
+
+    def test_generate(self):
+        puzzle = generator.generate(3)
+        self.assertEqual(puzzle, generator.generate(3))
+        self.assertTrue(solution.is_unique(puzzle.grid))
+        solved = solution.solve(puzzle.grid, engine='bitmask')
+        self.assertEqual(''.join(solved[box] for box in solution.boxes()), puzzle.solution)
+        self.assertIn(puzzle.grade.level, generator.LEVELS)
+
+    def test_min_clues(self):
+        puzzle = generator.generate(0, min_clues=40)
+        self.assertEqual(sum(1 for c in puzzle.grid if c != '.'), 40)
+        self.assertEqual(puzzle.grade, generator.Grade('easy', ('eliminate',), 1))
+
+    def test_classic(self):
+        topology = get_topology(2, diagonal=False)
+        puzzle = generator.generate('small', topology)
+        self.assertEqual(len(puzzle.grid), 16)
+        self.assertTrue(solution.is_unique(puzzle.grid, topology=topology))
+
+    def test_grade(self):
+        self.assertEqual(generator.grade(solution_test.TestDiagonalSudoku.diagonal_grid).nodes, 1)
+        hard = generator.grade(solution_test.TestBacktracking.grid)
+        self.assertEqual(hard.level, 'expert')
+        self.assertGreater(hard.nodes, 1)
+
+    def test_generate_many_is_deterministic(self):
+        sequential = list(generator.generate_many(4, seed=5, workers=1, min_clues=30))
+        parallel = list(generator.generate_many(4, seed=5, workers=2, min_clues=30))
+        self.assertEqual(sequential, parallel)
+        self.assertEqual(len(set(p.grid for p in sequential)), 4)
+
+    def test_level(self):
+        puzzles = list(generator.generate_many(2, seed=0, workers=1, level='easy', min_clues=36))
+        self.assertEqual([p.grade.level for p in puzzles], ['easy', 'easy'])
+        with self.assertRaises(ValueError):
+            list(generator.generate_many(1, level='trivial'))
+
+    def test_impossible_level(self):
+        # Generated 4x4 puzzles never need branching, so none of them is graded expert.
+        topology = get_topology(2, diagonal=False)
+        with self.assertRaises(ValueError):
+            list(generator.generate_many(1, workers=1, level='expert', topology=topology))
+        with self.assertRaises(ValueError):
+            list(generator.generate_many(1, workers=2, level='expert', topology=topology, max_attempts=10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,11 +14,25 @@ def AAfilledRoundedRect(surface, rect, color, radius=0.4):
     """
 
     rect = Rect(rect)
+    return surface.blit(rounded_rect(rect.size, color, radius), rect.topleft)
+
+
+def rounded_rect(size, color, radius=0.4):
+    """
+    rounded_rect(size,color,radius=0.4)
+
+    Renders the anti-aliased rounded rectangle drawn by AAfilledRoundedRect
+    onto a new surface, e.g. to render it once and blit it many times.
+
+    size    : width, height
+    color   : rgb or rgba
+    radius  : 0 <= radius <= 1
+    """
+
+    rect = Rect((0, 0), size)
     color = Color(*color)
     alpha = color.a
     color.a = 0
-    pos = rect.topleft
-    rect.topleft = 0, 0
     rectangle = Surface(rect.size, SRCALPHA)
 
     circle = Surface([min(rect.size) * 3] * 2, SRCALPHA)
@@ -39,7 +53,7 @@ def AAfilledRoundedRect(surface, rect, color, radius=0.4):
     rectangle.fill(color, special_flags=BLEND_RGBA_MAX)
     rectangle.fill((255, 255, 255, alpha), special_flags=BLEND_RGBA_MIN)
 
-    return surface.blit(rectangle, pos)
+    return rectangle
 
 
 class SudokuSquare:
@@ -0,0 +1,304 @@
+"""
+An asyncio front end to the solver that hands the work to a process pool.
+
+``SolverService.solve_async`` solves a single grid without blocking the event
+loop, and ``SolverService.solve_stream`` streams the results of a batch of grids
+with ``async for``. At most ``queue_limit`` grids are in flight at a time; further
+requests wait for a free slot, which pushes back on the producer.
+
+A timeout stops a runaway search inside the worker. It counts from the moment a
+request is made, including the time it waits for a free slot or worker. The dict and bitmask engines
+check it as the deadline of a search budget; the dlx engine is interrupted by an
+interval timer where the platform supports ``signal.setitimer``, elsewhere the
+request fails after the timeout but the worker finishes the search in the background.
+Cancelling a request that has not started yet removes it from the pool's queue.
+A request that is already running cannot be stopped, so it keeps its slot until
+its worker is done; ``queue_limit`` thus always bounds the work in the pool.
+
+Run ``python service.py --port 8765`` to serve the line protocol of
+``solve_puzzles.py`` over TCP, one grid per line in and one answer per line out,
+or ``python service.py --stdin`` to serve standard input. Grids that time out are
+answered with ``timeout``.
+"""
+
+import argparse
+import asyncio
+import signal
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from time import monotonic, perf_counter
+from typing import AsyncIterable, AsyncIterator, Iterable, Optional, Tuple, Union
+
+import solution
+from batch import BatchResult
+from solution import MaybeSolution
+from topology import Topology, DEFAULT_TOPOLOGY, get_topology
+
+Grids = Union[Iterable[str], AsyncIterable[str]]
+
+# Whether a worker can interrupt a search without a budget once the timeout expires.
+CAN_INTERRUPT = hasattr(signal, 'setitimer')
+
+# The engines that stop their own search at a deadline; see ``solution.solve``.
+BUDGETED_ENGINES = ('dict', 'bitmask')
+
+
+def _expired(signum, frame) -> None:
+    raise TimeoutError('search exceeded the timeout')
+
+
+def _solve(grid: str, engine: str, topology: Topology, deadline: Optional[float]) -> Tuple[MaybeSolution, float]:
+    """Solves a grid in a worker process, raising ``TimeoutError`` once the ``time.monotonic()`` deadline passed."""
+    start = perf_counter()
+    # The deadline was set on submission, so the time spent in the pool's queue counts against it.
+    if deadline is not None and monotonic() >= deadline:
+        raise TimeoutError('search exceeded the timeout')
+    if deadline is not None and engine in BUDGETED_ENGINES:
+        result = solution.solve(grid, engine=engine, topology=topology, deadline=deadline)
+        if result.status == solution.BUDGET_EXCEEDED:
+            raise TimeoutError('search exceeded the timeout')
+        return result.values if result.status == solution.SOLVED else False, perf_counter() - start
+    if deadline is None or not CAN_INTERRUPT:
+        return solution.solve(grid, engine=engine, topology=topology), perf_counter() - start
+    previous = signal.signal(signal.SIGALRM, _expired)
+    signal.setitimer(signal.ITIMER_REAL, max(deadline - monotonic(), 1e-6))
+    try:
+        return solution.solve(grid, engine=engine, topology=topology), perf_counter() - start
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class SolverService:
+    """
+    Solves grids on a process pool for asyncio code.
+
+    Use it as an asynchronous context manager, or call ``close`` when done.
+
+    Parameters
+    ----------
+    workers : int, optional
+        The number of worker processes; defaults to the number of CPUs.
+    queue_limit : int
+        The maximum number of grids submitted to the pool at any time.
+    timeout : float, optional
+        The default time limit for solving a single grid, in seconds.
+    engine : str
+        The solver engine to use; see ``solution.ENGINES``.
+    topology : Topology
+        The board topology of all grids.
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_limit: int = 64, timeout: Optional[float] = None,
+                 engine: str = 'bitmask', topology: Topology = DEFAULT_TOPOLOGY):
+        if queue_limit < 1:
+            raise ValueError('queue_limit must be positive')
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.engine = engine
+        self.topology = topology
+        self.in_flight = 0
+        self._slots = None  # type: Optional[asyncio.Semaphore]
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+
+    async def _run(self, grid: str, timeout: Optional[float]) -> Tuple[MaybeSolution, float]:
+        # Workers share the host's monotonic clock, so the deadline holds across processes.
+        deadline = monotonic() + timeout if timeout is not None else None
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.queue_limit)
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                future = self._executor.submit(_solve, grid, self.engine, self.topology, deadline)
+                try:
+                    if deadline is None or CAN_INTERRUPT or self.engine in BUDGETED_ENGINES:
+                        return await asyncio.wrap_future(future)
+                    try:
+                        return await asyncio.wait_for(asyncio.wrap_future(future), max(deadline - monotonic(), 0))
+                    except asyncio.TimeoutError:
+                        raise TimeoutError('search exceeded the timeout') from None
+                except asyncio.CancelledError:
+                    # A running search cannot be stopped; keep its slot until the worker is free again.
+                    if not future.cancel():
+                        await asyncio.wait([asyncio.wrap_future(future)])
+                    raise
+            finally:
+                self.in_flight -= 1
+
+    async def solve_async(self, grid: str, timeout: Optional[float] = None) -> MaybeSolution:
+        """
+        Find the solution to a Sudoku grid without blocking the event loop.
+
+        Parameters
+        ----------
+        grid : str
+            A string representing a sudoku grid.
+        timeout : float, optional
+            The time limit in seconds; defaults to the timeout of the service.
+
+        Returns
+        -------
+        SudokuDict
+            The resulting sudoku in dictionary form.
+        False
+            No solution could be found.
+
+        Raises
+        ------
+        TimeoutError
+            Solving took longer than the timeout.
+        """
+        result, _ = await self._run(grid, self.timeout if timeout is None else timeout)
+        return result
+
+    async def _result(self, index: int, grid: str, timeout: Optional[float]) -> BatchResult:
+        """Solves a grid of a batch, capturing exceptions in the result like ``batch.solve_many``."""
+        try:
+            result, seconds = await self._run(grid, timeout)
+        except Exception as e:
+            return BatchResult(index, grid, None, '{}: {}'.format(type(e).__name__, e), 0.0)
+        return BatchResult(index, grid, result, None, seconds)
+
+    async def solve_stream(self, grids: Grids, ordered: bool = True,
+                           timeout: Optional[float] = None) -> AsyncIterator[BatchResult]:
+        """
+        Solves many grids and streams back the results.
+
+        The grids are consumed lazily, only as fast as free slots become available.
+        A grid that fails or times out is reported through ``BatchResult.error``.
+        Leaving the ``async for`` loop early cancels the grids still pending.
+
+        Parameters
+        ----------
+        grids : Iterable[str] or AsyncIterable[str]
+            The grids in string form.
+        ordered : bool
+            If ``True``, results are yielded in input order, otherwise in completion order.
+        timeout : float, optional
+            The time limit per grid in seconds; defaults to the timeout of the service.
+
+        Returns
+        -------
+        AsyncIterator[BatchResult]
+            One result per input grid.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        pending = deque()  # type: deque
+        try:
+            index = 0
+            async for grid in _aiter(grids):
+                pending.append(asyncio.ensure_future(self._result(index, grid, timeout)))
+                index += 1
+                while len(pending) >= self.queue_limit:
+                    yield await self._next(pending, ordered)
+            while pending:
+                yield await self._next(pending, ordered)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def _next(pending: deque, ordered: bool) -> BatchResult:
+        if ordered:
+            return await pending.popleft()
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        task = done.pop()
+        pending.remove(task)
+        return task.result()
+
+    def format(self, result: BatchResult) -> str:
+        """Formats a result as a line of the ``solve_puzzles.py`` protocol."""
+        if result.error is not None:
+            return 'timeout' if result.error.startswith(TimeoutError.__name__) else 'error'
+        if result.solution is False:
+            return 'unsolvable'
+        return ''.join(result.solution[box] for box in self.topology.boxes)
+
+    async def serve_lines(self, lines: AsyncIterable[str], write) -> None:
+        """Answers every non-empty line with the formatted result of solving it; ``write`` may be a coroutine."""
+        grids = (line.strip() async for line in lines if line.strip() and not line.startswith('#'))
+        async for result in self.solve_stream(grids):
+            written = write(self.format(result) + '\n')
+            if asyncio.iscoroutine(written):
+                await written
+
+    async def serve_tcp(self, host: str = '127.0.0.1', port: int = 8765) -> asyncio.AbstractServer:
+        """Starts a TCP server answering grids line by line; returns the ``asyncio`` server."""
+        # Start the workers before accepting connections; a worker forked while a connection
+        # is open inherits its socket and keeps the client from ever seeing it closed.
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, get_topology, self.topology.box_size, self.topology.diagonal)
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            async def write(line: str) -> None:
+                writer.write(line.encode('ascii'))
+                await writer.drain()
+
+            try:
+                await self.serve_lines((line.decode('ascii', 'replace') async for line in reader), write)
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self) -> 'SolverService':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+async def _aiter(grids: Grids) -> AsyncIterator[str]:
+    """Iterates over a synchronous or asynchronous iterable of grids."""
+    if hasattr(grids, '__aiter__'):
+        async for grid in grids:
+            yield grid
+    else:
+        for grid in grids:
+            yield grid
+
+
+async def _stdin_lines() -> AsyncIterator[str]:
+    """Reads standard input line by line in a thread, so that the event loop keeps running."""
+    loop = asyncio.get_running_loop()
+    while True:
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line:
+            return
+        yield line
+
+
+async def main(args: argparse.Namespace) -> None:
+    topology = get_topology(args.box_size, diagonal=not args.classic)
+    async with SolverService(args.workers, args.queue_limit, args.timeout, args.engine, topology) as service:
+        if args.stdin:
+            await service.serve_lines(_stdin_lines(), partial(print, end='', flush=True))
+            return
+        server = await service.serve_tcp(args.host, args.port)
+        print('Serving on {}'.format(', '.join(str(s.getsockname()) for s in server.sockets)), file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serves the solver over TCP or standard input, one grid per line.')
+    parser.add_argument('--stdin', action='store_true', help='answer grids from standard input instead of TCP')
+    parser.add_argument('--host', default='127.0.0.1', help='the address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='the port to listen on')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--queue-limit', type=int, default=64, help='maximum number of grids in flight')
+    parser.add_argument('--timeout', type=float, default=None, help='time limit per grid in seconds')
+    parser.add_argument('--engine', choices=solution.ENGINES, default='bitmask', help='the solver engine')
+    parser.add_argument('--box-size', type=int, default=3, help='size of a square unit')
+    parser.add_argument('--classic', action='store_true', help='solve without the diagonal constraints')
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
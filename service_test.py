@@ -0,0 +1,135 @@
+import asyncio
+import time
+import unittest
+
+import benchmark
+import service
+import solution
+import solution_test
+from topology import get_topology
+
+# A classic puzzle on which the bitmask search takes more than a minute to prove that it has no solution
+IMPOSSIBLE = benchmark.PATHOLOGICAL['impossible']
+CLASSIC = get_topology(3, diagonal=False)
+CLASSIC_GRID = benchmark.PATHOLOGICAL['platinum']
+
+
+class TestSolverService(unittest.TestCase):
+    grids = [solution_test.TestDiagonalSudoku.diagonal_grid,
+             '4.......3..9.........1...7.....1.8.....5.9.....1.2.....3...5.........7..7.......8',
+             'not a sudoku']
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_solve_async(self):
+        async def run():
+            async with service.SolverService(workers=2) as solver:
+                return await asyncio.gather(*(solver.solve_async(grid) for grid in self.grids[:2]))
+
+        results = self.run_async(run())
+        self.assertEqual(results[0], solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+        self.assertTrue(solution.is_solved(results[1]))
+
+    def test_solve_stream(self):
+        async def grids():
+            for grid in self.grids * 3:
+                yield grid
+
+        async def run():
+            async with service.SolverService(workers=2, queue_limit=2) as solver:
+                results = []
+                async for result in solver.solve_stream(grids()):
+                    self.assertLessEqual(solver.in_flight, 2)
+                    results.append(result)
+                return results
+
+        results = self.run_async(run())
+        self.assertEqual([r.index for r in results], list(range(9)))
+        self.assertEqual([r.error is not None for r in results], [False, False, True] * 3)
+        self.assertEqual(results[3].solution, solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+
+    def test_timeout_aborts_search(self):
+        async def run():
+            async with service.SolverService(workers=1, timeout=0.2, topology=CLASSIC) as solver:
+                start = time.perf_counter()
+                with self.assertRaises(TimeoutError):
+                    await solver.solve_async(IMPOSSIBLE)
+                # The worker is free again once the search was aborted.
+                self.assertTrue(solution.is_solved(await solver.solve_async(CLASSIC_GRID, timeout=10)))
+                return time.perf_counter() - start
+
+        self.assertLess(self.run_async(run()), 5)
+
+    def test_timeout_counts_queued_time(self):
+        async def run():
+            async with service.SolverService(workers=1, topology=CLASSIC) as solver:
+                blocker = asyncio.ensure_future(solver.solve_async(IMPOSSIBLE, timeout=1))
+                await asyncio.sleep(0.05)
+                start = time.perf_counter()
+                # The request waits for the blocked worker for longer than its own timeout.
+                with self.assertRaises(TimeoutError):
+                    await solver.solve_async(CLASSIC_GRID, timeout=0.3)
+                with self.assertRaises(TimeoutError):
+                    await blocker
+                return time.perf_counter() - start
+
+        self.assertLess(self.run_async(run()), 5)
+
+    def test_cancellation(self):
+        async def run():
+            async with service.SolverService(workers=1, timeout=0.5, topology=CLASSIC) as solver:
+                blocker = asyncio.ensure_future(solver.solve_async(IMPOSSIBLE))
+                waiting = asyncio.ensure_future(solver.solve_async(CLASSIC_GRID))
+                await asyncio.sleep(0.05)
+                waiting.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await waiting
+                with self.assertRaises(TimeoutError):
+                    await blocker
+                return solver.in_flight
+
+        self.assertEqual(self.run_async(run()), 0)
+
+    def test_cancelled_request_keeps_its_slot(self):
+        async def run():
+            async with service.SolverService(workers=1, queue_limit=1, topology=CLASSIC) as solver:
+                blocker = asyncio.ensure_future(solver.solve_async(IMPOSSIBLE, timeout=1))
+                await asyncio.sleep(0.1)
+                start = time.perf_counter()
+                blocker.cancel()
+                await asyncio.sleep(0.1)
+                # The worker is still searching, so the slot stays taken.
+                self.assertEqual(solver.in_flight, 1)
+                self.assertTrue(solution.is_solved(await solver.solve_async(CLASSIC_GRID, timeout=10)))
+                elapsed = time.perf_counter() - start
+                with self.assertRaises(asyncio.CancelledError):
+                    await blocker
+                return elapsed
+
+        self.assertGreater(self.run_async(run()), 0.5)
+
+    def test_tcp(self):
+        async def run():
+            async with service.SolverService(workers=1) as solver:
+                server = await solver.serve_tcp('127.0.0.1', 0)
+                port = server.sockets[0].getsockname()[1]
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(''.join(grid + '\n' for grid in self.grids).encode('ascii'))
+                writer.write_eof()
+                # The connection is closed once every grid is answered.
+                lines = (await asyncio.wait_for(reader.read(), 30)).decode('ascii').splitlines()
+                writer.close()
+                server.close()
+                await server.wait_closed()
+                return lines
+
+        lines = self.run_async(run())
+        solved = solution_test.TestDiagonalSudoku.solved_diag_sudoku
+        self.assertEqual(len(lines), len(self.grids))
+        self.assertEqual(lines[0], ''.join(solved[box] for box in solution.boxes()))
+        self.assertEqual(lines[2], 'error')
+
+
+if __name__ == '__main__':
+    unittest.main()
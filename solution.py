@@ -1,80 +1,171 @@
-from functools import lru_cache as cache
-from typing import List, Set, Dict, Union
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from itertools import combinations
+from threading import local
+from time import monotonic, perf_counter
+from typing import List, Set, Dict, Union, Tuple, Iterable, Iterator, Optional, Callable, NamedTuple
+
+from topology import Box, Unit, Topology, DEFAULT_TOPOLOGY
+from topology import cross  # noqa: F401 (re-exported; cross was defined here before the topology module)
 
-Box = str
 Values = str
-Unit = List[Box]
 SudokuDict = Dict[Box, Values]
 MaybeSolution = Union[SudokuDict, bool]
+Diff = Tuple[Box, Values, Values]
+Trail = List[Tuple[Box, Values]]
+
+ENGINES = ('dict', 'bitmask', 'dlx')
+BACKTRACKING = ('copy', 'trail')
 
-assignments = []
+# The outcomes of a search with a budget; see ``solve``.
+SOLVED = 'solved'
+UNSAT = 'unsat'
+BUDGET_EXCEEDED = 'budget-exceeded'
+STATUSES = (SOLVED, UNSAT, BUDGET_EXCEEDED)
 
-# noinspection SpellCheckingInspection
-rows = 'ABCDEFGHI'
-cols = '123456789'
-digits = '123456789'
+# The standard 9x9 diagonal sudoku; see the topology module for other boards.
+rows = DEFAULT_TOPOLOGY.rows
+cols = ''.join(DEFAULT_TOPOLOGY.cols)
+digits = DEFAULT_TOPOLOGY.digits
 
 
-@cache(maxsize=None)
 def boxes() -> List[Box]:
     """Returns the list of all boxes."""
-    bs = cross(rows, cols)
-    assert len(bs) == 81
-    return bs
+    return DEFAULT_TOPOLOGY.boxes
 
 
-@cache(maxsize=None)
 def row_units() -> List[Unit]:
     """Returns the list of row-wise units."""
-    return [cross(r, cols) for r in rows]
+    return DEFAULT_TOPOLOGY.row_units
 
 
-@cache(maxsize=None)
 def column_units() -> List[Unit]:
     """Returns the list of column-wise units."""
-    return [cross(rows, c) for c in cols]
+    return DEFAULT_TOPOLOGY.column_units
 
 
-@cache(maxsize=None)
 def square_units() -> List[Unit]:
     """Returns the list of square units."""
-    return [cross(rs, cs)
-            for rs in ('ABC', 'DEF', 'GHI')
-            for cs in ('123', '456', '789')]
+    return DEFAULT_TOPOLOGY.square_units
 
 
-@cache(maxsize=None)
 def diagonal_units() -> List[Unit]:
-    """Returns the list of square units."""
-    return [[r + c for (r, c) in zip(rows, cols)],
-            [r + c for (r, c) in zip(reversed(rows), cols)]]
+    """Returns the list of diagonal units."""
+    return DEFAULT_TOPOLOGY.diagonal_units
 
 
-@cache(maxsize=None)
 def unit_list() -> List[Unit]:
-    """Returns the list of square units."""
-    return row_units() + column_units() + square_units() + diagonal_units()
+    """Returns the list of all units."""
+    return DEFAULT_TOPOLOGY.unit_list
 
 
-@cache(maxsize=None)
 def unit_dict() -> Dict[Box, List[Unit]]:
     """Returns the dictionary of all units a given box is in."""
-    return dict((s, [u for u in unit_list() if s in u])
-                for s in boxes())
+    return DEFAULT_TOPOLOGY.unit_dict
 
 
-@cache(maxsize=None)
 def peer_dict() -> Dict[Box, Set[Box]]:
     """Returns the dictionary of all peers a given box has."""
-    units = unit_dict()
-    return dict((s, set(sum(units[s], [])) - {s})
-                for s in boxes())
+    return DEFAULT_TOPOLOGY.peer_dict
+
+
+class Recorder:
+    """
+    Records the changes made by ``assign_value`` as compact ``(box, old, new)`` diffs.
+
+    The diffs are kept in a ring buffer of at most ``maxlen`` entries. Diffs falling
+    out of the buffer are folded into the base snapshot, so that ``snapshots()``
+    always replays a consistent sequence of grids ending in the latest state.
+    """
+
+    def __init__(self, maxlen: int = 100000):
+        if maxlen < 1:
+            raise ValueError('maxlen must be positive')
+        self.diffs = deque(maxlen=maxlen)  # type: deque
+        self.base = None  # type: Optional[SudokuDict]
+        self.dropped = 0
+
+    def record(self, values: SudokuDict, box: Box, new: Values) -> None:
+        """Records that ``box`` is about to change from its current value in ``values`` to ``new``."""
+        old = values[box]
+        if self.base is None:
+            self.base = dict(values)
+        if len(self.diffs) == self.diffs.maxlen:
+            dropped_box, _, dropped_value = self.diffs[0]
+            self.base[dropped_box] = dropped_value
+            self.dropped += 1
+        self.diffs.append((box, old, new))
+
+    def restore(self, current: SudokuDict, target: SudokuDict) -> None:
+        """Records the changes that revert the abandoned grid ``current`` to ``target``."""
+        for box in target:
+            if current[box] != target[box]:
+                self.record(current, box, target[box])
+
+    def snapshots(self) -> Iterator[SudokuDict]:
+        """
+        Replays the recorded diffs into full grids, one per diff.
+
+        Returns
+        -------
+        Iterator[SudokuDict]
+            The sudoku in dictionary form after each recorded change.
+        """
+        if self.base is None:
+            return
+        values = dict(self.base)
+        for box, _, new in self.diffs:
+            values[box] = new
+            yield dict(values)
+
+    def trace(self) -> Iterator[Union[SudokuDict, Diff]]:
+        """
+        Yields the base grid followed by the recorded ``(box, old, new)`` diffs.
+
+        This is the compact form of ``snapshots()`` accepted by ``visualize_assignments``.
+        """
+        if self.base is None:
+            return
+        yield dict(self.base)
+        yield from self.diffs
+
+
+class _SolveState(local):
+    """
+    The recorder enabled by ``recording`` and the trail of the grid being searched in place.
+
+    Both are thread-local, so that solves running concurrently in other threads never
+    record into another solve's recorder or write onto its trail.
+    """
+    recorder = None  # type: Optional[Recorder]
+    trail = None  # type: Optional[Trail]
+
+
+_state = _SolveState()
+
+
+@contextmanager
+def recording(recorder: Optional[Recorder]) -> Iterator[Optional[Recorder]]:
+    """
+    Enables recording of all ``assign_value`` changes into ``recorder`` within the context.
+
+    Parameters
+    ----------
+    recorder : Recorder, optional
+        The recorder to use; ``None`` disables recording.
+    """
+    previous, _state.recorder = _state.recorder, recorder
+    try:
+        yield recorder
+    finally:
+        _state.recorder = previous
 
 
 def assign_value(values: SudokuDict, box: Box, value: Values) -> SudokuDict:
     """
     Please use this function to update your values dictionary!
-    Assigns a value to a given box. If it updates the board record it.
+    Assigns a value to a given box. If recording is enabled, the change is recorded.
     
     Parameters
     ----------
@@ -95,13 +186,17 @@ def assign_value(values: SudokuDict, box: Box, value: Values) -> SudokuDict:
     if values[box] == value:
         return values
 
+    recorder = _state.recorder
+    if recorder is not None:
+        recorder.record(values, box, value)
+    trail = _state.trail
+    if trail is not None:
+        trail.append((box, values[box]))
     values[box] = value
-    if len(value) == 1:
-        assignments.append(dict(values))
     return values
 
 
-def naked_twins(values: SudokuDict) -> SudokuDict:
+def naked_twins(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeSolution:
     """
     Eliminate values using the naked twins strategy.
     
@@ -116,20 +211,24 @@ def naked_twins(values: SudokuDict) -> SudokuDict:
     ----------
     values : SudokuDict  
         The sudoku in dictionary form.
+    topology : Topology
+        The board topology.
         
     Returns
     -------
     SudokuDict
         The values dictionary with the naked twins eliminated from peers.
+    False
+        A peer ran out of candidates.
     """
 
     # Find all instances of naked twins
-    for unit in unit_list():
+    for unit in topology.unit_list:
         # We don't have to look at length-1 entries because identical entries of that are an error to begin with.
-        # Likewise we don't have to look at length-9 entries because they don't leave
+        # Likewise we don't have to look at entries holding all digits because they don't leave
         # room for removing anything from peers.
         possible_twins = {}  # type: Dict[Values, List[Box]]
-        candidates = ((values[box], box) for box in unit if 1 < len(values[box]) < 9)
+        candidates = ((values[box], box) for box in unit if 1 < len(values[box]) < topology.size)
         for candidate_digits, box in candidates:
             possible_twins.setdefault(candidate_digits, []).append(box)
 
@@ -144,50 +243,55 @@ def naked_twins(values: SudokuDict) -> SudokuDict:
             for peer in peers:
                 old_choices = values[peer]
                 new_choices = ''.join(c for c in old_choices if c not in candidate_digits)
+                if not new_choices:
+                    return False
                 values = assign_value(values, peer, new_choices)
 
     return values
 
 
-def cross(a: str, b: str) -> List[str]:
-    """
-    Cross product of elements in a and elements in b.
-    
-    Parameters
-    ----------
-    a : str  
-        The string from which to select the first character.
-    b : str  
-        The string from which to select the second character.
-        
-    Returns
-    -------
-    List[str]
-        The combinatorial values.
-    """
-    return [s+t for s in a for t in b]
-
-
-def grid_values(grid: str) -> SudokuDict:
+def grid_values(grid: str, topology: Topology = DEFAULT_TOPOLOGY) -> SudokuDict:
     """
     Convert grid into a dict of {square: char} with '123456789' for empties.
     
     Args:
         grid(string)
             A grid in string form.
+        topology(Topology)
+            The board topology; defines the boxes and the digits.
     Returns:
         A grid in dictionary form
             Keys: The boxes, e.g., 'A1'
             Values: The value in each box, e.g., '8'. If the box has no value, then the value will be '123456789'.
     """
-    chars = [c if c != '.' else digits
-             for c in grid
-             if c in digits or c == '.']
-    assert len(chars) == 81
-    return dict(zip(boxes(), chars))
+    all_digits = topology.digits
+    chars = [c if c != '.' else all_digits
+             for c in normalize_grid(grid, topology)]
+    return dict(zip(topology.boxes, chars))
+
+
+def normalize_grid(grid: str, topology: Topology = DEFAULT_TOPOLOGY) -> str:
+    """
+    Strips all characters that are neither digits nor ``.`` from a grid in string form.
+
+    Parameters
+    ----------
+    grid : str
+        A grid in string form, possibly containing separators or line breaks.
+    topology : Topology
+        The board topology; defines the boxes and the digits.
+
+    Returns
+    -------
+    str
+        The grid as one character per box.
+    """
+    chars = ''.join(c for c in grid if c in topology.digits or c == '.')
+    assert len(chars) == len(topology.boxes)
+    return chars
 
 
-def display(values: SudokuDict) -> None:
+def display(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> None:
     """
     Display the values as a 2-D grid.
     
@@ -195,70 +299,402 @@ def display(values: SudokuDict) -> None:
     ----------
     values : SudokuDict  
              The sudoku in dictionary form
+    topology : Topology
+             The board topology.
     """
     # This code is taken straight from the online quizzes.
-    width = 1+max(len(values[s]) for s in boxes())
-    line = '+'.join(['-'*(width*3)]*3)
-    for r in rows:
-        print(''.join(values[r+c].center(width)+('|' if c in '36' else '')
-                      for c in cols))
-        if r in 'CF':
+    n = topology.box_size
+    width = 1+max(len(values[s]) for s in topology.boxes)
+    line = '+'.join(['-'*(width*n)]*n)
+    for i, r in enumerate(topology.rows):
+        print(''.join(values[r+c].center(width)+('|' if j % n == n - 1 and j < topology.size - 1 else '')
+                      for j, c in enumerate(topology.cols)))
+        if i % n == n - 1 and i < topology.size - 1:
             print(line)
 
 
-def eliminate(values: SudokuDict) -> SudokuDict:
+def eliminate(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeSolution:
     """
     Goes through all the boxes, and whenever there is a box with a value, 
     eliminates this value from the values of all its peers.
 
+    Stops as soon as a peer runs out of candidates, which also catches two peers
+    being solved with the same digit.
+
     Parameters
     ----------
     values : SudokuDict  
         The sudoku in dictionary form
+    topology : Topology
+        The board topology.
         
     Returns
     -------
     SudokuDict
         The resulting sudoku in dictionary form.
+    False
+        A box ran out of candidates.
     """
-    peers = peer_dict()
+    peers = topology.peer_dict
     solved_values = [box for box in values.keys() if len(values[box]) == 1]
     for box in solved_values:
         digit = values[box]
         for peer in peers[box]:
-            values = assign_value(values, peer, values[peer].replace(digit, ''))
+            remaining = values[peer].replace(digit, '')
+            if not remaining:
+                return False
+            values = assign_value(values, peer, remaining)
     return values
 
 
-def only_choice(values: SudokuDict) -> SudokuDict:
+def only_choice(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeSolution:
     """
     Go through all the units, and whenever there is a unit with a value that only fits in one box, 
     assign the value to this box.
+    Stops as soon as a digit has no box left in a unit.
     
     Parameters
     ----------
     values : SudokuDict  
         The sudoku in dictionary form
+    topology : Topology
+        The board topology.
         
     Returns
     -------
     solution : SudokuDict
         The resulting sudoku in dictionary form.
+    False
+        A digit cannot be placed anywhere in a unit.
     """
     # Since a digit has to appear once in each unit belonging to a box,
     # we have to check these units individually.
-    for unit in unit_list():
-        for digit in digits:
+    for unit in topology.unit_list:
+        for digit in topology.digits:
             candidates = [box for box in unit
                           if digit in values[box]]
+            if not candidates:
+                return False
             if len(candidates) == 1:
                 values = assign_value(values, candidates[0], digit)
     return values
 
 
-def reduce_puzzle(values: SudokuDict) -> MaybeSolution:
+def hidden_pairs(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeSolution:
+    """
+    Restricts hidden pairs to their two digits.
+
+    Two digits that fit into the same two boxes of a unit, and nowhere else in that unit,
+    must occupy these boxes, so all other candidates can be removed from them.
+
+    Parameters
+    ----------
+    values : SudokuDict
+        The sudoku in dictionary form.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    SudokuDict
+        The resulting sudoku in dictionary form.
+    False
+        Three or more digits are confined to the same two boxes.
+    """
+    for unit in topology.unit_list:
+        places = {}  # type: Dict[Tuple[Box, ...], str]
+        for digit in topology.digits:
+            boxes = tuple(box for box in unit if digit in values[box])
+            if len(boxes) == 2:
+                places[boxes] = places.get(boxes, '') + digit
+
+        for boxes, pair in places.items():
+            if len(pair) > 2:
+                return False
+            if len(pair) == 2:
+                for box in boxes:
+                    values = assign_value(values, box, pair)
+    return values
+
+
+def naked_subsets(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY, max_size: int = 4) -> MaybeSolution:
+    """
+    Eliminates the digits of naked pairs, triples and quads from the other boxes of their unit.
+
+    Unlike ``naked_twins``, the boxes of a subset need not share identical candidates:
+    ``N`` boxes whose candidates together hold exactly ``N`` digits lock these digits,
+    e.g. the boxes ``12``, ``23`` and ``13`` form a naked triple.
+
+    Parameters
+    ----------
+    values : SudokuDict
+        The sudoku in dictionary form.
+    topology : Topology
+        The board topology.
+    max_size : int
+        The largest subset to look for.
+
+    Returns
+    -------
+    SudokuDict
+        The resulting sudoku in dictionary form.
+    False
+        More than ``N`` boxes of a unit are confined to ``N`` digits.
+    """
+    for unit in topology.unit_list:
+        unsolved = [box for box in unit if len(values[box]) > 1]
+        for k in range(2, min(max_size, len(unsolved) - 1) + 1):
+            for subset in combinations([box for box in unsolved if len(values[box]) <= k], k):
+                union = set(''.join(values[box] for box in subset))
+                if len(union) != k:
+                    continue
+                # All boxes confined to the union form the subset; more than k of them cannot be placed.
+                locked = [box for box in unsolved if set(values[box]) <= union]
+                if len(locked) > k:
+                    return False
+                for box in unsolved:
+                    if box not in locked:
+                        values = assign_value(values, box, ''.join(c for c in values[box] if c not in union))
+    return values
+
+
+def _locked_candidates(values: SudokuDict, topology: Topology, units: List[Unit]) -> MaybeSolution:
+    """
+    Removes digits whose places within one of the given units all lie in another unit
+    from the rest of that other unit; see ``pointing_pairs`` and ``box_line_reduction``.
+    """
+    for unit in units:
+        for digit in topology.digits:
+            boxes = [box for box in unit if digit in values[box]]
+            if len(boxes) < 2:
+                continue
+            for other in topology.unit_dict[boxes[0]]:
+                if other is unit or not all(box in other for box in boxes[1:]):
+                    continue
+                for peer in other:
+                    if peer in unit or digit not in values[peer]:
+                        continue
+                    remaining = values[peer].replace(digit, '')
+                    if not remaining:
+                        return False
+                    values = assign_value(values, peer, remaining)
+    return values
+
+
+def pointing_pairs(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeSolution:
+    """
+    Eliminates pointing pairs and triples.
+
+    If all places of a digit within a square unit lie on the same row, column or diagonal,
+    the digit must be placed in the square there and can be removed from the rest of that line.
+
+    Parameters
+    ----------
+    values : SudokuDict
+        The sudoku in dictionary form.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    SudokuDict
+        The resulting sudoku in dictionary form.
+    False
+        A box ran out of candidates.
+    """
+    return _locked_candidates(values, topology, topology.square_units)
+
+
+def box_line_reduction(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> MaybeSolution:
+    """
+    Eliminates digits by box/line reduction.
+
+    If all places of a digit within a row, column or diagonal lie in the same square unit,
+    the digit must be placed on the line there and can be removed from the rest of that square.
+
+    Parameters
+    ----------
+    values : SudokuDict
+        The sudoku in dictionary form.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    SudokuDict
+        The resulting sudoku in dictionary form.
+    False
+        A box ran out of candidates.
+    """
+    lines = topology.row_units + topology.column_units + topology.diagonal_units
+    return _locked_candidates(values, topology, lines)
+
+
+class StageStats:
+    """
+    The time spent in and the candidates removed by one propagation strategy.
+
+    Attributes
+    ----------
+    calls : int
+        How often the strategy was run.
+    seconds : float
+        The total time spent in the strategy.
+    removed : int
+        The total number of candidates the strategy removed.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.removed = 0
+
+    def __repr__(self) -> str:
+        return 'StageStats(calls={}, seconds={:.6f}, removed={})'.format(self.calls, self.seconds, self.removed)
+
+
+class SearchStats:
+    """
+    Counts the work done by ``search``.
+
+    Passing an instance to ``solve`` or ``search`` enables the instrumentation;
+    without one, only a few ``None`` checks per search node remain.
+
+    Attributes
+    ----------
+    nodes : int
+        The number of grids that were propagated, including the initial one.
+    backtracks : int
+        The number of guesses that turned out to be wrong.
+    max_depth : int
+        The largest number of guesses on a single search path.
+    iterations : int
+        The number of passes over all strategies in ``reduce_puzzle``.
+    stages : Dict[str, StageStats]
+        The time spent in and candidates removed by every strategy, by function name.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.iterations = 0
+        self.stages = {}  # type: Dict[str, StageStats]
+
+    def enter(self, depth: int) -> None:
+        """Counts a search node at the given depth."""
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def merge(self, other: 'SearchStats') -> 'SearchStats':
+        """Adds the counts of another instance, e.g. to aggregate a batch; returns this instance."""
+        self.nodes += other.nodes
+        self.backtracks += other.backtracks
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.iterations += other.iterations
+        for name, theirs in other.stages.items():
+            ours = self.stages.setdefault(name, StageStats())
+            ours.calls += theirs.calls
+            ours.seconds += theirs.seconds
+            ours.removed += theirs.removed
+        return self
+
+    def __repr__(self) -> str:
+        return 'SearchStats(nodes={}, backtracks={}, max_depth={}, iterations={}, stages={})'.format(
+            self.nodes, self.backtracks, self.max_depth, self.iterations, self.stages)
+
+
+class BudgetExceeded(Exception):
+    """Raised by ``search`` once its ``Budget`` is used up."""
+
+
+class Budget:
+    """
+    Limits the number of nodes and the time of a search.
+
+    The search charges every node to the budget before propagating it, and stops
+    by raising ``BudgetExceeded`` once the budget is used up. Along the way, the
+    budget keeps a copy of the most reduced grid the search reached.
+
+    Parameters
+    ----------
+    max_nodes : int, optional
+        The maximum number of search nodes, counted like ``SearchStats.nodes``.
+    deadline : float, optional
+        The ``time.monotonic()`` time after which no further node is started.
+
+    Attributes
+    ----------
+    nodes : int
+        The number of nodes charged so far.
+    best : SudokuDict or Grid, optional
+        A copy of the propagated grid with the fewest candidates, in the form the engine uses.
+    """
+
+    def __init__(self, max_nodes: Optional[int] = None, deadline: Optional[float] = None):
+        self.max_nodes = max_nodes
+        self.deadline = deadline
+        self.nodes = 0
+        self.best = None
+        self._fewest = None  # type: Optional[int]
+
+    def charge(self) -> None:
+        """Counts a search node, raising ``BudgetExceeded`` if the budget does not allow it."""
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise BudgetExceeded('search exceeded {} nodes'.format(self.max_nodes))
+        if self.deadline is not None and monotonic() >= self.deadline:
+            raise BudgetExceeded('search exceeded the deadline')
+        self.nodes += 1
+
+    def reached(self, grid, candidates: int) -> None:
+        """Keeps a copy of a propagated grid if it has fewer candidates than any before."""
+        if self._fewest is None or candidates < self._fewest:
+            self._fewest = candidates
+            self.best = grid.copy()
+
+
+class SolveResult(NamedTuple):
     """
-    Iterate eliminate() and only_choice(). If at some point, there is a box with no available values, return False.
+    The outcome of a ``solve`` with a budget.
+
+    Attributes
+    ----------
+    status : str
+        One of ``STATUSES``.
+    values : SudokuDict
+        The solution if the grid was solved, otherwise the most reduced grid
+        the search reached; the unreduced grid if propagation failed right away.
+    nodes : int
+        The number of search nodes used.
+    """
+    status: str
+    values: SudokuDict
+    nodes: int
+
+
+def _timed(name: str, strategy: Callable[[SudokuDict, Topology], MaybeSolution],
+           values: SudokuDict, topology: Topology, stats: SearchStats) -> MaybeSolution:
+    """Runs a strategy, recording its time and the candidates it removed in ``stats``."""
+    before = n_candidates(values)
+    start = perf_counter()
+    result = strategy(values, topology)
+    seconds = perf_counter() - start
+    stage = stats.stages.get(name)
+    if stage is None:
+        stage = stats.stages[name] = StageStats()
+    stage.calls += 1
+    stage.seconds += seconds
+    if result is not False:
+        stage.removed += before - n_candidates(result)
+    return result
+
+
+def reduce_puzzle(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY,
+                  pipeline: Optional['Pipeline'] = None, stats: Optional[SearchStats] = None) -> MaybeSolution:
+    """
+    Iterate eliminate(), naked_twins() and only_choice().
+    If at some point one of them detects a contradiction, return False.
     If the sudoku is solved, return the sudoku.
     If after an iteration of both functions, the sudoku remains the same, return the sudoku.
     
@@ -266,6 +702,12 @@ def reduce_puzzle(values: SudokuDict) -> MaybeSolution:
     ----------
     values : SudokuDict  
         The sudoku in dictionary form
+    topology : Topology
+        The board topology.
+    pipeline : Pipeline, optional
+        Runs the enabled stages of this pipeline instead, counting their effect.
+    stats : SearchStats, optional
+        Records the iterations and the time and effect of every strategy call.
         
     Returns
     -------
@@ -274,16 +716,23 @@ def reduce_puzzle(values: SudokuDict) -> MaybeSolution:
     False
         No solution could be found.
     """
+    if pipeline is not None:
+        return pipeline.reduce(values, topology, stats)
+
     stalled = False
     while not stalled:
+        if stats is not None:
+            stats.iterations += 1
         solved_values_before = n_solved(values)
-        values = eliminate(values)
-        values = naked_twins(values)
-        values = only_choice(values)
+        for strategy in (eliminate, naked_twins, only_choice):
+            if stats is None:
+                values = strategy(values, topology)
+            else:
+                values = _timed(strategy.__name__, strategy, values, topology, stats)
+            if values is False:
+                return False
 
         stalled = solved_values_before == n_solved(values)
-        # Original assignment code returned False if len(...) == 0
-        assert len([box for box in values if len(values[box]) > 0])
     return values
 
 
@@ -305,7 +754,144 @@ def n_solved(values: SudokuDict) -> int:
                 if len(values[box]) == 1])
 
 
-def is_solved(values: SudokuDict) -> bool:
+def n_candidates(values: SudokuDict) -> int:
+    """Determines the total number of candidates left in the grid."""
+    return sum(len(v) for v in values.values())
+
+
+class Strategy:
+    """
+    A stage of a ``Pipeline``: a propagation function with an enable flag and counters.
+
+    Attributes
+    ----------
+    name : str
+        The name the stage is looked up by.
+    func : Callable[[SudokuDict, Topology], MaybeSolution]
+        The propagation function, e.g. ``eliminate``.
+    enabled : bool
+        Whether the pipeline runs this stage.
+    calls : int
+        How often the stage was run.
+    removed : int
+        How many candidates the stage removed in total.
+    """
+
+    def __init__(self, name: str, func: Callable[[SudokuDict, Topology], MaybeSolution], enabled: bool = True):
+        self.name = name
+        self.func = func
+        self.enabled = enabled
+        self.calls = 0
+        self.removed = 0
+
+    def __repr__(self) -> str:
+        return 'Strategy({!r}, enabled={}, calls={}, removed={})'.format(
+            self.name, self.enabled, self.calls, self.removed)
+
+
+class Pipeline:
+    """
+    An ordered sequence of propagation strategies used by ``reduce_puzzle``.
+
+    Stages are ordered from cheap to expensive. Whenever a stage removes a candidate,
+    the pipeline starts over at the first stage, so that expensive stages only run
+    once the cheaper ones have stalled. Every call to ``reduce`` is counted in
+    ``reductions``, which equals the number of nodes visited by ``search``.
+    """
+
+    def __init__(self, strategies: Iterable[Strategy]):
+        self.strategies = list(strategies)
+        self.reductions = 0
+
+    def __getitem__(self, name: str) -> Strategy:
+        for strategy in self.strategies:
+            if strategy.name == name:
+                return strategy
+        raise KeyError(name)
+
+    def enable(self, *names: str, enabled: bool = True) -> 'Pipeline':
+        """Sets the enable flag of the named stages; returns the pipeline for chaining."""
+        for name in names:
+            self[name].enabled = enabled
+        return self
+
+    def disable(self, *names: str) -> 'Pipeline':
+        """Clears the enable flag of the named stages; returns the pipeline for chaining."""
+        return self.enable(*names, enabled=False)
+
+    def counters(self) -> Dict[str, Tuple[int, int]]:
+        """Returns the ``(calls, removed)`` counters of every stage by name."""
+        return dict((s.name, (s.calls, s.removed)) for s in self.strategies)
+
+    def reset(self) -> None:
+        """Resets all counters."""
+        self.reductions = 0
+        for strategy in self.strategies:
+            strategy.calls = strategy.removed = 0
+
+    def reduce(self, values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY,
+               stats: Optional[SearchStats] = None) -> MaybeSolution:
+        """
+        Runs the enabled stages until none of them removes a candidate.
+
+        Parameters
+        ----------
+        values : SudokuDict
+            The sudoku in dictionary form.
+        topology : Topology
+            The board topology.
+        stats : SearchStats, optional
+            Records the time and effect of every stage; each restart counts as an iteration.
+
+        Returns
+        -------
+        SudokuDict
+            The resulting sudoku in dictionary form.
+        False
+            A stage detected a contradiction.
+        """
+        self.reductions += 1
+        stages = [s for s in self.strategies if s.enabled]
+        remaining = n_candidates(values)
+        i = 0
+        while i < len(stages):
+            stage = stages[i]
+            stage.calls += 1
+            if stats is None:
+                values = stage.func(values, topology)
+            else:
+                stats.iterations += not i
+                values = _timed(stage.name, stage.func, values, topology, stats)
+            if values is False:
+                return False
+            removed = remaining - n_candidates(values)
+            stage.removed += removed
+            remaining -= removed
+            i = 0 if removed else i + 1
+        return values
+
+
+def default_pipeline() -> Pipeline:
+    """
+    Creates a pipeline of all strategies, ordered from cheap to expensive.
+
+    Pointing pairs and box/line reduction are enabled since they save far more
+    search than they cost on hard puzzles; hidden pairs are disabled because they
+    rarely find anything the other stages miss, and naked subsets because they cost
+    more time than the search nodes they save. Use ``enable`` and ``disable`` to tune.
+    """
+    return Pipeline([
+        Strategy('eliminate', eliminate),
+        Strategy('only_choice', only_choice),
+        Strategy('naked_twins', naked_twins),
+        Strategy('naked_subsets', naked_subsets, enabled=False),
+        Strategy('pointing_pairs', pointing_pairs),
+        Strategy('box_line_reduction', box_line_reduction),
+        Strategy('hidden_pairs', hidden_pairs, enabled=False),
+    ])
+
+
+def is_solved(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> bool:
     """
     Determines if a Sudoku grid is solved.
     
@@ -313,6 +899,8 @@ def is_solved(values: SudokuDict) -> bool:
     ----------
     values : SudokuDict  
         The sudoku in dictionary form
+    topology : Topology
+        The board topology.
     
     Returns
     -------
@@ -320,10 +908,72 @@ def is_solved(values: SudokuDict) -> bool:
         A boolean indicating if all boxes have a solution.
     """
     assert not isinstance(values, bool)
-    return all(len(values[s]) == 1 for s in boxes())
+    return all(len(values[s]) == 1 for s in topology.boxes)
+
+
+def mrv(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> Box:
+    """
+    Selects the unsolved box with the fewest candidates (minimum remaining values),
+    breaking ties by box name.
+    """
+    n, s = min((len(values[s]), s)
+               for s in topology.boxes
+               if len(values[s]) > 1)
+    return s
+
+
+def mrv_degree(values: SudokuDict, topology: Topology = DEFAULT_TOPOLOGY) -> Box:
+    """
+    Selects the unsolved box with the fewest candidates, breaking ties by the
+    largest number of unsolved peers, i.e. the box that constrains most others.
+    """
+    unsolved = [s for s in topology.boxes if len(values[s]) > 1]
+    fewest = min(len(values[s]) for s in unsolved)
+    peers = topology.peer_dict
+    return max((s for s in unsolved if len(values[s]) == fewest),
+               key=lambda s: sum(1 for peer in peers[s] if len(values[peer]) > 1))
+
+
+def digit_order(values: SudokuDict, box: Box, topology: Topology = DEFAULT_TOPOLOGY) -> Iterable[Values]:
+    """Tries the candidates of a box in ascending order."""
+    return values[box]
+
+
+def least_constraining(values: SudokuDict, box: Box, topology: Topology = DEFAULT_TOPOLOGY) -> Iterable[Values]:
+    """
+    Tries the candidates of a box that rule out the fewest candidates of its peers first,
+    in ascending order on ties.
+    """
+    peers = topology.peer_dict[box]
+    return sorted(values[box], key=lambda digit: sum(1 for peer in peers if digit in values[peer]))
+
+
+class Ordering(NamedTuple):
+    """
+    The branching policy of ``search``.
+
+    Attributes
+    ----------
+    select_box : Callable[[SudokuDict, Topology], Box]
+        Selects the unsolved box to branch on, e.g. ``mrv``.
+    order_values : Callable[[SudokuDict, Box, Topology], Iterable[Values]]
+        Orders the candidates of that box, e.g. ``digit_order``.
+    """
+    select_box: Callable[[SudokuDict, Topology], Box]
+    order_values: Callable[[SudokuDict, Box, Topology], Iterable[Values]]
+
+
+ORDERINGS = {
+    'mrv': Ordering(mrv, digit_order),
+    'mrv-degree': Ordering(mrv_degree, digit_order),
+    'mrv-lcv': Ordering(mrv, least_constraining),
+    'mrv-degree-lcv': Ordering(mrv_degree, least_constraining),
+}  # type: Dict[str, Ordering]
 
 
-def search(values: SudokuDict) -> MaybeSolution:
+def search(values: SudokuDict, backtracking: str = 'copy', topology: Topology = DEFAULT_TOPOLOGY,
+           pipeline: Optional[Pipeline] = None, ordering: Ordering = ORDERINGS['mrv'],
+           stats: Optional[SearchStats] = None, budget: Optional[Budget] = None) -> MaybeSolution:
     """
     Using depth-first search and propagation, try all possible values.
         
@@ -331,6 +981,21 @@ def search(values: SudokuDict) -> MaybeSolution:
     ----------
     values : SudokuDict  
         The sudoku in dictionary form
+    backtracking : str
+        One of ``BACKTRACKING``. ``'copy'`` explores every branch on a copy of the grid,
+        ``'trail'`` modifies ``values`` in place and undoes failed branches from a trail;
+        if no solution exists, ``values`` is restored to its original state.
+    topology : Topology
+        The board topology.
+    pipeline : Pipeline, optional
+        The propagation strategies to use; see ``reduce_puzzle``.
+    ordering : Ordering
+        Which box to branch on and in which order to try its candidates; see ``ORDERINGS``.
+    stats : SearchStats, optional
+        Counts the nodes, backtracks and depth of the search and records the
+        time and effect of every propagation strategy.
+    budget : Budget, optional
+        Limits the nodes and time of the search and keeps the most reduced grid reached.
     
     Returns
     -------
@@ -338,28 +1003,142 @@ def search(values: SudokuDict) -> MaybeSolution:
         The resulting sudoku in dictionary form.
     False
         No solution could be found.
+
+    Raises
+    ------
+    BudgetExceeded
+        The budget was used up before the search finished.
     """
+    if backtracking == 'trail':
+        return _search_trail(values, topology, pipeline, ordering, stats, budget)
+    if backtracking != 'copy':
+        raise ValueError('Unknown backtracking {!r}; expected one of {}'.format(backtracking, BACKTRACKING))
+    return _search_copy(values, topology, pipeline, ordering, stats, budget)
+
+
+def _search_copy(values: SudokuDict, topology: Topology, pipeline: Optional[Pipeline],
+                 ordering: Ordering, stats: Optional[SearchStats], budget: Optional[Budget] = None,
+                 depth: int = 0) -> MaybeSolution:
+    """Runs the depth-first search, exploring every branch on a copy of the grid."""
     # First, reduce the puzzle using the previous function
-    values = reduce_puzzle(values)
+    if stats is not None:
+        stats.enter(depth)
+    if budget is not None:
+        budget.charge()
+    values = reduce_puzzle(values, topology, pipeline, stats)
     if values is False:
         return False
-    if is_solved(values):
+    if budget is not None:
+        budget.reached(values, n_candidates(values))
+    if is_solved(values, topology):
         return values
 
-    # Choose one of the unfilled squares with the fewest possibilities
-    n, s = min((len(values[s]), s)
-               for s in boxes()
-               if len(values[s]) > 1)
+    # Choose one of the unfilled squares, by default one with the fewest possibilities
+    s = ordering.select_box(values, topology)
 
     # Recursively try to solve each one of the resulting Sudokus.
-    for value in values[s]:
+    for value in ordering.order_values(values, s, topology):
         branch = assign_value(dict(values), s, value)
-        attempt = search(branch)
+        attempt = False
+        try:
+            attempt = _search_copy(branch, topology, pipeline, ordering, stats, budget, depth + 1)
+        finally:
+            # Record going back to this grid, also when the budget ran out within the branch.
+            recorder = _state.recorder
+            if not attempt and recorder is not None:
+                recorder.restore(branch, values)
         if attempt:
             return attempt
+        if stats is not None:
+            stats.backtracks += 1
+    return False
+
+
+def undo(values: SudokuDict, trail: Trail, checkpoint: int) -> None:
+    """
+    Reverts all changes recorded on the trail after the checkpoint.
+
+    Parameters
+    ----------
+    values : SudokuDict
+        The sudoku in dictionary form; it is modified in place.
+    trail : Trail
+        The trail of ``(box, old value)`` entries written by ``assign_value``.
+    checkpoint : int
+        The length the trail had when the checkpoint was taken.
+    """
+    recorder = _state.recorder
+    while len(trail) > checkpoint:
+        box, old = trail.pop()
+        if recorder is not None:
+            recorder.record(values, box, old)
+        values[box] = old
+
+
+def _search_trail(values: SudokuDict, topology: Topology, pipeline: Optional[Pipeline],
+                  ordering: Ordering, stats: Optional[SearchStats],
+                  budget: Optional[Budget] = None) -> MaybeSolution:
+    """Runs the depth-first search on a single grid, undoing failed branches from the trail."""
+    # The root is restored from a single snapshot, so its propagation is not written to the trail.
+    root = dict(values)
+    trail = []  # type: Trail
+    previous, _state.trail = _state.trail, None
+    try:
+        if _search_in_place(values, trail, topology, pipeline, ordering, stats, budget):
+            return values
+        _reset(values, root)
+        return False
+    except BudgetExceeded:
+        _reset(values, root)
+        raise
+    finally:
+        _state.trail = previous
+
 
+def _reset(values: SudokuDict, root: SudokuDict) -> None:
+    """Reverts the grid searched in place to the snapshot taken before the search."""
+    recorder = _state.recorder
+    if recorder is not None:
+        recorder.restore(values, root)
+    values.update(root)
 
-def solve(grid: str) -> MaybeSolution:
+
+def _search_in_place(values: SudokuDict, trail: Trail, topology: Topology, pipeline: Optional[Pipeline],
+                     ordering: Ordering, stats: Optional[SearchStats], budget: Optional[Budget] = None,
+                     depth: int = 0) -> bool:
+    """Searches for a solution by modifying ``values`` in place; returns whether it was solved."""
+    if stats is not None:
+        stats.enter(depth)
+    if budget is not None:
+        budget.charge()
+    if reduce_puzzle(values, topology, pipeline, stats) is False:
+        return False
+    if budget is not None:
+        budget.reached(values, n_candidates(values))
+    if is_solved(values, topology):
+        return True
+    if depth == 0:
+        _state.trail = trail
+
+    s = ordering.select_box(values, topology)
+
+    # The candidates are ordered up front, since trying a value changes values[s].
+    for value in list(ordering.order_values(values, s, topology)):
+        checkpoint = len(trail)
+        assign_value(values, s, value)
+        if _search_in_place(values, trail, topology, pipeline, ordering, stats, budget, depth + 1):
+            return True
+        if stats is not None:
+            stats.backtracks += 1
+        undo(values, trail, checkpoint)
+    return False
+
+
+def solve(grid: str, engine: str = 'dict', recorder: Optional[Recorder] = None,
+          backtracking: str = 'copy', topology: Topology = DEFAULT_TOPOLOGY,
+          pipeline: Optional[Pipeline] = None, ordering: Ordering = ORDERINGS['mrv'],
+          stats: Optional[SearchStats] = None, max_nodes: Optional[int] = None,
+          deadline: Optional[float] = None) -> Union[MaybeSolution, SolveResult]:
     """
     Find the solution to a Sudoku grid.
     
@@ -369,6 +1148,28 @@ def solve(grid: str) -> MaybeSolution:
         A string representing a sudoku grid.
         
         Example: ``2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3``
+    engine : str
+        The solver engine to use; one of ``ENGINES``.
+        ``'dict'`` operates on the string-valued dictionary and supports recording,
+        ``'bitmask'`` uses the compact candidate masks of the ``bitmask`` module,
+        ``'dlx'`` solves the sudoku as an exact cover problem; see the ``dlx`` module.
+    recorder : Recorder, optional
+        Records all assignments made while solving; only supported by the ``'dict'`` engine.
+    backtracking : str
+        The backtracking mode of the ``'dict'`` engine; see ``search``.
+    topology : Topology
+        The board topology, e.g. ``get_topology(4, diagonal=False)`` for a classic 16x16 sudoku.
+    pipeline : Pipeline, optional
+        The propagation strategies of the ``'dict'`` engine; see ``default_pipeline``.
+    ordering : Ordering
+        The branching policy of the ``'dict'`` engine; see ``ORDERINGS``.
+    stats : SearchStats, optional
+        Collects the search statistics of the ``'dict'`` and ``'bitmask'`` engines; see ``search``.
+    max_nodes : int, optional
+        Stops the search of the ``'dict'`` and ``'bitmask'`` engines after this many nodes.
+    deadline : float, optional
+        Stops the search of the ``'dict'`` and ``'bitmask'`` engines once ``time.monotonic()``
+        reaches this time. The budget is checked before every search node.
     
     Returns
     -------
@@ -376,9 +1177,108 @@ def solve(grid: str) -> MaybeSolution:
         The resulting sudoku in dictionary form.
     False
         No solution could be found.
+    SolveResult
+        The status and the solution or most reduced grid, if ``max_nodes`` or ``deadline`` is given.
+    """
+    budget = None
+    if max_nodes is not None or deadline is not None:
+        budget = Budget(max_nodes, deadline)
+    if engine == 'dict':
+        values = grid_values(grid, topology)
+        with recording(recorder):
+            if budget is None:
+                return search(values, backtracking, topology, pipeline, ordering, stats)
+            return _budgeted(lambda: search(values, backtracking, topology, pipeline, ordering, stats, budget),
+                             budget, dict(values), dict)
+    if recorder is not None:
+        raise ValueError('Recording is only supported by the dict engine')
+    if pipeline is not None or ordering != ORDERINGS['mrv']:
+        raise ValueError('Strategy pipelines and orderings are only supported by the dict engine')
+    if stats is not None and engine != 'bitmask':
+        raise ValueError('Search statistics are only supported by the dict and bitmask engines')
+    if budget is not None and engine != 'bitmask':
+        raise ValueError('Search budgets are only supported by the dict and bitmask engines')
+    if engine == 'bitmask':
+        import bitmask
+        if budget is not None:
+            masks = bitmask.grid_masks(grid, topology)
+            to_values = partial(bitmask.to_values, topology=topology)
+            return _budgeted(lambda: bitmask.search(masks[:], topology, stats=stats, budget=budget),
+                             budget, masks, to_values)
+        result = bitmask.solve(grid, topology, stats)
+        return bitmask.to_values(result, topology) if result is not False else False
+    if engine == 'dlx':
+        import dlx
+        return dlx.solve(grid, topology)
+    raise ValueError('Unknown engine {!r}; expected one of {}'.format(engine, ENGINES))
+
+
+def _budgeted(run: Callable[[], Union[MaybeSolution, list]], budget: Budget, start,
+              to_values: Callable[..., SudokuDict]) -> SolveResult:
+    """Runs a search with a budget and reports its outcome, converting grids with ``to_values``."""
+    try:
+        result = run()
+    except BudgetExceeded:
+        status = BUDGET_EXCEEDED
+    else:
+        if result is not False:
+            return SolveResult(SOLVED, to_values(result), budget.nodes)
+        status = UNSAT
+    return SolveResult(status, to_values(budget.best if budget.best is not None else start), budget.nodes)
+
+
+def count_solutions(grid: str, limit: int = 2, engine: str = 'bitmask',
+                    topology: Topology = DEFAULT_TOPOLOGY) -> int:
+    """
+    Counts the solutions of a Sudoku grid, stopping as soon as ``limit`` solutions were found.
+
+    Solutions are only counted, never converted into dictionaries, so that checking
+    a large corpus stays cheap.
+
+    Parameters
+    ----------
+    grid : string
+        A string representing a sudoku grid.
+    limit : int
+        The number of solutions after which counting stops.
+    engine : str
+        The solver engine to count with; ``'bitmask'`` or ``'dlx'``.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    int
+        The number of solutions, at most ``limit``.
+    """
+    if engine == 'bitmask':
+        import bitmask
+        return bitmask.count_solutions(bitmask.grid_masks(grid, topology), topology, limit)
+    if engine == 'dlx':
+        import dlx
+        return dlx.count_solutions(grid_values(grid, topology), topology, limit)
+    raise ValueError('Counting solutions is not supported by engine {!r}'.format(engine))
+
+
+def is_unique(grid: str, engine: str = 'bitmask', topology: Topology = DEFAULT_TOPOLOGY) -> bool:
+    """
+    Determines whether a Sudoku grid has exactly one solution.
+
+    Parameters
+    ----------
+    grid : string
+        A string representing a sudoku grid.
+    engine : str
+        The solver engine to count with; see ``count_solutions``.
+    topology : Topology
+        The board topology.
+
+    Returns
+    -------
+    bool
+        ``True`` if the grid has a single solution, ``False`` if it has none or several.
     """
-    values = grid_values(grid)
-    return search(values)
+    return count_solutions(grid, 2, engine, topology) == 1
 
 
 if __name__ == '__main__':
@@ -396,12 +1296,13 @@ if __name__ == '__main__':
     print('Before:')
     display(grid_values(diag_sudoku_grid))
     print('After:')
-    display(solve(diag_sudoku_grid))
+    recorder = Recorder()
+    display(solve(diag_sudoku_grid, recorder=recorder))
 
     try:
         from visualize import visualize_assignments
 
-        visualize_assignments(assignments)
+        visualize_assignments(recorder.trace())
 
     except SystemExit:
         pass
@@ -1,6 +1,10 @@
+import sys
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import solution
+from topology import get_topology
 
 
 class TestNakedTwins(unittest.TestCase):
@@ -96,5 +100,354 @@ class TestDiagonalSudoku(unittest.TestCase):
                          "Your diagonal Sudoku solution produced an unexpected board.")
 
 
+class TestRecorder(unittest.TestCase):
+    grid = '4.......3..9.........1...7.....1.8.....5.9.....1.2.....3...5.........7..7.......8'
+
+    def test_disabled_by_default(self):
+        values = solution.grid_values(self.grid)
+        solution.assign_value(values, 'A2', '1')
+        self.assertIsNone(solution._state.recorder)
+
+    def test_replay_ends_in_solution(self):
+        recorder = solution.Recorder()
+        result = solution.solve(self.grid, recorder=recorder)
+        snapshots = list(recorder.snapshots())
+        self.assertEqual(len(snapshots), len(recorder.diffs))
+        self.assertEqual(snapshots[-1], result)
+
+    def test_bounded(self):
+        recorder = solution.Recorder(maxlen=10)
+        result = solution.solve(self.grid, recorder=recorder)
+        snapshots = list(recorder.snapshots())
+        self.assertEqual(len(snapshots), 10)
+        self.assertGreater(recorder.dropped, 0)
+        self.assertEqual(snapshots[-1], result)
+        with self.assertRaises(ValueError):
+            solution.Recorder(maxlen=0)
+
+    def test_replay_after_budget_exceeded(self):
+        for mode in solution.BACKTRACKING:
+            recorder = solution.Recorder()
+            values = solution.grid_values(TestBacktracking.grid)
+            with solution.recording(recorder), self.assertRaises(solution.BudgetExceeded):
+                solution.search(values, mode, budget=solution.Budget(max_nodes=5))
+            self.assertEqual(list(recorder.snapshots())[-1], values)
+
+    def test_concurrent_recording(self):
+        single = solution.Recorder()
+        solution.solve(TestBacktracking.grid, recorder=single)
+
+        def run(job):
+            recorder = solution.Recorder() if job % 2 else None
+            solution.solve(TestBacktracking.grid, recorder=recorder)
+            return recorder
+
+        # Switch threads often, so that recorded and unrecorded solves interleave.
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                recorders = [recorder for recorder in pool.map(run, range(8)) if recorder is not None]
+        finally:
+            sys.setswitchinterval(interval)
+        for recorder in recorders:
+            self.assertEqual(list(recorder.diffs), list(single.diffs))
+
+    def test_restore(self):
+        values = solution.grid_values(self.grid)
+        recorder = solution.Recorder()
+        with solution.recording(recorder):
+            branch = solution.assign_value(dict(values), 'A2', '1')
+            branch = solution.eliminate(branch)
+            recorder.restore(branch, values)
+        self.assertEqual(list(recorder.snapshots())[-1], values)
+
+
+class TestContradictions(unittest.TestCase):
+    def test_duplicate_singletons(self):
+        values = solution.grid_values('22' + '.' * 79)
+        self.assertIs(solution.eliminate(values), False)
+
+    def test_digit_without_place(self):
+        values = solution.grid_values('.' * 81)
+        for box in solution.row_units()[0]:
+            values[box] = values[box].replace('5', '')
+        self.assertIs(solution.only_choice(values), False)
+
+    def test_reduce_puzzle(self):
+        self.assertIs(solution.reduce_puzzle(solution.grid_values('1.......1' + '.' * 72)), False)
+        self.assertIs(solution.solve('1.......1' + '.' * 72), False)
+
+
+class TestBacktracking(unittest.TestCase):
+    # A sparse grid that needs several levels of backtracking.
+    grid = '2.79.....8..7.....4....3.....6....9..8...2.5.......4..6.2.7.8.......1.......649..'
+
+    def test_trail_matches_copy(self):
+        self.assertEqual(solution.solve(self.grid, backtracking='trail'),
+                         solution.solve(self.grid, backtracking='copy'))
+
+    def test_trail_restores_values(self):
+        values = solution.grid_values('2' * 81)
+        self.assertFalse(solution.search(values, backtracking='trail'))
+        self.assertEqual(values, solution.grid_values('2' * 81))
+
+    def test_concurrent_solves(self):
+        grids = [self.grid, TestDiagonalSudoku.diagonal_grid, TestRecorder.grid]
+        expected = [solution.solve(grid) for grid in grids]
+
+        def run(job):
+            return solution.solve(grids[job % 3], backtracking=solution.BACKTRACKING[job % 2])
+
+        # Switch threads often, so that trail and copy mode solves interleave.
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                results = list(pool.map(run, range(12)))
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(results, [expected[job % 3] for job in range(12)])
+
+    def test_replay_after_backtracking(self):
+        for mode in solution.BACKTRACKING:
+            recorder = solution.Recorder()
+            result = solution.solve(self.grid, recorder=recorder, backtracking=mode)
+            self.assertEqual(list(recorder.snapshots())[-1], result)
+
+
+class TestStrategies(unittest.TestCase):
+    grid = TestBacktracking.grid
+
+    @staticmethod
+    def restrict(values, boxes, digits):
+        """Removes the digits from the candidates of the boxes."""
+        for box in boxes:
+            values[box] = ''.join(c for c in values[box] if c not in digits)
+
+    def test_hidden_pairs(self):
+        values = solution.grid_values('.' * 81)
+        row = solution.row_units()[0]
+        self.restrict(values, row[2:], '12')
+        values = solution.hidden_pairs(values)
+        self.assertEqual([values[box] for box in row[:3]], ['12', '12', '3456789'])
+
+    def test_hidden_pairs_contradiction(self):
+        values = solution.grid_values('.' * 81)
+        self.restrict(values, solution.row_units()[0][2:], '123')
+        self.assertIs(solution.hidden_pairs(values), False)
+
+    def test_naked_triple(self):
+        values = solution.grid_values('.' * 81)
+        row = solution.row_units()[0]
+        for box, digits in zip(row, ('12', '23', '13')):
+            values[box] = digits
+        values = solution.naked_subsets(values)
+        self.assertEqual([values[box] for box in row], ['12', '23', '13'] + ['456789'] * 6)
+
+    def test_naked_subset_contradiction(self):
+        values = solution.grid_values('.' * 81)
+        for box in solution.row_units()[0][:3]:
+            values[box] = '12'
+        self.assertIs(solution.naked_subsets(values), False)
+
+    def test_pointing_pairs(self):
+        values = solution.grid_values('.' * 81)
+        square = solution.square_units()[0]
+        self.restrict(values, [box for box in square if box[0] != 'B'], '5')
+        values = solution.pointing_pairs(values)
+        self.assertNotIn('5', values['B4'] + values['B9'])
+        self.assertIn('5', values['B1'] + values['C4'])
+
+    def test_box_line_reduction(self):
+        values = solution.grid_values('.' * 81)
+        self.restrict(values, solution.row_units()[1][3:], '5')
+        values = solution.box_line_reduction(values)
+        self.assertNotIn('5', values['A1'] + values['C3'])
+        self.assertIn('5', values['B1'] + values['D1'])
+
+    def test_pipeline_counters(self):
+        pipeline = solution.default_pipeline()
+        result = solution.solve(self.grid, pipeline=pipeline)
+        self.assertTrue(solution.is_solved(result))
+        counters = pipeline.counters()
+        self.assertGreater(pipeline.reductions, 1)
+        self.assertGreater(counters['pointing_pairs'][1], 0)
+        self.assertEqual(counters['hidden_pairs'], (0, 0))
+        pipeline.reset()
+        self.assertEqual(pipeline.reductions, 0)
+        self.assertEqual(pipeline['eliminate'].calls, 0)
+
+    def test_stronger_stages_prune_search(self):
+        basic = solution.default_pipeline().disable('pointing_pairs', 'box_line_reduction')
+        full = solution.default_pipeline().enable('hidden_pairs')
+        for backtracking in solution.BACKTRACKING:
+            solution.solve(self.grid, backtracking=backtracking, pipeline=basic)
+            solution.solve(self.grid, backtracking=backtracking, pipeline=full)
+        self.assertLess(full.reductions, basic.reductions)
+
+    def test_pipeline_needs_dict_engine(self):
+        with self.assertRaises(ValueError):
+            solution.solve(self.grid, engine='bitmask', pipeline=solution.default_pipeline())
+
+
+class TestOrdering(unittest.TestCase):
+    grid = TestBacktracking.grid
+
+    def test_mrv(self):
+        values = solution.grid_values('.' * 81)
+        values['C3'] = '12'
+        values['B2'] = '34'
+        self.assertEqual(solution.mrv(values), 'B2')
+
+    def test_mrv_degree(self):
+        values = solution.grid_values('.' * 81)
+        values['A2'] = '12'
+        values['E5'] = '34'
+        values['A1'] = '5'
+        # E5 lies on both diagonals and has more unsolved peers than A2.
+        self.assertEqual(solution.mrv_degree(values), 'E5')
+
+    def test_least_constraining(self):
+        values = solution.grid_values('.' * 81)
+        values['A1'] = '123'
+        for box in ('A2', 'A3', 'B1'):
+            values[box] = values[box].replace('2', '')
+        values['C1'] = values['C1'].replace('3', '')
+        self.assertEqual(list(solution.least_constraining(values, 'A1')), ['2', '3', '1'])
+
+    def test_stats(self):
+        stats = solution.SearchStats()
+        solution.solve(self.grid, stats=stats)
+        self.assertGreater(stats.nodes, 1)
+        self.assertGreater(stats.backtracks, 0)
+        self.assertLess(stats.backtracks, stats.nodes)
+
+    def test_all_orderings_solve(self):
+        for ordering in solution.ORDERINGS.values():
+            for backtracking in solution.BACKTRACKING:
+                stats = solution.SearchStats()
+                result = solution.solve(self.grid, backtracking=backtracking, ordering=ordering, stats=stats)
+                self.assertTrue(solution.is_solved(result))
+                self.assertGreater(stats.nodes, 0)
+
+    def test_stats_unsupported_engine(self):
+        with self.assertRaises(ValueError):
+            solution.solve(self.grid, engine='dlx', stats=solution.SearchStats())
+
+
+class TestSearchStats(unittest.TestCase):
+    grid = TestBacktracking.grid
+
+    def test_stages(self):
+        stats = solution.SearchStats()
+        solution.solve(self.grid, stats=stats)
+        self.assertEqual(set(stats.stages), {'eliminate', 'naked_twins', 'only_choice'})
+        self.assertGreaterEqual(stats.iterations, stats.nodes)
+        self.assertGreater(stats.max_depth, 0)
+        self.assertEqual(stats.stages['eliminate'].calls, stats.iterations)
+        for stage in stats.stages.values():
+            self.assertGreaterEqual(stage.seconds, 0)
+        self.assertGreater(stats.stages['eliminate'].removed, 0)
+
+    def test_pipeline_stages(self):
+        stats = solution.SearchStats()
+        solution.solve(self.grid, pipeline=solution.default_pipeline(), stats=stats)
+        self.assertIn('pointing_pairs', stats.stages)
+        self.assertNotIn('hidden_pairs', stats.stages)
+
+    def test_bitmask(self):
+        stats = solution.SearchStats()
+        result = solution.solve(self.grid, engine='bitmask', stats=stats)
+        self.assertTrue(solution.is_solved(result))
+        self.assertGreater(stats.nodes, 1)
+        self.assertLess(stats.backtracks, stats.nodes)
+        self.assertEqual(stats.stages['propagate'].calls, stats.nodes)
+
+    def test_merge(self):
+        first, second = solution.SearchStats(), solution.SearchStats()
+        solution.solve(self.grid, stats=first)
+        solution.solve(TestDiagonalSudoku.diagonal_grid, stats=second)
+        total = solution.SearchStats().merge(first).merge(second)
+        self.assertEqual(total.nodes, first.nodes + second.nodes)
+        self.assertEqual(total.max_depth, max(first.max_depth, second.max_depth))
+        self.assertEqual(total.stages['eliminate'].removed,
+                         first.stages['eliminate'].removed + second.stages['eliminate'].removed)
+
+
+class TestBudget(unittest.TestCase):
+    grid = TestBacktracking.grid
+
+    def test_solved_within_budget(self):
+        for engine in ('dict', 'bitmask'):
+            stats = solution.SearchStats()
+            solution.solve(self.grid, engine=engine, stats=stats)
+            result = solution.solve(self.grid, engine=engine, max_nodes=stats.nodes)
+            self.assertEqual(result.status, solution.SOLVED)
+            self.assertEqual(result.nodes, stats.nodes)
+            self.assertTrue(solution.is_solved(result.values))
+
+    def test_node_budget_exceeded(self):
+        for engine in ('dict', 'bitmask'):
+            result = solution.solve(self.grid, engine=engine, max_nodes=5)
+            self.assertEqual(result.status, solution.BUDGET_EXCEEDED)
+            self.assertEqual(result.nodes, 5)
+            # The most reduced grid has fewer candidates than the grid after the first propagation.
+            first = solution.solve(self.grid, engine=engine, max_nodes=1).values
+            self.assertLess(solution.n_candidates(result.values), solution.n_candidates(first))
+            self.assertFalse(solution.is_solved(result.values))
+
+    def test_trail_restores_values(self):
+        values = solution.grid_values(self.grid)
+        budget = solution.Budget(max_nodes=5)
+        with self.assertRaises(solution.BudgetExceeded):
+            solution.search(values, 'trail', budget=budget)
+        self.assertEqual(values, solution.grid_values(self.grid))
+        self.assertEqual(budget.nodes, 5)
+
+    def test_deadline(self):
+        classic = get_topology(3, diagonal=False)
+        impossible = '.....5.8....6.1.43..........1.5........1.6...3.......553.....61........4.........'
+        for engine in ('dict', 'bitmask'):
+            result = solution.solve(impossible, engine=engine, topology=classic, deadline=time.monotonic() + 0.1)
+            self.assertEqual(result.status, solution.BUDGET_EXCEEDED)
+            self.assertGreater(result.nodes, 1)
+
+    def test_unsat(self):
+        result = solution.solve('11' + '.' * 79, engine='bitmask', max_nodes=10)
+        self.assertEqual(result, (solution.UNSAT, solution.grid_values('11' + '.' * 79), 1))
+
+    def test_unsupported_engine(self):
+        with self.assertRaises(ValueError):
+            solution.solve(self.grid, engine='dlx', max_nodes=10)
+
+
+class TestCountSolutions(unittest.TestCase):
+    def test_unique(self):
+        for engine in ('bitmask', 'dlx'):
+            self.assertEqual(solution.count_solutions(TestDiagonalSudoku.diagonal_grid, engine=engine), 1)
+            self.assertTrue(solution.is_unique(TestDiagonalSudoku.diagonal_grid, engine=engine))
+
+    def test_multiple(self):
+        for engine in ('bitmask', 'dlx'):
+            self.assertEqual(solution.count_solutions(TestBacktracking.grid, engine=engine), 2)
+            self.assertFalse(solution.is_unique(TestBacktracking.grid, engine=engine))
+
+    def test_unsolvable(self):
+        for engine in ('bitmask', 'dlx'):
+            self.assertEqual(solution.count_solutions('1.......1' + '.' * 72, engine=engine), 0)
+            self.assertFalse(solution.is_unique('1.......1' + '.' * 72, engine=engine))
+
+    def test_limit(self):
+        topology = get_topology(2, diagonal=False)
+        for engine in ('bitmask', 'dlx'):
+            self.assertEqual(solution.count_solutions('.' * 16, limit=1000, engine=engine, topology=topology), 288)
+            self.assertEqual(solution.count_solutions('.' * 16, limit=10, engine=engine, topology=topology), 10)
+
+    def test_unsupported_engine(self):
+        with self.assertRaises(ValueError):
+            solution.count_solutions(TestDiagonalSudoku.diagonal_grid, engine='dict')
+
+
 if __name__ == '__main__':
     unittest.main()
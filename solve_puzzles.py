@@ -0,0 +1,142 @@
+"""
+Solves a stream of sudoku grids from a file or standard input.
+
+Every non-empty input line is a grid in the format accepted by ``solution.grid_values``.
+For every grid, one line is written to standard output: the digits of the solution,
+``unsolvable`` if the grid has no solution, or ``error`` if it could not be processed.
+With ``--unique``, grids are checked for uniqueness instead, writing ``unique``,
+``multiple`` or ``unsolvable``.
+Throughput and latency statistics are printed to standard error at the end;
+``--stats`` adds the search statistics summed over all grids.
+
+Example: ``python solve_puzzles.py puzzles.txt > solutions.txt``
+"""
+
+import argparse
+import math
+import sys
+from time import perf_counter
+from typing import Dict, Iterator, TextIO
+
+import solution
+from batch import count_many, solve_many
+from solution import SearchStats
+from topology import get_topology
+
+
+class LatencyHistogram:
+    """
+    Collects latencies into logarithmic buckets of 1% width.
+
+    Memory is bounded by the number of distinct buckets rather than the
+    number of samples, which keeps percentiles cheap on arbitrarily long runs.
+    """
+
+    BASE = 1.01
+
+    def __init__(self):
+        self.buckets = {}  # type: Dict[int, int]
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        """Records a single latency sample."""
+        bucket = math.floor(math.log(max(seconds, 1e-9), self.BASE))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+
+    def percentile(self, p: float) -> float:
+        """
+        Returns the approximate latency below which ``p`` percent of the samples fall.
+
+        Parameters
+        ----------
+        p : float
+            The percentile in the range ``0..100``.
+
+        Returns
+        -------
+        float
+            The upper bound of the bucket containing the percentile, in seconds.
+        """
+        if not self.count:
+            return math.nan
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return self.BASE ** (bucket + 1)
+        return self.BASE ** (max(self.buckets) + 1)
+
+
+def read_grids(stream: TextIO) -> Iterator[str]:
+    """Lazily yields the non-empty, non-comment lines of a stream."""
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def main(args: argparse.Namespace) -> None:
+    stream = sys.stdin if args.input == '-' else open(args.input)
+    topology = get_topology(args.box_size, diagonal=not args.classic)
+    histogram = LatencyHistogram()
+    totals = SearchStats()
+    failures = 0
+    start = perf_counter()
+    try:
+        if args.unique:
+            results = count_many(read_grids(stream), workers=args.workers,
+                                 chunksize=args.chunksize, engine=args.engine, topology=topology)
+        else:
+            results = solve_many(read_grids(stream), workers=args.workers, chunksize=args.chunksize,
+                                 engine=args.engine, topology=topology, stats=args.stats)
+        for result in results:
+            histogram.add(result.seconds)
+            if result.stats is not None:
+                totals.merge(result.stats)
+            if result.error is not None:
+                failures += 1
+                print('error')
+                print('line {}: {}'.format(result.index + 1, result.error), file=sys.stderr)
+            elif result.solution is False or result.solution == 0:
+                print('unsolvable')
+            elif args.unique:
+                print('unique' if result.solution == 1 else 'multiple')
+            else:
+                print(''.join(result.solution[box] for box in topology.boxes))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    elapsed = perf_counter() - start
+    print('{} puzzles in {:.2f}s ({:.1f} puzzles/s), {} failed; latency p50 {:.3f}ms, p99 {:.3f}ms'.format(
+        histogram.count, elapsed, histogram.count / elapsed if elapsed else 0.0, failures,
+        histogram.percentile(50) * 1000, histogram.percentile(99) * 1000), file=sys.stderr)
+    if args.stats:
+        print('{} nodes, {} backtracks, max depth {}, {} reduce iterations'.format(
+            totals.nodes, totals.backtracks, totals.max_depth, totals.iterations), file=sys.stderr)
+        for name, stage in sorted(totals.stages.items()):
+            print('  {}: {} calls, {:.3f}s, {} candidates removed'.format(
+                name, stage.calls, stage.seconds, stage.removed), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solves sudoku grids, one per line.')
+    parser.add_argument('input', nargs='?', default='-', help='the input file; defaults to standard input')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--chunksize', type=int, default=64, help='number of grids sent to a worker at once')
+    parser.add_argument('--engine', choices=solution.ENGINES, default='bitmask', help='the solver engine')
+    parser.add_argument('--box-size', type=int, default=3, help='size of a square unit, e.g. 4 for 16x16 boards')
+    parser.add_argument('--classic', action='store_true', help='solve without the diagonal constraints')
+    parser.add_argument('--unique', action='store_true', help='check that every grid has exactly one solution')
+    parser.add_argument('--stats', action='store_true',
+                        help='print search statistics; requires the dict or bitmask engine')
+    args = parser.parse_args()
+    if args.stats and args.engine not in ('dict', 'bitmask'):
+        parser.error('--stats requires the dict or bitmask engine')
+    if args.stats and args.unique:
+        parser.error('--stats cannot be combined with --unique')
+    if args.unique and args.engine not in ('bitmask', 'dlx'):
+        parser.error('--unique requires the bitmask or dlx engine')
+    main(args)
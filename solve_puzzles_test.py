@@ -0,0 +1,39 @@
+import io
+import unittest
+
+import solve_puzzles
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = solve_puzzles.LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.add(ms / 1000)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.percentile(50), 0.050, delta=0.050 * 0.02)
+        self.assertAlmostEqual(histogram.percentile(99), 0.099, delta=0.099 * 0.02)
+
+    def test_sub_second_bucket(self):
+        # Halfway into the bucket [BASE ** -500, BASE ** -499), about 7 ms.
+        base = solve_puzzles.LatencyHistogram.BASE
+        histogram = solve_puzzles.LatencyHistogram()
+        histogram.add(base ** -499.5)
+        self.assertEqual(list(histogram.buckets), [-500])
+        self.assertAlmostEqual(histogram.percentile(100), base ** -499)
+
+    def test_upper_bound(self):
+        for seconds in (0.0003, 0.0042, 0.5, 1.7, 12.0):
+            histogram = solve_puzzles.LatencyHistogram()
+            histogram.add(seconds)
+            self.assertLessEqual(seconds, histogram.percentile(50))
+            self.assertLess(histogram.percentile(50), seconds * histogram.BASE)
+
+
+class TestReadGrids(unittest.TestCase):
+    def test_skips_blank_and_comment_lines(self):
+        stream = io.StringIO('# puzzles\n\n  4.......3  \n2....\n')
+        self.assertEqual(list(solve_puzzles.read_grids(stream)), ['4.......3', '2....'])
+
+
+if __name__ == '__main__':
+    unittest.main()
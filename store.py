@@ -0,0 +1,267 @@
+"""
+A persistent on-disk store of solved grids, read through ``mmap``.
+
+The file holds a small header followed by fixed-size records, each being the
+grid and its solution at one byte per box (81 + 81 bytes on a standard board).
+Records are sorted by grid, so a lookup is a binary search over the mapped file;
+nothing is loaded up front, and worker processes opening the same file share
+the operating system's page cache. Unsolvable grids are stored with a solution
+of all ``.``.
+
+Build a store from grid files, one grid per line, with
+``python store.py build solutions.db puzzles.txt``.
+"""
+
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from contextlib import ExitStack
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+import solution
+from batch import solve_many
+from solution import MaybeSolution
+from solve_puzzles import read_grids
+from topology import Topology, DEFAULT_TOPOLOGY, get_topology
+
+MAGIC = b'SUDOKUDB'
+# The magic, a format version, the box size and whether the diagonals are units.
+HEADER = struct.Struct('<8sBBB5x')
+VERSION = 1
+# The number of records ``build`` sorts in memory before spilling them to a temporary file.
+RUN_SIZE = 100000
+
+
+class SolutionStore:
+    """
+    Read-only access to a store built by ``build``.
+
+    Parameters
+    ----------
+    path : str
+        The path of the store file.
+
+    Attributes
+    ----------
+    topology : Topology
+        The board topology of all grids in the store.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            magic, version, box_size, diagonal = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('{} is not a solution store'.format(path))
+            self.topology = get_topology(box_size, diagonal=bool(diagonal))
+            self._boxes = len(self.topology.boxes)
+            self._record_size = 2 * self._boxes
+            size = os.fstat(f.fileno()).st_size - HEADER.size
+            if size % self._record_size:
+                raise ValueError('{} is truncated'.format(path))
+            self._count = size // self._record_size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._count else None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, grid: str) -> bool:
+        return self._find(grid) is not None
+
+    def _key(self, i: int) -> bytes:
+        offset = HEADER.size + i * self._record_size
+        return self._map[offset:offset + self._boxes]
+
+    def _find(self, grid: str) -> Optional[int]:
+        """Returns the offset of the solution of a grid, or ``None`` if it is not stored."""
+        key = solution.normalize_grid(grid, self.topology).encode('ascii')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._key(lo) == key:
+            return HEADER.size + lo * self._record_size + self._boxes
+        return None
+
+    def get(self, grid: str) -> Optional[MaybeSolution]:
+        """
+        Looks up the solution of a grid.
+
+        Parameters
+        ----------
+        grid : str
+            A string representing a sudoku grid.
+
+        Returns
+        -------
+        SudokuDict
+            The stored solution in dictionary form.
+        False
+            The grid is stored as having no solution.
+        None
+            The grid is not in the store.
+        """
+        offset = self._find(grid)
+        if offset is None:
+            return None
+        digits = self._map[offset:offset + self._boxes].decode('ascii')
+        if digits[0] == '.':
+            return False
+        return dict(zip(self.topology.boxes, digits))
+
+    def solve(self, grid: str, engine: str = 'bitmask') -> MaybeSolution:
+        """Answers a grid from the store, solving it with ``solution.solve`` if it is not stored."""
+        result = self.get(grid)
+        if result is None:
+            result = solution.solve(grid, engine=engine, topology=self.topology)
+        return result
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+
+    def __enter__(self) -> 'SolutionStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def build(path: str, solved: Iterable[Tuple[str, MaybeSolution]], topology: Topology = DEFAULT_TOPOLOGY,
+          run_size: int = RUN_SIZE) -> int:
+    """
+    Writes a store of solved grids.
+
+    The records are sorted externally: every ``run_size`` records are sorted in memory
+    and written to a temporary file next to the store, and the sorted runs are merged
+    into the store. Memory use is therefore bounded by the run size, about two bytes per
+    box and record, however large the corpus. A grid that occurs more than once is
+    stored with its last solution.
+
+    Parameters
+    ----------
+    path : str
+        The path of the store file; an existing file is replaced.
+    solved : Iterable[Tuple[str, MaybeSolution]]
+        Pairs of a grid in string form and its solution, or ``False`` if it has none.
+    topology : Topology
+        The board topology of all grids.
+    run_size : int
+        The maximum number of records sorted in memory at a time.
+
+    Returns
+    -------
+    int
+        The number of distinct grids written.
+    """
+    if run_size < 1:
+        raise ValueError('run_size must be positive')
+    n = len(topology.boxes)
+    unsolvable = b'.' * n
+    records = ((solution.normalize_grid(grid, topology).encode('ascii'),
+                ''.join(result[box] for box in topology.boxes).encode('ascii') if result is not False else unsolvable)
+               for grid, result in solved)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with ExitStack() as stack:
+        runs = []  # type: List[Iterable[bytes]]
+        while True:
+            chunk = list(islice(records, run_size))
+            # Later records of the same grid replace earlier ones within a run.
+            run = dict(chunk)
+            ordered = [key + run[key] for key in sorted(run)]
+            if len(chunk) < run_size:
+                # The last run is merged straight from memory.
+                runs.append(ordered)
+                break
+            spilled = stack.enter_context(tempfile.TemporaryFile(dir=directory))
+            spilled.writelines(ordered)
+            runs.append(_read_run(spilled, 2 * n))
+
+        # heapq.merge yields equal keys in the order of the runs, so the last one is the latest.
+        count = 0
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, topology.box_size, int(topology.diagonal)))
+            previous = None  # type: Optional[bytes]
+            for record in heapq.merge(*runs, key=lambda record: record[:n]):
+                if previous is not None and record[:n] != previous[:n]:
+                    f.write(previous)
+                    count += 1
+                previous = record
+            if previous is not None:
+                f.write(previous)
+                count += 1
+    os.replace(temporary, path)
+    return count
+
+
+def _read_run(f: BinaryIO, record_size: int) -> Iterator[bytes]:
+    """Reads back the records of a sorted run from the start of a temporary file."""
+    f.seek(0)
+    while True:
+        record = f.read(record_size)
+        if not record:
+            return
+        yield record
+
+
+def _solved(grids: Iterable[str], workers: Optional[int], engine: str,
+            topology: Topology, errors: List[str]) -> Iterator[Tuple[str, MaybeSolution]]:
+    """Solves the grids with the batch solver, collecting the grids that failed."""
+    for result in solve_many(grids, workers=workers, engine=engine, topology=topology):
+        if result.error is not None:
+            errors.append('line {}: {}'.format(result.index + 1, result.error))
+        else:
+            yield result.grid, result.solution
+
+
+def _read(name: str) -> Iterator[str]:
+    """Lazily yields the grids of a file, or of standard input for ``-``."""
+    if name == '-':
+        yield from read_grids(sys.stdin)
+        return
+    with open(name) as stream:
+        yield from read_grids(stream)
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.command == 'lookup':
+        with SolutionStore(args.store) as store:
+            for grid in args.grids:
+                result = store.get(grid)
+                print('missing' if result is None else 'unsolvable' if result is False
+                      else ''.join(result[box] for box in store.topology.boxes))
+        return
+
+    topology = get_topology(args.box_size, diagonal=not args.classic)
+    errors = []  # type: List[str]
+    grids = (grid for name in args.inputs for grid in _read(name))
+    count = build(args.store, _solved(grids, args.workers, args.engine, topology, errors), topology)
+    for error in errors:
+        print(error, file=sys.stderr)
+    print('{} grids stored in {}, {} failed'.format(count, args.store, len(errors)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Builds and queries on-disk solution stores.')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    build_parser = commands.add_parser('build', help='solve grids, one per line, and store their solutions')
+    build_parser.add_argument('store', help='the store file to write')
+    build_parser.add_argument('inputs', nargs='*', default=['-'], help='input files; defaults to standard input')
+    build_parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    build_parser.add_argument('--engine', choices=solution.ENGINES, default='bitmask', help='the solver engine')
+    build_parser.add_argument('--box-size', type=int, default=3, help='size of a square unit')
+    build_parser.add_argument('--classic', action='store_true', help='solve without the diagonal constraints')
+    lookup_parser = commands.add_parser('lookup', help='print the stored solutions of grids')
+    lookup_parser.add_argument('store', help='the store file to read')
+    lookup_parser.add_argument('grids', nargs='+', help='the grids to look up')
+    main(parser.parse_args())
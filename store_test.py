@@ -0,0 +1,92 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import solution
+import solution_test
+import store
+from topology import get_topology
+
+
+class TestSolutionStore(unittest.TestCase):
+    grids = [solution_test.TestDiagonalSudoku.diagonal_grid,
+             solution_test.TestBacktracking.grid,
+             '1.......1' + '.' * 72]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'solutions.db')
+
+    def build(self, grids, topology=solution.DEFAULT_TOPOLOGY):
+        return store.build(self.path, ((grid, solution.solve(grid, engine='bitmask', topology=topology))
+                                       for grid in grids), topology)
+
+    def test_lookup(self):
+        self.assertEqual(self.build(self.grids + self.grids[:1]), 3)
+        self.assertEqual(os.path.getsize(self.path), store.HEADER.size + 3 * 162)
+        with store.SolutionStore(self.path) as s:
+            self.assertEqual(len(s), 3)
+            self.assertEqual(s.get(self.grids[0]), solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+            self.assertEqual(s.get(self.grids[1]), solution.solve(self.grids[1], engine='bitmask'))
+            self.assertIs(s.get(self.grids[2]), False)
+            self.assertIsNone(s.get('.' * 81))
+            self.assertIn(self.grids[1], s)
+            self.assertNotIn('.' * 81, s)
+
+    def test_external_sort(self):
+        grids = [solution.normalize_grid(grid) for grid in self.grids] * 2 + ['.' * 80 + '1']
+        expected = self.build(grids)
+        with open(self.path, 'rb') as f:
+            in_memory = f.read()
+        for run_size in (1, 2, 3):
+            self.assertEqual(store.build(self.path, ((grid, solution.solve(grid, engine='bitmask'))
+                                                     for grid in grids), run_size=run_size), expected)
+            with open(self.path, 'rb') as f:
+                self.assertEqual(f.read(), in_memory)
+        # Only the store remains; the temporary runs are deleted.
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['solutions.db'])
+
+    def test_duplicates_within_run(self):
+        grids = [self.grids[0], self.grids[0], self.grids[1], self.grids[2]]
+        self.assertEqual(store.build(self.path, ((grid, solution.solve(grid, engine='bitmask')) for grid in grids),
+                                     run_size=2), 3)
+        with store.SolutionStore(self.path) as s:
+            self.assertEqual(len(s), 3)
+            self.assertIs(s.get(self.grids[2]), False)
+
+    def test_last_duplicate_wins(self):
+        store.build(self.path, [(self.grids[2], False), (self.grids[2], solution.solve(self.grids[0]))],
+                    run_size=1)
+        with store.SolutionStore(self.path) as s:
+            self.assertEqual(len(s), 1)
+            self.assertEqual(s.get(self.grids[2]), solution.solve(self.grids[0]))
+
+    def test_solve_falls_back(self):
+        self.build(self.grids[:1])
+        with store.SolutionStore(self.path) as s:
+            self.assertTrue(solution.is_solved(s.solve(self.grids[1])))
+
+    def test_empty_store(self):
+        self.build([])
+        with store.SolutionStore(self.path) as s:
+            self.assertEqual(len(s), 0)
+            self.assertIsNone(s.get(self.grids[0]))
+
+    def test_topology(self):
+        topology = get_topology(2, diagonal=False)
+        self.build(['1...' '..2.' '.3..' '...4'], topology)
+        with store.SolutionStore(self.path) as s:
+            self.assertIs(s.topology, topology)
+            self.assertTrue(solution.is_solved(s.get('1...' '..2.' '.3..' '...4'), topology))
+
+    def test_not_a_store(self):
+        with open(self.path, 'wb') as f:
+            f.write(pickle.dumps(self.grids) * 10)
+        with self.assertRaises(ValueError):
+            store.SolutionStore(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
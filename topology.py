@@ -0,0 +1,163 @@
+"""
+Board topologies: boxes, units and peers of N²×N² sudoku boards.
+
+A ``Topology`` precomputes all tables the solver engines need once, both in
+terms of box names (for the dictionary engine) and box indices (for the
+bitmask engine). Use ``get_topology`` to obtain a shared, cached instance.
+"""
+
+from functools import lru_cache as cache
+from typing import List, Set, Dict, Tuple, Sequence
+
+Box = str
+Unit = List[Box]
+IndexTable = Tuple[Tuple[int, ...], ...]
+
+# noinspection SpellCheckingInspection
+ROW_LABELS = 'ABCDEFGHIJKLMNOPQRSTUVWXY'
+DIGITS = '123456789ABCDEFGHIJKLMNOP'
+
+# Largest board size for which popcounts and candidate strings are looked up in a table rather than computed.
+MAX_POPCOUNT_TABLE_SIZE = 16
+
+
+def cross(a: Sequence[str], b: Sequence[str]) -> List[str]:
+    """
+    Cross product of elements in a and elements in b.
+
+    Parameters
+    ----------
+    a : Sequence[str]
+        The string or labels from which to select the first part.
+    b : Sequence[str]
+        The string or labels from which to select the second part.
+
+    Returns
+    -------
+    List[str]
+        The combinatorial values.
+    """
+    return [s+t for s in a for t in b]
+
+
+class _PopCount:
+    """Computes popcounts on indexing, standing in for a lookup table that would be too large."""
+
+    def __getitem__(self, mask: int) -> int:
+        return bin(mask).count('1')
+
+
+class _MaskValues:
+    """Computes candidate strings on indexing, standing in for a lookup table that would be too large."""
+
+    def __init__(self, digits: str):
+        self.digits = digits
+
+    def __getitem__(self, mask: int) -> str:
+        return ''.join(d for i, d in enumerate(self.digits) if mask & (1 << i))
+
+
+def _values_table(digits: str) -> Tuple[str, ...]:
+    """Lists the candidate strings of all masks; the masks with highest digit ``d`` extend those below it."""
+    table = ['']
+    for d in digits:
+        table += [values + d for values in table]
+    return tuple(table)
+
+
+class Topology:
+    """
+    The boxes, units and peers of a sudoku board with ``box_size²`` rows and columns.
+
+    Rows are labelled with letters and columns with numbers starting at ``1``,
+    so box names read ``A1`` through ``I9`` on a standard board and ``A1`` through
+    ``P16`` on a 16x16 board. Digits beyond ``9`` are written as letters.
+
+    Parameters
+    ----------
+    box_size : int
+        The number of rows and columns of a square unit; ``3`` for a standard board.
+    diagonal : bool
+        Whether the two main diagonals form additional units.
+    """
+
+    def __init__(self, box_size: int = 3, diagonal: bool = True):
+        if not 2 <= box_size <= 5:
+            raise ValueError('box_size must be between 2 and 5')
+        n = box_size * box_size
+        self.box_size = box_size
+        self.diagonal = diagonal
+        self.size = n
+        self.rows = ROW_LABELS[:n]
+        self.cols = [str(c) for c in range(1, n + 1)]
+        self.digits = DIGITS[:n]
+
+        self.boxes = cross(self.rows, self.cols)
+        self.row_units = [cross(r, self.cols) for r in self.rows]
+        self.column_units = [cross(self.rows, [c]) for c in self.cols]
+        row_bands = [self.rows[i:i + box_size] for i in range(0, n, box_size)]
+        col_stacks = [self.cols[i:i + box_size] for i in range(0, n, box_size)]
+        self.square_units = [cross(rs, cs) for rs in row_bands for cs in col_stacks]
+        self.diagonal_units = [[r + c for (r, c) in zip(self.rows, self.cols)],
+                               [r + c for (r, c) in zip(reversed(self.rows), self.cols)]] if diagonal else []
+        self.unit_list = self.row_units + self.column_units + self.square_units + self.diagonal_units
+
+        self.unit_dict = dict((s, [u for u in self.unit_list if s in u])
+                              for s in self.boxes)  # type: Dict[Box, List[Unit]]
+        self.peer_dict = dict((s, set(sum(self.unit_dict[s], [])) - {s})
+                              for s in self.boxes)  # type: Dict[Box, Set[Box]]
+
+        # Index tables for the bitmask engine
+        self.box_index = dict((box, i) for i, box in enumerate(self.boxes))
+        self.unit_table = tuple(tuple(self.box_index[box] for box in unit)
+                                for unit in self.unit_list)  # type: IndexTable
+        self.peer_table = tuple(tuple(sorted(self.box_index[peer] for peer in self.peer_dict[box]))
+                                for box in self.boxes)  # type: IndexTable
+        self.box_units_table = tuple(tuple(u for u, unit in enumerate(self.unit_table) if box in unit)
+                                     for box in range(len(self.boxes)))  # type: IndexTable
+
+        # Candidate masks: bit i is set if digits[i] is a candidate.
+        self.all_digits = (1 << n) - 1
+        self.digit_masks = dict((d, 1 << i) for i, d in enumerate(self.digits))
+        self.popcount = tuple(bin(mask).count('1') for mask in range(self.all_digits + 1)) \
+            if n <= MAX_POPCOUNT_TABLE_SIZE else _PopCount()
+        self.values_table = _values_table(self.digits) if n <= MAX_POPCOUNT_TABLE_SIZE else _MaskValues(self.digits)
+
+    def mask_values(self, mask: int) -> str:
+        """Returns the candidate digits of a mask as a string."""
+        return self.values_table[mask]
+
+    def __repr__(self) -> str:
+        return 'Topology(box_size={}, diagonal={})'.format(self.box_size, self.diagonal)
+
+    def __reduce__(self):
+        # Unpickle to the cached instance instead of shipping all tables between processes.
+        return get_topology, (self.box_size, self.diagonal)
+
+
+def get_topology(box_size: int = 3, diagonal: bool = True) -> Topology:
+    """
+    Returns the shared topology for the given board shape.
+
+    Parameters
+    ----------
+    box_size : int
+        The number of rows and columns of a square unit; ``3`` for a standard board.
+    diagonal : bool
+        Whether the two main diagonals form additional units.
+
+    Returns
+    -------
+    Topology
+        The topology with all tables precomputed.
+    """
+    # Normalize the arguments so that keyword and positional calls share the cache entry.
+    return _topology(box_size, bool(diagonal))
+
+
+@cache(maxsize=None)
+def _topology(box_size: int, diagonal: bool) -> Topology:
+    return Topology(box_size, diagonal)
+
+
+DEFAULT_TOPOLOGY = get_topology(3, diagonal=True)
@@ -0,0 +1,59 @@
+import pickle
+import unittest
+
+import solution
+from topology import Topology, get_topology
+
+
+class TestTopology(unittest.TestCase):
+    def test_standard_board(self):
+        topology = get_topology(3, diagonal=False)
+        self.assertEqual(len(topology.boxes), 81)
+        self.assertEqual(len(topology.unit_list), 27)
+        self.assertTrue(all(len(peers) == 20 for peers in topology.peer_dict.values()))
+
+    def test_diagonal_board(self):
+        topology = get_topology(3, diagonal=True)
+        self.assertEqual(len(topology.unit_list), 29)
+        self.assertEqual(len(topology.peer_dict['A1']), 26)
+        self.assertEqual(len(topology.peer_dict['E5']), 32)
+        self.assertEqual(topology.boxes, solution.boxes())
+
+    def test_large_board(self):
+        topology = get_topology(4, diagonal=False)
+        self.assertEqual(len(topology.boxes), 256)
+        self.assertEqual(topology.digits, '123456789ABCDEFG')
+        self.assertIn('P16', topology.boxes)
+        self.assertEqual(len(topology.peer_table[0]), 3 * 15 - 6)
+
+    def test_mask_values(self):
+        for box_size in (3, 4, 5):
+            topology = get_topology(box_size)
+            mask = topology.digit_masks['2'] | topology.digit_masks[topology.digits[-1]]
+            self.assertEqual(topology.mask_values(mask), '2' + topology.digits[-1])
+            self.assertEqual(topology.values_table[topology.all_digits], topology.digits)
+
+    def test_cached_and_picklable(self):
+        topology = get_topology(4, diagonal=True)
+        self.assertIs(get_topology(4, diagonal=True), topology)
+        self.assertIs(pickle.loads(pickle.dumps(topology)), topology)
+
+    def test_invalid_box_size(self):
+        with self.assertRaises(ValueError):
+            Topology(6)
+
+
+class TestLargeBoards(unittest.TestCase):
+    grid = ('1234.6789..C....5.....F.1234..B..A.......E.G5..8D..G9A.C5.78..3..4..8...E.C6.FD..B...4..2.5..39'
+            'A.DG9E..F..A.64C.8.A6.7..F.4.B12E3182.5.7..G.ACE..74...E1..8A.....G..4.D....F.78B..5B.8G.7C...'
+            '...4.61C..BA7..FDG.A3D..G.9C.65...1B.E.7..A....C5...C25F.6E4..B78.3')
+
+    def test_engines_agree_on_16x16(self):
+        topology = get_topology(4, diagonal=False)
+        result = solution.solve(self.grid, engine='bitmask', topology=topology)
+        self.assertTrue(solution.is_solved(result, topology))
+        self.assertEqual(solution.solve(self.grid, topology=topology), result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+import bitmask
+import solution
+import solution_test
+import topology_test
+import vectorized
+from topology import DEFAULT_TOPOLOGY, get_topology
+
+
+class TestVectorized(unittest.TestCase):
+    grids = [solution_test.TestDiagonalSudoku.diagonal_grid,
+             solution_test.TestBacktracking.grid,
+             '1.......1' + '.' * 72,
+             '22' + '.' * 79]
+
+    def test_grids_array(self):
+        array = vectorized.grids_array(self.grids[:2])
+        self.assertEqual(array.shape, (2, 81))
+        self.assertEqual(array.dtype, np.uint16)
+        self.assertEqual(array[0, 0], DEFAULT_TOPOLOGY.digit_masks['2'])
+        self.assertEqual(array[0, 1], DEFAULT_TOPOLOGY.all_digits)
+
+    def test_propagate_detects_contradictions(self):
+        _, valid = vectorized.propagate(vectorized.grids_array(self.grids))
+        self.assertEqual(valid.tolist(), [True, True, False, False])
+
+    def test_propagate_matches_bitmask(self):
+        # Elimination and hidden singles never remove a candidate that the bitmask engine keeps.
+        array, _ = vectorized.propagate(vectorized.grids_array(self.grids[:2]))
+        for grid, masks in zip(self.grids, array.tolist()):
+            reduced = bitmask.propagate(bitmask.grid_masks(grid), range(81))
+            self.assertTrue(all(m & r == r for m, r in zip(masks, reduced)))
+
+    def test_solve_batch(self):
+        results = vectorized.solve_batch(self.grids)
+        self.assertEqual(results[0], solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+        self.assertTrue(solution.is_solved(results[1]))
+        self.assertEqual(results[2:], [False, False])
+
+    def test_large_board(self):
+        topology = get_topology(4, diagonal=False)
+        grid = topology_test.TestLargeBoards.grid
+        self.assertEqual(vectorized.solve_batch([grid], topology),
+                         [solution.solve(grid, engine='bitmask', topology=topology)])
+
+
+if __name__ == '__main__':
+    unittest.main()
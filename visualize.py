@@ -1,18 +1,55 @@
-from PySudoku import play
+import argparse
+
+from PySudoku import play, export
+
+
+def filter_assignments(assignments):
+    """
+    Keeps the assignments that solve a box which was not solved the same way in the previous one.
+
+    The assignments are filtered lazily in a single pass, so playback can start while they are
+    still being produced. Each item is either a full sudoku in dictionary form or a diff
+    ``(box, old, new)`` as recorded by ``solution.Recorder``, applied to the sudoku before it;
+    ``Recorder.trace()`` yields a base sudoku followed by diffs. A diff only touches one box,
+    so checking it takes constant time, and only the kept sudokus are copied.
+    """
+    values = None
+    for assignment in assignments:
+        if isinstance(assignment, dict):
+            if values and any(len(digit) == 1 and values.get(box) != digit for box, digit in assignment.items()):
+                yield assignment
+            values = dict(assignment)
+            continue
+
+        box, _, new = assignment
+        solved = len(new) == 1 and values[box] != new
+        values[box] = new
+        if solved:
+            yield dict(values)
 
 
 def visualize_assignments(assignments):
-    """ Visualizes the set of assignments created by the Sudoku AI"""
-    last_assignment = None
-    filtered_assignments = []
-
-    for i in range(len(assignments)):
-        if last_assignment:
-            last_assignment_items = [item for item in last_assignment.items() if len(item[1]) == 1]
-            current_assignment_items = [item for item in assignments[i].items() if len(item[1]) == 1]
-            shared_items = set(last_assignment_items) & set(current_assignment_items)
-            if len(shared_items) < len(current_assignment_items):
-                filtered_assignments.append(assignments[i])
-        last_assignment = assignments[i]
-
-    play(filtered_assignments)
+    """ Visualizes the set of assignments created by the Sudoku AI, e.g. a lazy ``Recorder.trace()``"""
+    play(filter_assignments(assignments))
+
+
+def export_assignments(assignments, path, every=1, max_frames=None, fps=5):
+    """ Renders the set of assignments created by the Sudoku AI into a GIF or PNG sequence without a display"""
+    return export(filter_assignments(assignments), path, every, max_frames, fps)
+
+
+if __name__ == '__main__':
+    import solution
+
+    parser = argparse.ArgumentParser(description='Solves a grid and exports the trace of its assignments.')
+    parser.add_argument('grid', help='the grid to solve')
+    parser.add_argument('output', help='a .gif file, or a directory for a PNG sequence')
+    parser.add_argument('--every', type=int, default=1, help='render only every n-th frame, and the last one')
+    parser.add_argument('--max-frames', type=int, default=None, help='the maximum number of frames to render')
+    parser.add_argument('--fps', type=int, default=5, help='the frame rate of the GIF')
+    args = parser.parse_args()
+
+    recorder = solution.Recorder()
+    solution.solve(args.grid, recorder=recorder)
+    frames = export_assignments(recorder.trace(), args.output, args.every, args.max_frames, args.fps)
+    print('{} frames written to {}'.format(frames, args.output))
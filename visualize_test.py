@@ -0,0 +1,47 @@
+import itertools
+import unittest
+
+import solution
+import solution_test
+import visualize
+
+
+def reference_filter(assignments):
+    """The original list-based filter of visualize_assignments."""
+    last_assignment = None
+    filtered_assignments = []
+    for assignment in assignments:
+        if last_assignment:
+            last_items = [item for item in last_assignment.items() if len(item[1]) == 1]
+            current_items = [item for item in assignment.items() if len(item[1]) == 1]
+            if len(set(last_items) & set(current_items)) < len(current_items):
+                filtered_assignments.append(assignment)
+        last_assignment = assignment
+    return filtered_assignments
+
+
+class TestFilterAssignments(unittest.TestCase):
+    def setUp(self):
+        self.recorder = solution.Recorder()
+        solution.solve(solution_test.TestBacktracking.grid, recorder=self.recorder)
+        self.snapshots = [dict(self.recorder.base)] + list(self.recorder.snapshots())
+
+    def test_snapshots(self):
+        expected = reference_filter(self.snapshots)
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(list(visualize.filter_assignments(iter(self.snapshots))), expected)
+
+    def test_diffs(self):
+        self.assertEqual(list(visualize.filter_assignments(self.recorder.trace())), reference_filter(self.snapshots))
+
+    def test_is_lazy(self):
+        def endless():
+            yield dict(self.recorder.base)
+            yield from itertools.cycle(self.recorder.diffs)
+
+        frames = list(itertools.islice(visualize.filter_assignments(endless()), 5))
+        self.assertEqual(frames, reference_filter(self.snapshots)[:5])
+
+
+if __name__ == '__main__':
+    unittest.main()